@@ -0,0 +1,53 @@
+# backend/backfill_canonical_items.py
+# Job sekali jalan: isi supplies.canonical_item_id & normalized_qty untuk stok lama
+# (sebelum katalog bahan ada). Aturan sama persis dengan create_supplies
+# (services/ingredients.py), bahan yang belum ada di katalog otomatis dibuat.
+# Aman dijalankan berulang (hanya menyentuh baris yang canonical_item_id-nya masih NULL).
+# Setelah selesai, restart server (atau tunggu reconcile) supaya analytics ikut pakai id kanonik.
+import asyncio
+from collections import defaultdict
+from database import db, execute, close_db
+from services import ingredients
+
+BATCH_SIZE = 500
+
+async def backfill():
+    await ingredients.load_catalog()
+    updated = 0
+    unconverted = 0
+    last_id = 0
+
+    while True:
+        res = await execute(
+            db.table("supplies").select("id, item_name, quantity, unit")
+            .is_("canonical_item_id", "null")
+            .gt("id", last_id)
+            .order("id").limit(BATCH_SIZE)
+        )
+        rows = res.data
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        # Baris dengan (nama, quantity, satuan) sama -> nilai kanonik sama -> satu UPDATE
+        groups = defaultdict(list)
+        for row in rows:
+            groups[(row["item_name"], row.get("quantity"), row.get("unit"))].append(row["id"])
+
+        for (item_name, qty, unit), ids in groups.items():
+            canonical = await ingredients.canonicalize_supply(item_name, qty, unit)
+            if canonical["canonical_item_id"] is None:
+                continue
+            if canonical["normalized_qty"] is None:
+                unconverted += len(ids)
+            await execute(db.table("supplies").update(canonical).in_("id", ids))
+            updated += len(ids)
+
+        print(f"✅ {updated} supply sudah diberi id bahan kanonik...")
+
+    print(f"🏁 Selesai. {updated} supply di-backfill, {unconverted} di antaranya satuannya belum bisa dikonversi "
+          f"(tambahkan di tabel ingredient_units lalu jalankan ulang update normalized_qty).")
+    await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(backfill())
@@ -0,0 +1,99 @@
+# backend/backfill_locations.py
+# Job sekali jalan: isi koordinat user & supply lama dari alamatnya (gazetteer offline, services/geocoder.py).
+# 1. Users tanpa GPS, atau masih pakai koordinat default Monas dari register lama -> centroid dari `address`.
+# 2. Supplies tanpa GPS -> GPS pemiliknya (kalau sudah asli), selain itu centroid dari kolom `location`.
+# Alamat yang tidak dikenali dibiarkan (dilaporkan di akhir). Aman dijalankan berulang.
+# Setelah selesai, restart server (atau tunggu rebuild geo index) supaya peta & pencarian ikut pakai koordinat baru.
+import asyncio
+from collections import defaultdict
+from database import db, execute, close_db
+from services import geocoder
+
+BATCH_SIZE = 500
+PLACEHOLDER = (geocoder.DEFAULT_LAT, geocoder.DEFAULT_LONG)
+
+def _is_real(lat, long) -> bool:
+    return lat is not None and long is not None and (lat, long) != PLACEHOLDER
+
+async def backfill_users():
+    updated, unmatched, last_id = 0, 0, 0
+    while True:
+        res = await execute(
+            db.table("users").select("id, address, latitude, longitude")
+            .or_(f"latitude.is.null,and(latitude.eq.{PLACEHOLDER[0]},longitude.eq.{PLACEHOLDER[1]})")
+            .gt("id", last_id)
+            .order("id").limit(BATCH_SIZE)
+        )
+        rows = res.data
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        for row in rows:
+            location = geocoder.geocode(row.get("address"))
+            if location is None:
+                unmatched += 1
+                continue
+            await execute(
+                db.table("users").update({"latitude": location["lat"], "longitude": location["long"]})
+                .eq("id", row["id"])
+            )
+            updated += 1
+        print(f"✅ {updated} user sudah diberi koordinat...")
+    return updated, unmatched
+
+async def backfill_supplies():
+    updated, unmatched, last_id = 0, 0, 0
+    while True:
+        res = await execute(
+            db.table("supplies").select("id, user_id, location")
+            .is_("latitude", "null")
+            .gt("id", last_id)
+            .order("id").limit(BATCH_SIZE)
+        )
+        rows = res.data
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        owner_ids = list({row["user_id"] for row in rows if row.get("user_id") is not None})
+        owners = {}
+        if owner_ids:
+            owners_res = await execute(db.table("users").select("id, latitude, longitude").in_("id", owner_ids))
+            owners = {u["id"]: u for u in owners_res.data or []}
+
+        # Supply dengan koordinat hasil sama -> satu UPDATE
+        groups = defaultdict(list)
+        for row in rows:
+            owner = owners.get(row.get("user_id")) or {}
+            if _is_real(owner.get("latitude"), owner.get("longitude")):
+                groups[(owner["latitude"], owner["longitude"])].append(row["id"])
+                continue
+            location = geocoder.geocode(row.get("location"))
+            if location is None:
+                unmatched += 1
+                continue
+            groups[(location["lat"], location["long"])].append(row["id"])
+
+        for (lat, long), ids in groups.items():
+            await execute(db.table("supplies").update({"latitude": lat, "longitude": long}).in_("id", ids))
+            updated += len(ids)
+        print(f"✅ {updated} supply sudah diberi koordinat...")
+    return updated, unmatched
+
+async def backfill():
+    await geocoder.load_gazetteer()
+    if not geocoder.is_loaded():
+        await close_db()
+        return
+
+    users_updated, users_unmatched = await backfill_users()
+    supplies_updated, supplies_unmatched = await backfill_supplies()
+
+    print(f"🏁 Selesai. User: {users_updated} di-backfill, {users_unmatched} alamatnya tidak dikenali. "
+          f"Supply: {supplies_updated} di-backfill, {supplies_unmatched} tidak dikenali "
+          f"(lengkapi alamat / GPS, atau tambah wilayahnya ke file gazetteer lalu jalankan ulang).")
+    await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(backfill())
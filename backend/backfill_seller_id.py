@@ -0,0 +1,53 @@
+# backend/backfill_seller_id.py
+# Job sekali jalan: isi orders.seller_id untuk order lama (sebelum kolom ini ada).
+# Setelah ini, inbox vendor (GET /api/orders/umkm) cukup query by seller_id.
+# Aman dijalankan berulang (hanya menyentuh order yang seller_id-nya masih NULL).
+from collections import defaultdict
+from database import supabase
+
+BATCH_SIZE = 200
+
+def backfill():
+    updated = 0
+    unresolved = []
+    last_id = 0
+
+    while True:
+        # 1. Ambil order tanpa seller_id, maju per id (yang gagal di-resolve tidak diambil lagi)
+        orders = supabase.table("orders").select("id, supply_id")\
+            .is_("seller_id", "null")\
+            .gt("id", last_id)\
+            .order("id").limit(BATCH_SIZE).execute().data
+        if not orders:
+            break
+        last_id = orders[-1]["id"]
+
+        # 2. Cari pemilik supply-nya sekaligus (satu query in_ per batch)
+        supply_ids = list({o["supply_id"] for o in orders if o.get("supply_id")})
+        owners = {}
+        if supply_ids:
+            supplies = supabase.table("supplies").select("id, user_id").in_("id", supply_ids).execute().data
+            owners = {s["id"]: s["user_id"] for s in supplies if s.get("user_id")}
+
+        # 3. Kelompokkan per seller -> satu UPDATE per seller
+        by_seller = defaultdict(list)
+        for o in orders:
+            seller_id = owners.get(o.get("supply_id"))
+            if seller_id:
+                by_seller[seller_id].append(o["id"])
+            else:
+                # Supply sudah dihapus (dipakai masak) / data rusak
+                unresolved.append(o["id"])
+
+        for seller_id, order_ids in by_seller.items():
+            supabase.table("orders").update({"seller_id": seller_id}).in_("id", order_ids).execute()
+            updated += len(order_ids)
+
+        print(f"✅ {updated} order sudah diisi seller_id...")
+
+    print(f"🏁 Selesai. {updated} order di-backfill, {len(unresolved)} tidak bisa di-resolve (supply sudah tidak ada).")
+    if unresolved:
+        print(f"   ID: {unresolved}")
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,51 @@
+"""
+Micro-benchmark haversine: loop Python (math) vs vektor numpy (services/distance.py).
+Jalankan: python bench_distance.py
+"""
+import time
+import numpy as np
+from services.distance import haversine_distance, haversine_many, haversine_matrix
+
+# Titik asal: Monas (Jakarta Pusat)
+ORIGIN_LAT = -6.175392
+ORIGIN_LONG = 106.827153
+
+def _timeit(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def bench(n: int):
+    rng = np.random.default_rng(42)
+    lats = ORIGIN_LAT + rng.uniform(-0.5, 0.5, n)
+    longs = ORIGIN_LONG + rng.uniform(-0.5, 0.5, n)
+    lat_list, long_list = lats.tolist(), longs.tolist()
+
+    loop = _timeit(lambda: [haversine_distance(ORIGIN_LAT, ORIGIN_LONG, a, b) for a, b in zip(lat_list, long_list)])
+    vector = _timeit(lambda: haversine_many(ORIGIN_LAT, ORIGIN_LONG, lat_list, long_list))
+
+    # Pastikan hasilnya sama
+    expected = np.array([haversine_distance(ORIGIN_LAT, ORIGIN_LONG, a, b) for a, b in zip(lat_list[:1000], long_list[:1000])])
+    assert np.allclose(haversine_many(ORIGIN_LAT, ORIGIN_LONG, lat_list[:1000], long_list[:1000]), expected)
+
+    print(f"📏 {n:>9,} titik | loop math: {loop * 1000:9.1f} ms | numpy: {vector * 1000:7.1f} ms | {loop / vector:5.1f}x lebih cepat")
+
+def bench_matrix(n_sources: int, n_targets: int):
+    rng = np.random.default_rng(7)
+    src_lats = ORIGIN_LAT + rng.uniform(-0.5, 0.5, n_sources)
+    src_longs = ORIGIN_LONG + rng.uniform(-0.5, 0.5, n_sources)
+    dst_lats = ORIGIN_LAT + rng.uniform(-0.5, 0.5, n_targets)
+    dst_longs = ORIGIN_LONG + rng.uniform(-0.5, 0.5, n_targets)
+
+    loop = _timeit(lambda: [[haversine_distance(a, b, c, d) for c, d in zip(dst_lats, dst_longs)]
+                            for a, b in zip(src_lats, src_longs)], repeat=1)
+    vector = _timeit(lambda: haversine_matrix(src_lats, src_longs, dst_lats, dst_longs))
+    print(f"🧮 matriks {n_sources}x{n_targets} | loop math: {loop * 1000:9.1f} ms | numpy: {vector * 1000:7.1f} ms | {loop / vector:5.1f}x lebih cepat")
+
+if __name__ == "__main__":
+    for n in (10_000, 1_000_000):
+        bench(n)
+    bench_matrix(100, 10_000)
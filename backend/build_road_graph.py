@@ -0,0 +1,63 @@
+# backend/build_road_graph.py
+# Job sekali jalan (offline): ubah ekstrak jaringan jalan (CSV) jadi file graph .npz
+# yang dibaca services/roadnet.py saat DISTANCE_BACKEND=road.
+#
+# nodes.csv : id,lat,lon
+# edges.csv : from,to,length_m[,speed_kmh][,oneway]
+#   - speed_kmh kosong -> ROUTE_AVG_SPEED_KMH
+#   - oneway 1/true/yes -> satu arah (from -> to), selain itu dua arah
+# Ekstrak bisa dibuat dari data OSM (misal osmium / osmnx) di mesin lain,
+# server produksi cukup menyimpan file .npz-nya.
+#
+# Pakai: python build_road_graph.py nodes.csv edges.csv [output.npz]
+import csv
+import sys
+import numpy as np
+from config import ROAD_GRAPH_PATH, ROUTE_AVG_SPEED_KMH
+
+TRUE_VALUES = {"1", "true", "yes", "y"}
+
+def build(nodes_path: str, edges_path: str, output_path: str):
+    index = {}
+    node_lat, node_lon = [], []
+    with open(nodes_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            index[row["id"]] = len(node_lat)
+            node_lat.append(float(row["lat"]))
+            node_lon.append(float(row["lon"]))
+
+    src, dst, minutes = [], [], []
+    skipped = 0
+    with open(edges_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            a, b = index.get(row["from"]), index.get(row["to"])
+            if a is None or b is None:
+                skipped += 1
+                continue
+            speed = float(row.get("speed_kmh") or ROUTE_AVG_SPEED_KMH)
+            cost = float(row["length_m"]) / 1000 / speed * 60
+            src.append(a)
+            dst.append(b)
+            minutes.append(cost)
+            if (row.get("oneway") or "").strip().lower() not in TRUE_VALUES:
+                src.append(b)
+                dst.append(a)
+                minutes.append(cost)
+
+    np.savez_compressed(
+        output_path,
+        node_lat=np.array(node_lat, dtype=np.float64),
+        node_lon=np.array(node_lon, dtype=np.float64),
+        edge_src=np.array(src, dtype=np.int32),
+        edge_dst=np.array(dst, dtype=np.int32),
+        edge_minutes=np.array(minutes, dtype=np.float32)
+    )
+    print(f"✅ {len(node_lat)} node, {len(src)} edge berarah -> {output_path}")
+    if skipped:
+        print(f"⚠️ {skipped} edge dilewati (node tidak ada di nodes.csv)")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Pakai: python build_road_graph.py nodes.csv edges.csv [output.npz]")
+        sys.exit(1)
+    build(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else ROAD_GRAPH_PATH)
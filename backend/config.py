@@ -0,0 +1,133 @@
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Load env dari folder backend (satu-satunya tempat baca .env)
+BASE_DIR = Path(__file__).parent
+load_dotenv(BASE_DIR / ".env")
+
+# ==========================================
+# 🔌 DATABASE (SUPABASE / POSTGREST)
+# ==========================================
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+
+# Connection pool HTTP/2 bersama untuk semua query async
+DB_POOL_MAX_CONNECTIONS = int(os.getenv("DB_POOL_MAX_CONNECTIONS", "100"))
+DB_POOL_MAX_KEEPALIVE = int(os.getenv("DB_POOL_MAX_KEEPALIVE", "20"))
+DB_POOL_KEEPALIVE_EXPIRY = float(os.getenv("DB_POOL_KEEPALIVE_EXPIRY", "30"))
+
+# Timeout (detik). DB_QUERY_TIMEOUT = batas default per panggilan query
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_QUERY_TIMEOUT = float(os.getenv("DB_QUERY_TIMEOUT", "10"))
+
+# ==========================================
+# 🤖 LLM (KOLOSAL)
+# ==========================================
+
+# Model default untuk semua panggilan (vision, menu, chat)
+LLM_MODEL = os.getenv("LLM_MODEL", "Claude Sonnet 4.5")
+
+# Maks panggilan LLM paralel per worker (sekaligus ukuran connection pool),
+# dan batas per model: "Nama Model=angka", dipisah koma
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MODEL_CONCURRENCY = {
+    name.strip(): int(limit)
+    for name, _, limit in (
+        pair.rpartition("=") for pair in os.getenv("LLM_MODEL_CONCURRENCY", "Claude Sonnet 4.5=8").split(",")
+    )
+    if name.strip() and limit.strip()
+}
+LLM_POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "8"))
+
+# Timeout (detik): antre slot, connect, dan satu panggilan penuh (vision bisa 10-30 detik)
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+# Antrean penuh (LLMBusyError) -> HTTP 503 + header Retry-After (detik) / event SSE "busy"
+LLM_BUSY_RETRY_AFTER = int(os.getenv("LLM_BUSY_RETRY_AFTER", "10"))
+
+# ==========================================
+# ⏱️ BACKGROUND JOBS
+# ==========================================
+
+# Interval hitung ulang aggregate analytics dari DB (repair drift)
+AGGREGATES_RECONCILE_SECONDS = float(os.getenv("AGGREGATES_RECONCILE_SECONDS", "600"))
+
+# Sweeper expiry: interval scan, batas peringatan (hari), dan seberapa jauh ke belakang
+# barang yang sudah lewat expired masih ikut dilaporkan
+EXPIRY_SWEEP_INTERVAL_SECONDS = float(os.getenv("EXPIRY_SWEEP_INTERVAL_SECONDS", "900"))
+EXPIRY_WARNING_DAYS = int(os.getenv("EXPIRY_WARNING_DAYS", "7"))
+EXPIRY_SWEEP_LOOKBACK_DAYS = int(os.getenv("EXPIRY_SWEEP_LOOKBACK_DAYS", "30"))
+
+# Penugasan vendor -> SPPG (dijalankan di dalam sweeper expiry):
+# berapa SPPG terdekat yang jadi kandidat tiap vendor
+SPPG_ASSIGNMENT_CANDIDATES = int(os.getenv("SPPG_ASSIGNMENT_CANDIDATES", "8"))
+
+# Interval bangun ulang spatial index supplies (pencarian supplier terdekat)
+GEOINDEX_REBUILD_SECONDS = float(os.getenv("GEOINDEX_REBUILD_SECONDS", "600"))
+
+# Interval muat ulang tabel ingredient_synonyms (normalisasi nama barang)
+SEARCH_SYNONYMS_RELOAD_SECONDS = float(os.getenv("SEARCH_SYNONYMS_RELOAD_SECONDS", "3600"))
+
+# Interval muat ulang katalog bahan kanonik (ingredients + ingredient_units)
+INGREDIENT_CATALOG_RELOAD_SECONDS = float(os.getenv("INGREDIENT_CATALOG_RELOAD_SECONDS", "3600"))
+
+# Interval muat ulang tabel menu_knowledge (umur simpan + nutrisi per menu, dipakai cook_meal)
+MENU_KNOWLEDGE_RELOAD_SECONDS = float(os.getenv("MENU_KNOWLEDGE_RELOAD_SECONDS", "3600"))
+
+# ==========================================
+# 🚚 LOGISTIK
+# ==========================================
+
+# Perencanaan rute penjemputan: kecepatan rata-rata kendaraan di jalan kota (km/jam)
+# dan lama berhenti di tiap vendor (menit)
+ROUTE_AVG_SPEED_KMH = float(os.getenv("ROUTE_AVG_SPEED_KMH", "20"))
+ROUTE_SERVICE_MINUTES = float(os.getenv("ROUTE_SERVICE_MINUTES", "10"))
+
+# Backend jarak: "haversine" (garis lurus, default) atau "road" (graph jalan offline)
+# ROAD_GRAPH_PATH = file .npz hasil build_road_graph.py
+# ROAD_SNAP_MAX_KM = titik lebih jauh dari ini ke jalan terdekat -> pakai garis lurus
+DISTANCE_BACKEND = os.getenv("DISTANCE_BACKEND", "haversine").lower()
+# Path relatif dihitung dari folder backend
+ROAD_GRAPH_PATH = str(BASE_DIR / os.getenv("ROAD_GRAPH_PATH", "data/road_graph.npz"))
+ROAD_SNAP_MAX_KM = float(os.getenv("ROAD_SNAP_MAX_KM", "1.0"))
+ROAD_TREES_REFRESH_SECONDS = float(os.getenv("ROAD_TREES_REFRESH_SECONDS", "3600"))
+# Pencarian jalan dari satu titik asal (dapur) berhenti di waktu tempuh garis lurus
+# terjauh x ROAD_MAX_DETOUR (+ ROAD_SEARCH_SLACK_MINUTES); vendor di luar itu -> garis lurus
+ROAD_MAX_DETOUR = float(os.getenv("ROAD_MAX_DETOUR", "3"))
+ROAD_SEARCH_SLACK_MINUTES = float(os.getenv("ROAD_SEARCH_SLACK_MINUTES", "10"))
+
+# Gazetteer offline (CSV centroid kelurahan/kecamatan) untuk geocoding alamat
+GAZETTEER_PATH = str(BASE_DIR / os.getenv("GAZETTEER_PATH", "data/gazetteer_jakarta.csv"))
+
+# ==========================================
+# 🧠 CACHE
+# ==========================================
+
+# Jaring pengaman TTL cache analytics vendor (invalidasi utama lewat event write)
+VENDOR_ANALYTICS_CACHE_TTL = float(os.getenv("VENDOR_ANALYTICS_CACHE_TTL", "300"))
+
+# Daftar SPPG aktif (tabel sppg_locations)
+SPPG_NETWORK_CACHE_TTL = float(os.getenv("SPPG_NETWORK_CACHE_TTL", "600"))
+
+# Tile peta (cluster + density) per z/x/y; invalidasi per tile lewat write supplies
+MAP_TILE_CACHE_SIZE = int(os.getenv("MAP_TILE_CACHE_SIZE", "4096"))
+
+# Hasil analisis foto (vision) di file SQLite: batas entry (LRU), umur (detik),
+# dan jarak Hamming dHash maks (dari 64 bit) supaya foto hampir sama dianggap sama. 0 = hanya yang persis
+VISION_CACHE_PATH = str(BASE_DIR / os.getenv("VISION_CACHE_PATH", "data/vision_cache.sqlite3"))
+VISION_CACHE_MAX_ENTRIES = int(os.getenv("VISION_CACHE_MAX_ENTRIES", "5000"))
+VISION_CACHE_TTL = float(os.getenv("VISION_CACHE_TTL", str(7 * 24 * 3600)))
+VISION_CACHE_MAX_DISTANCE = int(os.getenv("VISION_CACHE_MAX_DISTANCE", "5"))
+
+# Rekomendasi menu AI per kombinasi bahan (SQLite, LRU + TTL detik); dipakai rescue menu & /api/recommend-menu
+MENU_CACHE_PATH = str(BASE_DIR / os.getenv("MENU_CACHE_PATH", "data/menu_cache.sqlite3"))
+MENU_CACHE_MAX_ENTRIES = int(os.getenv("MENU_CACHE_MAX_ENTRIES", "2000"))
+MENU_CACHE_TTL = float(os.getenv("MENU_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Cache profil user (tabel users) bersama untuk semua service
+USER_PROFILE_CACHE_SIZE = int(os.getenv("USER_PROFILE_CACHE_SIZE", "10000"))
+USER_PROFILE_CACHE_TTL = float(os.getenv("USER_PROFILE_CACHE_TTL", "300"))
@@ -1,16 +1,48 @@
-import os
-from supabase import create_client, Client
-from dotenv import load_dotenv
-from pathlib import Path
+import asyncio
+import httpx
+from supabase import create_client, Client, AsyncClient, AsyncClientOptions
+from config import (
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    DB_POOL_MAX_CONNECTIONS,
+    DB_POOL_MAX_KEEPALIVE,
+    DB_POOL_KEEPALIVE_EXPIRY,
+    DB_CONNECT_TIMEOUT,
+    DB_QUERY_TIMEOUT
+)
 
-# Load env dari folder backend
-load_dotenv(Path(__file__).parent / ".env")
-
-url: str = os.getenv("SUPABASE_URL")
-key: str = os.getenv("SUPABASE_KEY")
+url: str = SUPABASE_URL
+key: str = SUPABASE_KEY
 
 if not url or not key:
     raise ValueError("❌ SUPABASE_URL atau SUPABASE_KEY belum diisi di .env!")
 
-# Bikin client global biar bisa dipanggil di mana aja
-supabase: Client = create_client(url, key)
\ No newline at end of file
+# Client sync, khusus script CLI (reset_admin.py, test_insert.py, dll).
+# JANGAN dipakai di route/service: setiap panggilan nge-block event loop.
+supabase: Client = create_client(url, key)
+
+# Satu connection pool HTTP/2 untuk semua request (PostgREST, Storage, Auth)
+http_pool = httpx.AsyncClient(
+    http2=True,
+    follow_redirects=True,
+    limits=httpx.Limits(
+        max_connections=DB_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=DB_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=DB_POOL_KEEPALIVE_EXPIRY
+    ),
+    timeout=httpx.Timeout(DB_QUERY_TIMEOUT, connect=DB_CONNECT_TIMEOUT)
+)
+
+# Client async global, dipakai semua route & service
+db: AsyncClient = AsyncClient(url, key, options=AsyncClientOptions(httpx_client=http_pool))
+
+async def execute(query, timeout: float = DB_QUERY_TIMEOUT):
+    """
+    Jalankan query builder Supabase secara async dengan batas waktu per panggilan.
+    Contoh: res = await execute(db.table("users").select("id").eq("id", 1))
+    """
+    return await asyncio.wait_for(query.execute(), timeout=timeout)
+
+async def close_db():
+    """Tutup connection pool (dipanggil saat server shutdown)."""
+    await http_pool.aclose()
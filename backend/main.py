@@ -1,9 +1,11 @@
 import traceback
+from contextlib import asynccontextmanager
 from typing import List, Optional
 from datetime import datetime, timezone
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Depends, status
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.concurrency import run_in_threadpool
 
 # --- RATE LIMITER ---
@@ -15,11 +17,11 @@ from slowapi.errors import RateLimitExceeded
 from pydantic import BaseModel 
 
 # --- DATABASE & MODELS ---
-from database import supabase
+from database import db, execute, close_db
 from models import (
     SupplyItem, MenuRequest, OrderRequest, OrderStatusUpdate, 
     CookRequest, IoTLogRequest, UserRegister, UserLogin, Token,
-    GoogleLoginRequest, ChatRequest
+    GoogleLoginRequest, ChatRequest, UserProfileUpdate, RoutePlanRequest, ResolveIngredientsRequest
 )
 
 # --- SECURITY ---
@@ -37,26 +39,78 @@ import os
 
 # --- SERVICES ---
 from services.vision import analyze_market_inventory, analyze_cooked_meal
-from services.kitchen import generate_menu_recommendation, cook_meal, chat_with_chef
-from services.logistics import search_suppliers, search_nearest_sppg
-from services.inventory import calculate_expiry_date, check_expiry_and_notify
+from services.kitchen import (
+    generate_menu_recommendation, stream_menu_recommendation, cook_meal, chat_with_chef, stream_chat_with_chef
+)
+from services.streaming import SSE_HEADERS, sse_stream
+from services.logistics import search_suppliers, search_nearest_sppg, resolve_ingredients
+from services.routing import plan_pickup_routes
+from services.inventory import calculate_expiry_date, check_expiry_and_notify, run_expiry_sweep
 from services.storage import upload_image_to_supabase
 from services.analytics import get_kitchen_analytics, get_vendor_analytics
+from services.catalog import list_market_supplies
+from services.orders import list_incoming_orders
+from services.cache import get_cache_stats
+from services.clients import LLMBusyError, get_llm_stats, close_llm
+from services.users import get_user_profile, update_user_profile
+from services.ingredients import canonicalize_supply
+from services import aggregates, events, geocoder, geoindex, ingredients, maptiles, menu_knowledge, roadnet, scheduler, search, sppg, suggest
+from config import (
+    AGGREGATES_RECONCILE_SECONDS,
+    EXPIRY_SWEEP_INTERVAL_SECONDS,
+    LLM_BUSY_RETRY_AFTER,
+    GEOINDEX_REBUILD_SECONDS,
+    SEARCH_SYNONYMS_RELOAD_SECONDS,
+    INGREDIENT_CATALOG_RELOAD_SECONDS,
+    MENU_KNOWLEDGE_RELOAD_SECONDS,
+    ROAD_TREES_REFRESH_SECONDS
+)
 
 # 1. Setup Limiter (Kunci berdasarkan IP Address)
 limiter = Limiter(key_func=get_remote_address)
 
-app = FastAPI(title="Bekal Bangsa API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Gazetteer alamat dulu: dipakai geo index untuk supply tanpa GPS
+    await geocoder.load_gazetteer()
+    # Background jobs (jalan di proses ini, tanpa cron eksternal)
+    scheduler.start_periodic("aggregates_reconcile", AGGREGATES_RECONCILE_SECONDS, aggregates.reconcile)
+    scheduler.start_periodic("expiry_sweep", EXPIRY_SWEEP_INTERVAL_SECONDS, run_expiry_sweep)
+    scheduler.start_periodic("search_synonyms_reload", SEARCH_SYNONYMS_RELOAD_SECONDS, search.load_synonyms)
+    scheduler.start_periodic("ingredient_catalog_reload", INGREDIENT_CATALOG_RELOAD_SECONDS, ingredients.load_catalog)
+    scheduler.start_periodic("menu_knowledge_reload", MENU_KNOWLEDGE_RELOAD_SECONDS, menu_knowledge.load_knowledge)
+    scheduler.start_periodic("geoindex_rebuild", GEOINDEX_REBUILD_SECONDS, geoindex.rebuild)
+    if roadnet.is_enabled():
+        # Shortest-path tree dari tiap SPPG (graph jalan offline, DISTANCE_BACKEND=road)
+        scheduler.start_periodic("road_trees_refresh", ROAD_TREES_REFRESH_SECONDS, sppg.refresh_travel_times)
+    yield
+    await scheduler.stop_all()
+    # Tutup connection pool DB & LLM saat server shutdown
+    await close_db()
+    await close_llm()
+
+app = FastAPI(title="Bekal Bangsa API", version="1.0.0", lifespan=lifespan)
 
 # 2. Pasang Limiter & CORS
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+async def _llm_busy_handler(request: Request, exc: LLMBusyError):
+    # Antrean LLM penuh: bukan error server, client cukup coba lagi nanti
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(LLM_BUSY_RETRY_AFTER)}
+    )
+
+app.add_exception_handler(LLMBusyError, _llm_busy_handler)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], # Allow all untuk kemudahan demo/hackathon
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"], # Token halaman berikutnya (keyset pagination)
 )
 
 @app.get("/")
@@ -74,17 +128,21 @@ async def register(request: Request, user: UserRegister):
     Mendaftarkan user baru (Vendor/Kitchen) ke database Supabase.
     """
     # 1. Cek apakah email/username sudah ada
-    existing = supabase.table("users").select("id")\
-        .or_(f"email.eq.{user.email},username.eq.{user.username}")\
-        .execute()
+    existing = await execute(
+        db.table("users").select("id")
+        .or_(f"email.eq.{user.email},username.eq.{user.username}")
+    )
     
     if existing.data:
         raise HTTPException(status_code=400, detail="Email atau Username sudah terdaftar")
 
     # 2. Hash Password
-    hashed_pw = get_password_hash(user.password)
+    # bcrypt berat di CPU -> jalankan di threadpool biar event loop gak ke-block
+    hashed_pw = await run_in_threadpool(get_password_hash, user.password)
 
-    # 3. Siapkan data user (Default lokasi Monas untuk demo jika kosong)
+    # 3. Siapkan data user. Lokasi awal = centroid kelurahan/kecamatan dari alamat (gazetteer offline);
+    #    kosong (None) kalau alamat tidak dikenali -> user isi GPS lewat PUT /api/users/me
+    location = geocoder.geocode(user.address)
     user_data = {
         "full_name": user.full_name,
         "email": user.email,
@@ -93,13 +151,13 @@ async def register(request: Request, user: UserRegister):
         "role": user.role,
         "phone_number": user.phone_number,
         "address": user.address,
-        "latitude": -6.175392, # Default demo location
-        "longitude": 106.827153
+        "latitude": location["lat"] if location else None,
+        "longitude": location["long"] if location else None
     }
     
     try:
         # 4. Insert ke DB
-        res = supabase.table("users").insert(user_data).execute()
+        res = await execute(db.table("users").insert(user_data))
         new_user = res.data[0]
         
         # 5. Auto Login (Generate Token)
@@ -125,14 +183,15 @@ async def login(request: Request, creds: UserLogin):
     """
     try:
         # Cari user di DB
-        res = supabase.table("users").select("*")\
-            .or_(f"email.eq.{creds.username_or_email},username.eq.{creds.username_or_email}")\
-            .execute()
+        res = await execute(
+            db.table("users").select("*")
+            .or_(f"email.eq.{creds.username_or_email},username.eq.{creds.username_or_email}")
+        )
         
         user = res.data[0] if res.data else None
 
         # Verifikasi Password
-        if not user or not verify_password(creds.password, user['password']):
+        if not user or not await run_in_threadpool(verify_password, creds.password, user['password']):
             raise HTTPException(status_code=401, detail="Username atau Password salah")
 
         # Generate Token JWT
@@ -156,6 +215,32 @@ async def login(request: Request, creds: UserLogin):
         if isinstance(e, HTTPException): raise e
         raise HTTPException(status_code=500, detail="Internal Server Error saat Login")
 
+@app.put("/api/users/me")
+async def update_my_profile(request: Request, update: UserProfileUpdate, current_user: dict = Depends(get_current_user)):
+    """
+    Update profil user yang login (nama, kontak, alamat, lokasi).
+    """
+    changes = update.dict(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="Tidak ada data yang diubah")
+
+    # Alamat baru tanpa GPS -> perkiraan lokasi dari gazetteer
+    if changes.get("address") and "latitude" not in changes and "longitude" not in changes:
+        location = geocoder.geocode(changes["address"])
+        if location:
+            changes["latitude"], changes["longitude"] = location["lat"], location["long"]
+
+    try:
+        # update_user_profile sekaligus membuang cache profil user ini
+        profile = await update_user_profile(current_user["user_id"], changes)
+        if not profile:
+            raise HTTPException(status_code=404, detail="User tidak ditemukan")
+        return {"status": "success", "user": await get_user_profile(current_user["user_id"])}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ==========================================
 # 📦 BAGIAN 2: FITUR VENDOR (PROTECTED)
 # ==========================================
@@ -177,20 +262,24 @@ async def create_supplies(
 
     try:
         # Ambil info lengkap user (buat field owner_name & location di tabel supplies)
-        user_info_res = supabase.table("users").select("*").eq("id", current_user["user_id"]).single().execute()
-        user_info = user_info_res.data
+        user_info = await get_user_profile(current_user["user_id"]) or {}
 
         data_to_insert = []
         for item in items:
             # Hitung tanggal expiry otomatis jika user tidak isi manual
             final_expiry = item.expiry_date
-            if not final_expiry and item.expiry_days:
+            if not final_expiry and item.expiry_days is not None:
                 final_expiry = calculate_expiry_date(item.expiry_days)
+
+            # Bahan kanonik + quantity dalam satuan dasar (buat analytics)
+            canonical = await canonicalize_supply(item.name, item.qty, item.unit)
             
             data_to_insert.append({
                 "item_name": item.name,
                 "quantity": item.qty,
                 "unit": item.unit,
+                "canonical_item_id": canonical["canonical_item_id"],
+                "normalized_qty": canonical["normalized_qty"],
                 "quality_status": item.freshness,
                 "expiry_days": item.expiry_days,
                 "expiry_date": final_expiry,
@@ -207,7 +296,8 @@ async def create_supplies(
                 "longitude": item.longitude or user_info.get('longitude')
             })
         
-        response = supabase.table("supplies").insert(data_to_insert).execute()
+        response = await execute(db.table("supplies").insert(data_to_insert))
+        events.publish(events.SUPPLIES_ADDED, response.data)
         return {"status": "success", "count": len(items), "data": response.data}
     
     except Exception as e:
@@ -224,9 +314,11 @@ async def get_my_supplies(request: Request, current_user: dict = Depends(get_cur
         
     try:
         # Filter: user_id == ID Login
-        response = supabase.table("supplies").select("*")\
-            .eq("user_id", current_user["user_id"])\
-            .order("created_at", desc=True).execute()
+        response = await execute(
+            db.table("supplies").select("*")
+            .eq("user_id", current_user["user_id"])
+            .order("created_at", desc=True)
+        )
         return {"supplies": response.data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -234,38 +326,26 @@ async def get_my_supplies(request: Request, current_user: dict = Depends(get_cur
 # backend/main.py
 
 @app.get("/api/orders/umkm")
-async def get_incoming_orders(request: Request, current_user: dict = Depends(get_current_user)):
+async def get_incoming_orders(
+    request: Request,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Inbox pesanan vendor (terbaru dulu).
+    Pagination: kirim `next_cursor` dari response sebelumnya sebagai `cursor`.
+    """
     # 1. Cek Role
     if current_user["role"] != "vendor":
         raise HTTPException(status_code=403, detail="Akses ditolak")
 
     try:
-        # STRATEGI 1: Cari berdasarkan seller_id (Langsung & Cepat)
-        orders_query = supabase.table("orders")\
-            .select("*, supplies(item_name, unit)")\
-            .eq("seller_id", current_user["user_id"])\
-            .order("created_at", desc=True)\
-            .execute()
-        
-        orders_data = orders_query.data
-
-        # STRATEGI 2: Fallback (Jika data lama belum punya seller_id)
-        if not orders_data:
-            # A. Cari ID semua barang milik vendor ini
-            my_supplies = supabase.table("supplies").select("id").eq("user_id", current_user["user_id"]).execute()
-            my_supply_ids = [s['id'] for s in my_supplies.data]
-            
-            if my_supply_ids:
-                # B. Cari Order yang supply_id-nya ada di list barang saya
-                fallback_query = supabase.table("orders")\
-                    .select("*, supplies(item_name, unit)")\
-                    .in_("supply_id", my_supply_ids)\
-                    .order("created_at", desc=True)\
-                    .execute()
-                orders_data = fallback_query.data
-
-        return {"orders": orders_data}
+        orders_data, next_cursor = await list_incoming_orders(current_user["user_id"], cursor, limit)
+        return {"orders": orders_data, "next_cursor": next_cursor}
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"❌ Error fetching orders: {e}")
         # Jangan sembunyikan error, kirim ke frontend biar ketahuan
@@ -281,7 +361,10 @@ async def update_order_status(order_id: int, update: OrderStatusUpdate, current_
     
     try:
         # Idealnya cek dulu apakah order ini milik vendor, tapi untuk demo langsung update aja
-        response = supabase.table("orders").update({"status": update.status}).eq("id", order_id).execute()
+        # RPC: update + status lama dalam satu statement (baris dikunci), supaya dua update
+        # bersamaan tidak menggeser counter status aggregates dari status lama yang sama
+        response = await execute(db.rpc("set_order_status", {"p_order_id": order_id, "p_status": update.status}))
+        events.publish(events.ORDER_UPDATED, response.data or [])
         return {"status": "success", "data": response.data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -305,11 +388,11 @@ async def create_order(
 
     try:
         # Ambil nama kitchen buat dipasang di order
-        user_res = supabase.table("users").select("full_name").eq("id", current_user["user_id"]).single().execute()
-        kitchen_name = user_res.data['full_name']
+        kitchen_profile = await get_user_profile(current_user["user_id"]) or {}
+        kitchen_name = kitchen_profile.get('full_name')
 
         # Cari tahu siapa penjualnya (Seller ID) berdasarkan supply_id
-        supply_res = supabase.table("supplies").select("user_id").eq("id", order.supply_id).single().execute()
+        supply_res = await execute(db.table("supplies").select("user_id, item_name").eq("id", order.supply_id).single())
         seller_id = supply_res.data['user_id'] if supply_res.data else None
 
         data = {
@@ -323,7 +406,10 @@ async def create_order(
             "seller_id": seller_id
         }
         
-        response = supabase.table("orders").insert(data).execute()
+        response = await execute(db.table("orders").insert(data))
+        # Bentuk sama dengan select("*, supplies(item_name)") biar subscriber gak perlu query lagi
+        item_name = supply_res.data.get('item_name') if supply_res.data else None
+        events.publish(events.ORDER_CREATED, [{**row, "supplies": {"item_name": item_name}} for row in response.data])
         return {"status": "success", "data": response.data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -340,16 +426,45 @@ async def get_my_orders(request: Request, current_user: dict = Depends(get_curre
     try:
         # Ambil orders dimana buyer_id = user yang login
         # Join dengan supplies untuk dapat nama barang
-        orders = supabase.table("orders")\
-            .select("*, supplies(item_name, unit)")\
-            .eq("buyer_id", current_user["user_id"])\
-            .order("created_at", desc=True)\
-            .execute()
+        orders = await execute(
+            db.table("orders")
+            .select("*, supplies(item_name, unit)")
+            .eq("buyer_id", current_user["user_id"])
+            .order("created_at", desc=True)
+        )
             
         return {"orders": orders.data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/logistics/routes")
+async def plan_routes(request: Request, plan: RoutePlanRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Susun rute jemput semua order 'confirmed' milik Kitchen ini
+    (urutan kunjungan per kendaraan, dengan kapasitas & jam buka vendor).
+    """
+    if current_user["role"] != "kitchen":
+        raise HTTPException(status_code=403, detail="Akses ditolak")
+    if plan.vehicles < 1 or plan.vehicle_capacity <= 0:
+        raise HTTPException(status_code=400, detail="Jumlah & kapasitas kendaraan harus lebih dari 0")
+
+    try:
+        windows = {w.vendor_id: (w.start, w.end) for w in plan.time_windows}
+        result = await plan_pickup_routes(
+            current_user["user_id"], plan.vehicles, plan.vehicle_capacity,
+            plan.start_time, plan.end_time, windows
+        )
+    except ValueError as e:
+        # Format jam sudah dicek model; ini pesan dari planner (koordinat, jam buka, kapasitas)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return {"status": "success", **result}
+
 @app.post("/api/kitchen/cook")
 async def cook_meal_endpoint(request: Request, req_data: CookRequest, current_user: dict = Depends(get_current_user)):
     """
@@ -360,7 +475,7 @@ async def cook_meal_endpoint(request: Request, req_data: CookRequest, current_us
         
     try:
         # Panggil logic service
-        result = cook_meal(req_data.menu_name, req_data.qty_produced, req_data.ingredients_ids)
+        result = await cook_meal(req_data.menu_name, req_data.qty_produced, req_data.ingredients_ids)
         if "error" in result:
              raise HTTPException(status_code=500, detail=result["error"])
         return result
@@ -373,7 +488,7 @@ async def get_cooked_meals(request: Request):
     Ambil riwayat masakan yang sudah diproduksi (untuk monitoring expiry).
     """
     try:
-        response = supabase.table("meal_productions").select("*").order("created_at", desc=True).execute()
+        response = await execute(db.table("meal_productions").select("*").order("created_at", desc=True))
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -391,9 +506,11 @@ async def analyze_image(request: Request, file: UploadFile = File(...)):
     """
     try:
         image_bytes = await file.read()
-        # Jalankan di threadpool biar tidak blocking
-        result = await run_in_threadpool(analyze_market_inventory, image_bytes)
+        # Async: nunggu LLM tidak memakai thread (resize gambar saja yang di threadpool)
+        result = await analyze_market_inventory(image_bytes)
         return result
+    except LLMBusyError:
+        raise
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"AI Error: {str(e)}")
@@ -407,8 +524,10 @@ async def scan_meal(request: Request, file: UploadFile = File(...)):
     """
     try:
         image_bytes = await file.read()
-        result = await run_in_threadpool(analyze_cooked_meal, image_bytes)
+        result = await analyze_cooked_meal(image_bytes)
         return result
+    except LLMBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -432,52 +551,185 @@ async def recommend_menu_endpoint(request: Request, request_data: MenuRequest):
     """
     AI Text: Rekomendasi Menu dari Stok.
     """
-    result = await run_in_threadpool(generate_menu_recommendation, request_data.ingredients)
+    result = await generate_menu_recommendation(request_data.ingredients)
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
     return result
 
+@app.post("/api/recommend-menu/stream")
+@limiter.limit("10/minute")
+async def recommend_menu_stream_endpoint(request: Request, request_data: MenuRequest):
+    """
+    AI Text (SSE): Rekomendasi Menu, dikirim per menu begitu selesai ditulis model.
+    Event: start -> recommendation (berulang) -> done | error | busy.
+    """
+    return StreamingResponse(
+        sse_stream(stream_menu_recommendation(request_data.ingredients)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 # ==========================================
 # 🌍 BAGIAN 5: DASHBOARD & PENCARIAN
 # ==========================================
 
 @app.get("/api/supplies")
-async def get_all_supplies(request: Request, skip: int = 0, limit: int = 100):
+async def get_all_supplies(
+    request: Request,
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    view: str = "full",
+    skip: int = 0
+):
     """
     Melihat semua stok di pasar (Katalog Belanja Kitchen).
     Tidak perlu login biar Kitchen bisa browsing dulu.
+    - `cursor`: token dari header `X-Next-Cursor` halaman sebelumnya (keyset pagination).
+    - `view=compact`: hanya kolom untuk tampilan list (tanpa ai_notes, photo_url).
+    - `skip`: offset lama, masih didukung untuk klien lama (lambat di halaman dalam).
     """
+    if view not in ("full", "compact"):
+        raise HTTPException(status_code=400, detail="view harus 'full' atau 'compact'")
+
     try:
-        response = supabase.table("supplies").select("*")\
-            .order("created_at", desc=True)\
-            .range(skip, skip + limit - 1)\
-            .execute()
-        return response.data
+        rows, next_cursor = await list_market_supplies(cursor, limit, view == "compact", skip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    # Body tetap array biar frontend lama gak rusak; token halaman berikutnya di header
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
 @app.get("/api/suppliers/search")
-async def find_suppliers(request: Request, q: str, lat: float = -6.175392, long: float = 106.827153):
+async def find_suppliers(
+    request: Request,
+    q: str,
+    lat: float = -6.175392,
+    long: float = 106.827153,
+    radius_km: float = 50,
+    limit: int = 50
+):
     """
     Cari supplier berdasarkan keyword & lokasi terdekat.
+    - `radius_km`: hanya supplier dalam radius ini.
+    - `limit`: jumlah supplier terdekat yang dikembalikan (maks 200).
     """
-    results = search_suppliers(q, lat, long)
+    if radius_km <= 0:
+        raise HTTPException(status_code=400, detail="radius_km harus lebih dari 0")
+
+    results = await search_suppliers(q, lat, long, radius_km, limit)
     if isinstance(results, dict) and "error" in results:
         raise HTTPException(status_code=500, detail=results["error"])
     return {"status": "success", "count": len(results), "data": results}
 
+@app.get("/api/geocode")
+async def geocode_address(request: Request, address: str):
+    """
+    Alamat -> perkiraan koordinat (centroid kelurahan/kecamatan, gazetteer offline).
+    Buat preview lokasi di form register / profil.
+    """
+    location = geocoder.geocode(address)
+    if location is None:
+        raise HTTPException(status_code=404, detail="Wilayah tidak dikenali dari alamat ini")
+    return {"status": "success", "data": location}
+
+@app.get("/api/map/tiles/{z}/{x}/{y}")
+async def map_tile(request: Request, z: int, x: int, y: int):
+    """
+    Cluster + density supply untuk satu tile peta (XYZ / Web Mercator).
+    Frontend cukup minta tile yang kelihatan, bukan semua titik supply.
+    """
+    if not geoindex.is_ready():
+        raise HTTPException(status_code=503, detail="Index peta belum siap, coba lagi sebentar")
+    tile = maptiles.get_tile(z, x, y)
+    if "error" in tile:
+        raise HTTPException(status_code=400, detail=tile["error"])
+    return {"status": "success", "data": tile}
+
+@app.post("/api/suppliers/resolve")
+async def resolve_suppliers(request: Request, body: ResolveIngredientsRequest):
+    """
+    Cari vendor untuk semua bahan satu menu sekaligus (pengganti N kali /api/suppliers/search).
+    Return vendor terdekat per bahan + rencana belanja dengan jumlah vendor paling sedikit.
+    """
+    if body.radius_km <= 0:
+        raise HTTPException(status_code=400, detail="radius_km harus lebih dari 0")
+
+    result = await resolve_ingredients(body.ingredients, body.lat, body.long, body.radius_km, body.vendors_per_ingredient)
+    if "error" in result:
+        status_code = 500 if result["error"].startswith("Gagal") else 400
+        raise HTTPException(status_code=status_code, detail=result["error"])
+    return {"status": "success", "data": result}
+
+@app.get("/api/items/suggest")
+async def suggest_items(request: Request, prefix: str = "", limit: int = 10):
+    """
+    Autocomplete nama barang (dipanggil tiap ketikan).
+    Dilayani dari trie in-memory, urut quantity tersedia terbanyak.
+    """
+    limit = max(1, min(limit, suggest.TOP_K))
+    if suggest.is_ready():
+        return {"status": "success", "data": suggest.suggest(prefix, limit)}
+
+    # Trie belum siap (server baru start): pakai pencarian DB sekali ini
+    try:
+        rows = await search.search_item_names(prefix, limit) if prefix.strip() else []
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "status": "success",
+        "data": [{"item_name": r['item_name'], "available_qty": r['total_qty']} for r in rows]
+    }
+
+@app.get("/api/items/search")
+async def search_items(request: Request, q: str, limit: int = 20):
+    """
+    Cari nama barang (toleran typo & sinonim lokal, misal "cabe" -> "cabai").
+    Hasil diurutkan berdasarkan relevansi.
+    """
+    limit = max(1, min(limit, 100))
+    try:
+        results = await search.search_item_names(q, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "success", "count": len(results), "data": results}
+
 @app.get("/api/sppg/search")
 async def find_nearest_sppg(request: Request, lat: float, long: float):
     """
     Vendor mencari lokasi Kitchen/SPPG terdekat.
     """
-    results = search_nearest_sppg(lat, long)
+    try:
+        results = await search_nearest_sppg(lat, long)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
     return {"status": "success", "data": results}
 
+@app.get("/api/sppg/assignment")
+async def get_my_sppg_assignment(current_user: dict = Depends(get_current_user)):
+    """
+    SPPG tujuan setor stok hampir expired untuk vendor yang login.
+    Dihitung di background oleh sweeper expiry (kapasitas harian SPPG dihormati).
+    """
+    if current_user["role"] != "vendor":
+        raise HTTPException(status_code=403, detail="Hanya vendor yang punya penugasan SPPG")
+    return {"status": "success", "data": sppg.get_assignment(current_user["user_id"])}
+
+@app.get("/api/sppg/assignments")
+async def get_sppg_assignments_summary(current_user: dict = Depends(get_current_user)):
+    """
+    Ringkasan penugasan terakhir: jumlah vendor ter-assign, yang tidak kebagian, beban per SPPG.
+    """
+    return {"status": "success", "data": sppg.get_assignment_summary()}
+
 # --- ANALYTICS ---
 @app.get("/api/analytics/kitchen")
 async def kitchen_analytics_endpoint(request: Request):
-    result = get_kitchen_analytics()
+    result = await get_kitchen_analytics()
     if "error" in result: raise HTTPException(status_code=500, detail=result["error"])
     return result
 
@@ -488,11 +740,26 @@ async def vendor_analytics_endpoint(request: Request, current_user: dict = Depen
         raise HTTPException(status_code=403, detail="Akses ditolak")
 
     # Kirim user_id ke fungsi analytics
-    result = get_vendor_analytics(current_user["user_id"])
+    result = await get_vendor_analytics(current_user["user_id"])
     
     if "error" in result: 
         raise HTTPException(status_code=500, detail=result["error"])
     return result
+@app.get("/api/metrics/cache")
+async def cache_metrics_endpoint(request: Request):
+    """
+    Statistik hit/miss semua cache in-process (per worker).
+    """
+    # Cache disk (SQLite) ikut dihitung -> jangan blocking di event loop
+    return await run_in_threadpool(get_cache_stats)
+
+@app.get("/api/metrics/llm")
+async def llm_metrics_endpoint(request: Request):
+    """
+    Statistik panggilan LLM per model: antrean, in-flight, rata-rata durasi (per worker).
+    """
+    return get_llm_stats()
+
 # ==========================================
 # 📡 BAGIAN 6: IOT & NOTIFIKASI
 # ==========================================
@@ -506,7 +773,7 @@ async def log_iot_data(request: Request, data: IoTLogRequest):
             "humidity": data.humidity,
             "device_id": data.device_id
         }
-        response = supabase.table("storage_logs").insert(payload).execute()
+        response = await execute(db.table("storage_logs").insert(payload))
         return {"status": "success", "data": response.data}
     except Exception as e:
         return {"status": "error", "detail": str(e)}
@@ -515,7 +782,7 @@ async def log_iot_data(request: Request, data: IoTLogRequest):
 async def get_iot_logs(request: Request):
     try:
         # 1. Ambil logs asli dari DB
-        response = supabase.table("storage_logs").select("*").order("created_at", desc=True).limit(50).execute()
+        response = await execute(db.table("storage_logs").select("*").order("created_at", desc=True).limit(50))
         logs = response.data
         
         # 2. Cek apakah logs kosong atau sudah "basi" (Sensor Offline > 1 menit)
@@ -561,9 +828,9 @@ async def get_iot_logs(request: Request):
             }
             # Insert ke DB
             try:
-                supabase.table("storage_logs").insert(payload).execute()
+                await execute(db.table("storage_logs").insert(payload))
                 # Ambil lagi logs terbaru
-                response = supabase.table("storage_logs").select("*").order("created_at", desc=True).limit(50).execute()
+                response = await execute(db.table("storage_logs").select("*").order("created_at", desc=True).limit(50))
                 logs = response.data
             except Exception as insert_err:
                  print(f"❌ Failed to insert dummy: {insert_err}")
@@ -579,12 +846,14 @@ async def get_iot_logs(request: Request):
         return {"logs": []}
 
 @app.post("/api/notifications/trigger")
-def trigger_expiry_notifications(request: Request):
+async def trigger_expiry_notifications(request: Request):
     """
-    Cron job untuk cek barang mau busuk.
+    Hasil cek barang mau busuk.
+    Scan-nya dijalankan sweeper terjadwal di background (EXPIRY_SWEEP_INTERVAL_SECONDS);
+    endpoint ini hanya membaca hasil sweep terakhir.
     """
     try:
-        return check_expiry_and_notify()
+        return await check_expiry_and_notify()
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
@@ -608,7 +877,8 @@ async def google_login(data: GoogleLoginRequest):
     
     try:
         # 1. Verifikasi Token ke Server Google
-        id_info = id_token.verify_oauth2_token(token, google_requests.Request(), client_id)
+        # Verifikasi pakai HTTP sync (ambil cert Google) -> threadpool
+        id_info = await run_in_threadpool(id_token.verify_oauth2_token, token, google_requests.Request(), client_id)
         
         # Ambil data profil dari Google
         email = id_info['email']
@@ -616,7 +886,7 @@ async def google_login(data: GoogleLoginRequest):
         google_sub = id_info['sub'] # ID unik Google user
         
         # 2. Cek apakah user sudah ada di Database
-        res = supabase.table("users").select("*").eq("email", email).execute()
+        res = await execute(db.table("users").select("*").eq("email", email))
         user = res.data[0] if res.data else None
         
         if not user:
@@ -625,12 +895,13 @@ async def google_login(data: GoogleLoginRequest):
                 "full_name": name,
                 "email": email,
                 "username": email.split("@")[0], # Pakai nama depan email sbg username
-                "password": get_password_hash(f"GOOGLE_{google_sub}"), # Password dummy acak yg kuat
+                "password": await run_in_threadpool(get_password_hash, f"GOOGLE_{google_sub}"), # Password dummy acak yg kuat
                 "role": data.role, # Role diambil dari pilihan user di frontend
-                "latitude": -6.175392, # Default
-                "longitude": 106.827153
+                # Google tidak memberi alamat: lokasi dibiarkan kosong sampai user isi profil
+                "latitude": None,
+                "longitude": None
             }
-            insert_res = supabase.table("users").insert(new_user_data).execute()
+            insert_res = await execute(db.table("users").insert(new_user_data))
             user = insert_res.data[0]
             
         # 4. Generate Token Aplikasi (Sama seperti login biasa)
@@ -668,7 +939,24 @@ async def chat_chef_endpoint(request: Request, chat_data: ChatRequest, current_u
         
     try:
         # Panggil fungsi chat_with_chef yang baru
-        result = await run_in_threadpool(chat_with_chef, chat_data.message, current_user["user_id"])
+        result = await chat_with_chef(chat_data.message, current_user["user_id"])
         return result
+    except LLMBusyError:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/kitchen/chat/stream")
+async def chat_chef_stream_endpoint(request: Request, chat_data: ChatRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Chatbot AI Chef (SSE): jawaban dikirim per potongan token.
+    Event: start -> delta (berulang) -> done | error | busy.
+    """
+    if current_user["role"] != "kitchen":
+        raise HTTPException(status_code=403, detail="Akses ditolak")
+
+    return StreamingResponse(
+        sse_stream(stream_chat_with_chef(chat_data.message, current_user["user_id"])),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
\ No newline at end of file
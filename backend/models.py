@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+import re
+from pydantic import BaseModel, field_validator
 from typing import Optional, List
 
 # ==========================================
@@ -27,6 +28,14 @@ class GoogleLoginRequest(BaseModel):
     token: str
     role: str = "vendor" # Default role jika user baru
 
+class UserProfileUpdate(BaseModel):
+    # Semua opsional: hanya field yang dikirim yang di-update
+    full_name: Optional[str] = None
+    phone_number: Optional[str] = None
+    address: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
 # ==========================================
 # 📦 2. SUPPLY CHAIN MODELS (STOK)
 # ==========================================
@@ -61,6 +70,13 @@ class SupplyItem(BaseModel):
 class MenuRequest(BaseModel):
     ingredients: List[str] # Contoh: ["Bayam", "Tahu"]
 
+class ResolveIngredientsRequest(BaseModel):
+    ingredients: List[str]             # Contoh: ingredients_needed dari rekomendasi menu ["Ayam 5 kg", "Beras 10 kg"]
+    lat: float = -6.175392             # Lokasi dapur
+    long: float = 106.827153
+    radius_km: float = 50
+    vendors_per_ingredient: int = 5    # Maks 10
+
 class OrderRequest(BaseModel):
     supply_id: int
     qty_ordered: int
@@ -70,6 +86,29 @@ class OrderRequest(BaseModel):
 class OrderStatusUpdate(BaseModel):
     status: str # 'confirmed', 'completed', 'pending'
 
+_HHMM = re.compile(r"^([01]?\d|2[0-3]):[0-5]\d$")
+
+def _check_hhmm(value: str) -> str:
+    if not _HHMM.match(value):
+        raise ValueError("Format jam harus HH:MM")
+    return value
+
+class VendorTimeWindow(BaseModel):
+    vendor_id: int
+    start: str  # Contoh: "07:00" (vendor buka)
+    end: str    # Contoh: "10:00" (barang harus sudah diambil)
+
+    _check_time = field_validator("start", "end")(_check_hhmm)
+
+class RoutePlanRequest(BaseModel):
+    vehicles: int = 1                  # Jumlah kendaraan jemput
+    vehicle_capacity: float = 300      # Muatan maks per kendaraan (kg / satuan dasar bahan)
+    start_time: str = "06:00"          # Berangkat dari dapur
+    end_time: str = "17:00"            # Harus sudah kembali ke dapur
+    time_windows: List[VendorTimeWindow] = []  # Vendor lain dianggap buka start_time..end_time
+
+    _check_time = field_validator("start_time", "end_time")(_check_hhmm)
+
 class CookRequest(BaseModel):
     menu_name: str
     qty_produced: int
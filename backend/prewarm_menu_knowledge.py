@@ -0,0 +1,53 @@
+# backend/prewarm_menu_knowledge.py
+# Job sekali jalan: isi tabel menu_knowledge (umur simpan + nutrisi) untuk daftar menu standar,
+# supaya POST /api/kitchen/cook untuk menu-menu ini tidak perlu menunggu AI.
+# Pakai: python prewarm_menu_knowledge.py [file_menu]   (default: data/standard_menus.txt)
+# Menu yang sudah ada di tabel dilewati, jadi aman dijalankan berulang.
+# Butuh sql/008_menu_knowledge.sql. Server memuat ulang tabelnya berkala (atau restart).
+import asyncio
+import sys
+from database import close_db
+from config import BASE_DIR
+from services import menu_knowledge
+from services.clients import close_llm
+from services.kitchen import calculate_meal_expiry
+
+DEFAULT_MENU_FILE = BASE_DIR / "data" / "standard_menus.txt"
+# Panggilan AI paralel (tetap dibatasi juga oleh LLM_MAX_CONCURRENCY)
+PARALLEL = 4
+
+def read_menus(path) -> list:
+    menus, seen = [], set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            name = line.split("#", 1)[0].strip()
+            slug = menu_knowledge.menu_slug(name)
+            if slug and slug not in seen:
+                seen.add(slug)
+                menus.append(name)
+    return menus
+
+async def prewarm(path):
+    await menu_knowledge.load_knowledge()
+    menus = read_menus(path)
+    todo = [name for name in menus if menu_knowledge.lookup(name) is None]
+    print(f"🍲 {len(menus)} menu standar, {len(menus) - len(todo)} sudah dikenal, {len(todo)} dianalisis AI...")
+
+    slots = asyncio.Semaphore(PARALLEL)
+
+    async def analyze(name):
+        async with slots:
+            await calculate_meal_expiry(name)
+
+    await asyncio.gather(*(analyze(name) for name in todo))
+
+    # calculate_meal_expiry hanya menyimpan hasil AI yang valid
+    failed = [name for name in todo if menu_knowledge.lookup(name) is None]
+    print(f"🏁 Selesai. {len(todo) - len(failed)} menu baru tersimpan.")
+    if failed:
+        print(f"⚠️ Gagal dianalisis (jalankan ulang nanti): {', '.join(failed)}")
+    await close_llm()
+    await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(prewarm(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MENU_FILE))
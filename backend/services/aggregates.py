@@ -0,0 +1,240 @@
+import time
+from collections import defaultdict
+from . import events, ingredients
+from .clients import db, execute
+
+# ==========================================
+# 📊 AGGREGATE STORE (WRITE-THROUGH)
+# Total berjalan per item & per vendor, di-update tiap ada write
+# (create_supplies, cook_meal, create_order, update_order_status).
+# Read analytics jadi lookup langsung, tanpa scan tabel.
+# Job reconcile periodik menghitung ulang semuanya dari DB (RPC
+# aggregate_snapshot, sql/009) untuk membetulkan drift (worker lain, write yang
+# gagal di-publish, dll).
+# ==========================================
+
+# Per (bahan kanonik, satuan, converted); data lama tanpa id pakai item_name.
+# Bentuk baris sama dengan RPC kitchen_analytics_by_item: quantity dalam satuan dasar,
+# kecuali grup converted=False (satuan mentah yang belum ada di ingredient_units).
+_ITEM_TOTALS = {}
+# Per vendor: bucket kesehatan stok + penjualan per item + jumlah order per status
+_VENDOR_TOTALS = {}
+
+# "pending" = list event (nama, rows) yang masuk selama reconcile berjalan,
+# di-replay ke snapshot baru sebelum ditukar (None kalau tidak sedang reconcile)
+_STATE = {"ready": False, "last_reconcile": None, "pending": None}
+
+def _new_item(ingredient_id, name, unit, converted):
+    return {
+        "ingredient_id": ingredient_id,
+        "item_name": name,
+        "unit": unit,
+        "converted": converted,
+        "item_count": 0,
+        "total_qty": 0,
+        "fresh_qty": 0,
+        "warning_qty": 0,
+        "critical_qty": 0,
+        "warning_items": 0
+    }
+
+def _new_vendor():
+    return {
+        "fresh": 0,
+        "warning": 0,
+        "expired": 0,
+        "sales": defaultdict(int),
+        "order_status": defaultdict(int)
+    }
+
+def _order_item_name(order: dict) -> str:
+    # Sama dengan logic lama get_vendor_analytics
+    if order.get('supplies'):
+        return order['supplies'].get('item_name') or 'Unknown'
+    if order.get('supply_name'):
+        return order['supply_name']
+    return "Unknown"
+
+def _item_key(ingredient_id, item_name, unit, converted):
+    return (ingredient_id if ingredient_id is not None else item_name, unit, converted)
+
+def _apply_supply(items: dict, vendors: dict, supply: dict, sign: int):
+    ingredient_id = supply.get('canonical_item_id')
+    qty, unit, converted = ingredients.supply_unit(supply)
+    # Satuan yang belum bisa dikonversi jadi grup sendiri (jangan dijumlah ke satuan dasar)
+    key = _item_key(ingredient_id, supply['item_name'], unit, converted)
+    days = supply.get('expiry_days') or 0
+
+    # --- Bucket dashboard Kitchen (critical <= 2, warning <= 5) ---
+    totals = items.get(key)
+    if totals is None:
+        totals = items[key] = _new_item(ingredient_id, ingredients.supply_name(supply), unit, converted)
+    totals["item_count"] += sign
+    totals["total_qty"] += sign * qty
+    if days <= 2:
+        totals["critical_qty"] += sign * qty
+    elif days <= 5:
+        totals["warning_qty"] += sign * qty
+    else:
+        totals["fresh_qty"] += sign * qty
+    if days <= 3:
+        totals["warning_items"] += sign
+    if totals["item_count"] <= 0:
+        del items[key]
+
+    # --- Bucket dashboard Vendor (expired <= 0, warning <= 5) ---
+    uid = supply.get('user_id')
+    if uid is None:
+        return
+    vendor = vendors.get(uid)
+    if vendor is None:
+        vendor = vendors[uid] = _new_vendor()
+    if days <= 0:
+        vendor["expired"] += sign
+    elif days <= 5:
+        vendor["warning"] += sign
+    else:
+        vendor["fresh"] += sign
+
+def _apply_order(vendors: dict, order: dict):
+    seller_id = order.get('seller_id')
+    if seller_id is None:
+        return
+    vendor = vendors.get(seller_id)
+    if vendor is None:
+        vendor = vendors[seller_id] = _new_vendor()
+    vendor["sales"][_order_item_name(order)] += order.get('qty_ordered') or 0
+    vendor["order_status"][order.get('status')] += 1
+
+def _apply_status_change(vendors: dict, order: dict):
+    # previous_status diisi route update_order_status (status sebelum update)
+    previous = order.get('previous_status')
+    vendor = vendors.get(order.get('seller_id'))
+    if previous is None or vendor is None or previous == order.get('status'):
+        return
+    vendor["order_status"][previous] -= 1
+    vendor["order_status"][order.get('status')] += 1
+
+def _apply_event(items: dict, vendors: dict, event: str, rows: list):
+    for row in rows:
+        if event == events.SUPPLIES_ADDED:
+            _apply_supply(items, vendors, row, +1)
+        elif event == events.SUPPLIES_REMOVED:
+            _apply_supply(items, vendors, row, -1)
+        elif event == events.ORDER_CREATED:
+            _apply_order(vendors, row)
+        elif event == events.ORDER_UPDATED:
+            _apply_status_change(vendors, row)
+
+# --- Handler event write ---
+
+def _handle(event: str, rows: list):
+    _apply_event(_ITEM_TOTALS, _VENDOR_TOTALS, event, rows)
+    if _STATE["pending"] is not None:
+        _STATE["pending"].append((event, rows))
+
+def on_supplies_added(rows: list):
+    _handle(events.SUPPLIES_ADDED, rows)
+
+def on_supplies_removed(rows: list):
+    _handle(events.SUPPLIES_REMOVED, rows)
+
+def on_order_created(rows: list):
+    _handle(events.ORDER_CREATED, rows)
+
+def on_order_updated(rows: list):
+    _handle(events.ORDER_UPDATED, rows)
+
+events.subscribe(events.SUPPLIES_ADDED, on_supplies_added)
+events.subscribe(events.SUPPLIES_REMOVED, on_supplies_removed)
+events.subscribe(events.ORDER_CREATED, on_order_created)
+events.subscribe(events.ORDER_UPDATED, on_order_updated)
+
+# --- Read API ---
+
+def is_ready() -> bool:
+    """True kalau store sudah pernah di-reconcile (aman dipakai untuk read)."""
+    return _STATE["ready"]
+
+def get_item_totals() -> list:
+    """Baris agregat per bahan kanonik (format sama dengan RPC kitchen_analytics_by_item)."""
+    return list(_ITEM_TOTALS.values())
+
+def get_vendor_totals(user_id: int) -> dict:
+    """Counter milik satu vendor (kosong kalau vendor belum punya stok/order)."""
+    return _VENDOR_TOTALS.get(user_id) or _new_vendor()
+
+# --- Reconcile ---
+
+def _build_snapshot(item_rows: list, health_rows: list, order_rows: list):
+    items, vendors = {}, {}
+    for row in item_rows:
+        key = _item_key(row['ingredient_id'], row['item_name'], row['unit'], row['converted'])
+        totals = items[key] = _new_item(row['ingredient_id'], row['item_name'], row['unit'], row['converted'])
+        for field in ("item_count", "total_qty", "fresh_qty", "warning_qty", "critical_qty", "warning_items"):
+            totals[field] = row[field] or 0
+    for row in health_rows:
+        vendor = vendors.setdefault(row['user_id'], _new_vendor())
+        vendor["fresh"], vendor["warning"], vendor["expired"] = row['fresh'], row['warning'], row['expired']
+    for row in order_rows:
+        vendor = vendors.setdefault(row['seller_id'], _new_vendor())
+        vendor["sales"][row['item_name']] += row['qty_ordered'] or 0
+        vendor["order_status"][row['status']] += row['order_count']
+    return items, vendors
+
+# Insert yang terjadi selama snapshot: id-nya dicek ke daftar id baru dari snapshot
+# (RECENT_SECONDS terakhir). Hapus/update tidak bisa dicek begitu -> snapshot diulang.
+SNAPSHOT_RECENT_SECONDS = 300
+MAX_SNAPSHOT_ATTEMPTS = 3
+_INSERT_EVENTS = {events.SUPPLIES_ADDED: "recent_supply_ids", events.ORDER_CREATED: "recent_order_ids"}
+
+async def reconcile():
+    """
+    Hitung ulang semua counter dari DB lalu tukar sekaligus (repair drift).
+    Agregasi dikerjakan database (RPC aggregate_snapshot, satu statement = satu snapshot),
+    bukan scan semua baris di worker.
+    Event yang masuk selama snapshot berjalan:
+    - insert (supplies/orders) di-replay hanya kalau id-nya belum ada di snapshot (idempotent)
+    - hapus/update status -> tidak bisa tahu sudah ikut snapshot atau belum, snapshot diulang
+    """
+    if _STATE["pending"] is not None:
+        print("⚠️ Reconcile aggregates masih berjalan, dilewati")
+        return
+    started = time.perf_counter()
+    if not ingredients.is_loaded():
+        await ingredients.load_catalog()
+
+    for attempt in range(1, MAX_SNAPSHOT_ATTEMPTS + 1):
+        _STATE["pending"] = []
+        try:
+            res = await execute(db.rpc("aggregate_snapshot", {"recent_seconds": SNAPSHOT_RECENT_SECONDS}))
+            pending = _STATE["pending"]
+        finally:
+            _STATE["pending"] = None
+        # Tidak ada await dari sini sampai swap: event baru tidak bisa menyelip
+        if all(event in _INSERT_EVENTS for event, _ in pending):
+            break
+        print(f"⚠️ Ada hapus/update selama snapshot aggregates, ulangi ({attempt}/{MAX_SNAPSHOT_ATTEMPTS})")
+    else:
+        print("⚠️ Reconcile aggregates dilewati (write terus masuk), counter lama tetap dipakai")
+        return
+
+    snapshot = res.data or {}
+    items, vendors = _build_snapshot(
+        snapshot.get("items") or [], snapshot.get("vendor_health") or [], snapshot.get("vendor_orders") or []
+    )
+    seen = {event: set(snapshot.get(field) or []) for event, field in _INSERT_EVENTS.items()}
+    replayed = 0
+    for event, rows in pending:
+        missing = [row for row in rows if row.get('id') not in seen[event]]
+        replayed += len(missing)
+        _apply_event(items, vendors, event, missing)
+
+    global _ITEM_TOTALS, _VENDOR_TOTALS
+    _ITEM_TOTALS, _VENDOR_TOTALS = items, vendors
+    _STATE["ready"] = True
+    _STATE["last_reconcile"] = time.time()
+    events.publish(events.AGGREGATES_RECONCILED, None)
+
+    print(f"📊 Aggregates reconciled: {len(items)} item groups, {len(vendors)} vendors, "
+          f"{replayed} insert di-replay ({(time.perf_counter() - started) * 1000:.0f} ms)")
@@ -1,116 +1,154 @@
-from .clients import supabase
+from .clients import db, execute
+from . import aggregates, events
+from .cache import TTLCache
+from config import VENDOR_ANALYTICS_CACHE_TTL
 from collections import defaultdict
 from datetime import datetime, timedelta
 
-def get_kitchen_analytics():
+# Payload dashboard per vendor. Di-invalidate tepat saat supplies/orders vendor itu berubah;
+# TTL hanya jaring pengaman untuk write dari worker lain.
+_VENDOR_ANALYTICS_CACHE = TTLCache("vendor_analytics", max_entries=5000, ttl_seconds=VENDOR_ANALYTICS_CACHE_TTL)
+
+def _invalidate_vendors(rows: list, key: str):
+    for row in rows:
+        if row.get(key) is not None:
+            _VENDOR_ANALYTICS_CACHE.invalidate(row[key])
+
+events.subscribe(events.SUPPLIES_ADDED, lambda rows: _invalidate_vendors(rows, "user_id"))
+events.subscribe(events.SUPPLIES_REMOVED, lambda rows: _invalidate_vendors(rows, "user_id"))
+events.subscribe(events.ORDER_CREATED, lambda rows: _invalidate_vendors(rows, "seller_id"))
+events.subscribe(events.ORDER_UPDATED, lambda rows: _invalidate_vendors(rows, "seller_id"))
+# Counter dihitung ulang -> semua payload bisa berubah
+events.subscribe(events.AGGREGATES_RECONCILED, lambda _: _VENDOR_ANALYTICS_CACHE.clear())
+
+async def get_kitchen_analytics():
     """
     Aggregates data for SPPG Dashboard (Streamlit Style).
-    1. Composition (Pie): Item Name vs Quantity
-    2. Quality (Bar): Item Name vs Quantity (colored by status?) - Simplified to just Quantity per Item for now, or stacked if possible.
-    3. Metrics: Total Items, Total Qty, Warning Count
+    1. Composition (Pie): Item Name vs Quantity (per bahan kanonik, satuan dasar `unit`)
+    2. Quality (Bar): Item Name vs Quantity per freshness bucket (fresh/warning/critical)
+    3. Metrics: Total Items, Total Qty, Warning Count, Unconverted Count
+    4. Unconverted: stok yang satuannya belum bisa dikonversi, per (item, satuan mentah).
+       Tidak ikut chart & total_qty supaya satuan tidak tercampur.
+    Baris per item diambil dari aggregate store in-memory; sebelum store siap,
+    fallback ke RPC kitchen_analytics_by_item (grouping di database).
     """
     try:
-        # Fetch all supplies (Kitchen sees global stock in market)
-        response = supabase.table("supplies").select("*").execute()
-        items = response.data
+        if aggregates.is_ready():
+            # Counter write-through (lihat services/aggregates.py)
+            rows = aggregates.get_item_totals()
+        else:
+            response = await execute(db.rpc("kitchen_analytics_by_item"))
+            rows = response.data
         
-        if not items:
+        if not rows:
             return {
-                "metrics": {"total_items": 0, "total_qty": 0, "warning_count": 0},
+                "metrics": {"total_items": 0, "total_qty": 0, "warning_count": 0, "unconverted_count": 0},
                 "composition": [],
-                "quality": []
+                "quality": [],
+                "unconverted": []
             }
 
-        # 1. Metrics
-        total_items = len(items)
-        total_qty = sum(item['quantity'] for item in items)
+        converted = [row for row in rows if row['converted']]
+        unconverted = [row for row in rows if not row['converted']]
+
+        # 1. Metrics (jumlahkan hasil agregasi per item)
+        total_items = sum(row['item_count'] for row in rows)
+        total_qty = round(sum(row['total_qty'] for row in converted), 2)
         # Warning count: expiry_days <= 3
-        warning_count = sum(1 for item in items if item.get('expiry_days', 0) <= 3)
+        warning_count = sum(row['warning_items'] for row in rows)
+        unconverted_count = sum(row['item_count'] for row in unconverted)
 
         # 2. Composition (Pie Chart Data)
-        # Group by item_name
-        composition_map = defaultdict(int)
-        for item in items:
-            composition_map[item['item_name']] += item['quantity']
-        
         composition_data = [
-            {"name": name, "value": qty} 
-            for name, qty in composition_map.items()
+            {"name": row['item_name'], "value": round(row['total_qty'], 2), "unit": row['unit']}
+            for row in converted
         ]
         # Sort by value desc
         composition_data.sort(key=lambda x: x['value'], reverse=True)
 
-        # 3. Quality/Quantity (Bar Chart Data)
-        # For simplicity in Recharts, we'll just show the same grouped data but maybe add status info if needed.
-        # Streamlit used: x='item_name', y='quantity', color='quality_status'
-        # To do this in Recharts, we need data like: { name: "Bayam", fresh: 10, warning: 5, critical: 0 }
-        
-        quality_map = defaultdict(lambda: {"fresh": 0, "warning": 0, "critical": 0})
-        
-        for item in items:
-            name = item['item_name']
-            days = item.get('expiry_days', 0)
-            qty = item['quantity']
-            
-            if days <= 2:
-                quality_map[name]["critical"] += qty
-            elif days <= 5:
-                quality_map[name]["warning"] += qty
-            else:
-                quality_map[name]["fresh"] += qty
-                
-        quality_data = []
-        for name, counts in quality_map.items():
-            quality_data.append({
-                "name": name,
-                "fresh": counts["fresh"],
-                "warning": counts["warning"],
-                "critical": counts["critical"],
-                "total": counts["fresh"] + counts["warning"] + counts["critical"]
-            })
-            
+        # 3. Quality/Quantity (Stacked Bar Chart Data)
+        # Format Recharts: { name: "Bayam", fresh: 10, warning: 5, critical: 0, total: 15 }
+        quality_data = [
+            {
+                "name": row['item_name'],
+                "unit": row['unit'],
+                "fresh": round(row['fresh_qty'], 2),
+                "warning": round(row['warning_qty'], 2),
+                "critical": round(row['critical_qty'], 2),
+                "total": round(row['fresh_qty'] + row['warning_qty'] + row['critical_qty'], 2)
+            }
+            for row in converted
+        ]
         quality_data.sort(key=lambda x: x['total'], reverse=True)
 
+        # 4. Unconverted (quantity dalam satuan mentahnya sendiri)
+        unconverted_data = [
+            {
+                "name": row['item_name'],
+                "unit": row['unit'],
+                "item_count": row['item_count'],
+                "qty": round(row['total_qty'], 2)
+            }
+            for row in unconverted
+        ]
+        unconverted_data.sort(key=lambda x: x['item_count'], reverse=True)
+
         return {
             "metrics": {
                 "total_items": total_items,
                 "total_qty": total_qty,
-                "warning_count": warning_count
+                "warning_count": warning_count,
+                "unconverted_count": unconverted_count
             },
             "composition": composition_data, # For Pie Chart
-            "quality": quality_data          # For Stacked Bar Chart
+            "quality": quality_data,         # For Stacked Bar Chart
+            "unconverted": unconverted_data  # Satuan belum ada di ingredient_units
         }
 
     except Exception as e:
         print(f"Error getting kitchen analytics: {e}")
         return {"error": str(e)}
 
-def get_vendor_analytics(user_id: int):
+class _AnalyticsError(Exception):
+    def __init__(self, result: dict):
+        super().__init__(result.get("error"))
+        self.result = result
+
+async def get_vendor_analytics(user_id: int):
     """
     Aggregates data for Vendor Dashboard.
     FILTERED BY USER ID (Private Data).
     1. Inventory Health: Count Fresh/Warning/Expired
     2. Expiry Risk: Pie Chart
     3. Top Sales: Bar Chart (from Orders)
+    Hasil di-cache per vendor (dashboard vendor sering polling).
     """
+    async def load():
+        result = await _compute_vendor_analytics(user_id)
+        if "error" in result:
+            # Error tidak di-cache, tapi tetap diteruskan ke request yang ikut menunggu
+            raise _AnalyticsError(result)
+        return result
+
+    # get_or_load: polling paralel digabung jadi satu hitungan, dan hasil yang
+    # sudah di-invalidate selagi dihitung tidak ikut masuk cache
     try:
-        # --- Inventory Health & Expiry Risk (FILTERED) ---
-        # Hanya ambil barang milik user yang sedang login
-        response = supabase.table("supplies").select("*").eq("user_id", user_id).execute()
-        items = response.data
-        
-        fresh = 0
-        warning = 0
-        expired = 0
-        
-        for item in items:
-            days = item.get('expiry_days', 0)
-            if days <= 0: # Assuming 0 or less is expired/critical for this chart
-                expired += 1
-            elif days <= 5:
-                warning += 1
-            else:
-                fresh += 1
+        return await _VENDOR_ANALYTICS_CACHE.get_or_load(user_id, load)
+    except _AnalyticsError as e:
+        return e.result
+
+async def _compute_vendor_analytics(user_id: int):
+    try:
+        if aggregates.is_ready():
+            # Counter write-through: lookup langsung tanpa query
+            counters = aggregates.get_vendor_totals(user_id)
+            fresh = counters["fresh"]
+            warning = counters["warning"]
+            expired = counters["expired"]
+            sales_map = counters["sales"]
+            status_map = counters["order_status"]
+        else:
+            fresh, warning, expired, sales_map, status_map = await _scan_vendor_counters(user_id)
                 
         inventory_health = {
             "fresh": fresh,
@@ -124,23 +162,6 @@ def get_vendor_analytics(user_id: int):
             {"name": "Kadaluwarsa", "value": expired, "fill": "#EF4444"}
         ]
 
-        # --- Top Sales (FILTERED) ---
-        # Fetch orders where seller_id matches user_id
-        orders_resp = supabase.table("orders").select("*, supplies(item_name)").eq("seller_id", user_id).execute()
-        orders = orders_resp.data
-        
-        sales_map = defaultdict(int)
-        if orders:
-            for order in orders:
-                # Try to get name from joined supply, fallback to supply_name if stored, or ID
-                name = "Unknown"
-                if order.get('supplies'):
-                     name = order['supplies'].get('item_name', 'Unknown')
-                elif order.get('supply_name'):
-                     name = order['supply_name']
-                
-                sales_map[name] += order['qty_ordered']
-        
         sales_data = [
             {"name": name, "value": qty}
             for name, qty in sales_map.items()
@@ -151,9 +172,52 @@ def get_vendor_analytics(user_id: int):
         return {
             "inventory_health": inventory_health,
             "expiry_risk": expiry_risk_data,
-            "top_sales": sales_data
+            "top_sales": sales_data,
+            "orders_by_status": {status: count for status, count in status_map.items() if count > 0}
         }
 
     except Exception as e:
         print(f"Error getting vendor analytics: {e}")
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+async def _scan_vendor_counters(user_id: int):
+    """
+    Fallback sebelum aggregate store siap: hitung counter vendor langsung dari DB.
+    """
+    # --- Inventory Health & Expiry Risk (FILTERED) ---
+    # Hanya ambil barang milik user yang sedang login
+    response = await execute(db.table("supplies").select("expiry_days").eq("user_id", user_id))
+    items = response.data
+    
+    fresh = 0
+    warning = 0
+    expired = 0
+    
+    for item in items:
+        days = item.get('expiry_days') or 0
+        if days <= 0: # Assuming 0 or less is expired/critical for this chart
+            expired += 1
+        elif days <= 5:
+            warning += 1
+        else:
+            fresh += 1
+
+    # --- Top Sales (FILTERED) ---
+    # Fetch orders where seller_id matches user_id
+    orders_resp = await execute(db.table("orders").select("*, supplies(item_name)").eq("seller_id", user_id))
+    orders = orders_resp.data
+    
+    sales_map = defaultdict(int)
+    status_map = defaultdict(int)
+    for order in orders or []:
+        # Try to get name from joined supply, fallback to supply_name if stored, or ID
+        name = "Unknown"
+        if order.get('supplies'):
+             name = order['supplies'].get('item_name', 'Unknown')
+        elif order.get('supply_name'):
+             name = order['supply_name']
+        
+        sales_map[name] += order['qty_ordered']
+        status_map[order.get('status')] += 1
+
+    return fresh, warning, expired, sales_map, status_map
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Semua cache terdaftar di sini supaya statistiknya bisa dilihat di /api/metrics/cache
+_REGISTRY = {}
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Cache in-process: LRU (batas jumlah entry) + TTL opsional + counter hit/miss.
+    Hanya dipakai dari event loop (tanpa lock thread).
+    get_or_load() mencegah stampede: request paralel untuk key yang sama
+    menunggu satu loader yang sama, bukan masing-masing query ke DB.
+    """
+
+    def __init__(self, name: str, max_entries: int = 1000, ttl_seconds: float = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.coalesced = 0
+        self._pending = {}     # key -> Future loader yang sedang jalan
+        self._generation = 0   # naik tiap invalidasi, biar hasil loader lama gak ke-cache
+        _REGISTRY[name] = self
+
+    def get(self, key, default=None):
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key, loader):
+        """
+        Ambil dari cache; kalau miss, jalankan `loader()` (coroutine function) sekali saja
+        walaupun banyak request minta key yang sama bersamaan. Hasil None tidak di-cache.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        generation = self._generation
+        try:
+            value = await loader()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # tandai sudah diambil (hindari warning kalau tidak ada yang menunggu)
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+        if value is not None and generation == self._generation:
+            self.set(key, value)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key):
+        self._generation += 1
+        if self._data.pop(key, _MISSING) is not _MISSING:
+            self.invalidations += 1
+
+    def clear(self):
+        self._generation += 1
+        self.invalidations += len(self._data)
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "coalesced": self.coalesced
+        }
+
+class DiskCache:
+    """
+    Cache persisten di file SQLite (tahan restart, dipakai bersama semua worker).
+    LRU (batas jumlah entry, urut last_used) + TTL opsional + counter hit/miss.
+    Value harus bisa di-JSON. Tag opsional per entry (set(..., tags=[...]) + keys_by_tags)
+    untuk cari kandidat tanpa scan semua key.
+    Semua method blocking (file I/O): dari route/service panggil lewat run_in_threadpool.
+    """
+
+    def __init__(self, name: str, path: str, max_entries: int = 1000, ttl_seconds: float = None):
+        self.name = name
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._conn = None
+        self._lock = threading.Lock()  # satu koneksi dipakai bergantian oleh thread pool
+        _REGISTRY[name] = self
+
+    def _db(self) -> sqlite3.Connection:
+        # Dibuka saat pertama dipakai (import module tidak bikin file)
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            conn.execute("CREATE TABLE IF NOT EXISTS tags (tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))")
+            conn.execute("CREATE INDEX IF NOT EXISTS tags_key ON tags (key)")
+            self._conn = conn
+        return self._conn
+
+    def _expired(self, created_at: float) -> bool:
+        return bool(self.ttl_seconds) and created_at + self.ttl_seconds <= time.time()
+
+    def _delete(self, db, where: str, params=()) -> int:
+        # Hapus entry + tag-nya (where berlaku untuk tabel entries)
+        db.execute(f"DELETE FROM tags WHERE key IN (SELECT key FROM entries WHERE {where})", params)
+        return db.execute(f"DELETE FROM entries WHERE {where}", params).rowcount
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or self._expired(row[1]):
+                if row is not None:
+                    self._delete(db, "key = ?", (key,))
+                self.misses += 1
+                return default
+            db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value, tags=()):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN")
+            try:
+                db.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now)
+                )
+                db.execute("DELETE FROM tags WHERE key = ?", (key,))
+                db.executemany("INSERT OR IGNORE INTO tags (tag, key) VALUES (?, ?)", [(tag, key) for tag in tags])
+                overflow = db.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+                if overflow > 0:
+                    self._delete(db, "key IN (SELECT key FROM entries ORDER BY last_used LIMIT ?)", (overflow,))
+                    self.evictions += overflow
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def keys(self, prefix: str = "") -> list:
+        """Key yang diawali `prefix` (dan belum kedaluwarsa)."""
+        since = time.time() - self.ttl_seconds if self.ttl_seconds else float("-inf")
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT key FROM entries WHERE key >= ? AND key < ? AND created_at > ?",
+                (prefix, prefix + "\uffff", since)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def keys_by_tags(self, tags) -> list:
+        """Key (belum kedaluwarsa) yang punya minimal satu dari `tags`. Lewat index, tanpa scan semua key."""
+        tags = list(tags)
+        if not tags:
+            return []
+        since = time.time() - self.ttl_seconds if self.ttl_seconds else float("-inf")
+        marks = ",".join("?" * len(tags))
+        with self._lock:
+            rows = self._db().execute(
+                f"SELECT DISTINCT t.key FROM tags t JOIN entries e ON e.key = t.key "
+                f"WHERE t.tag IN ({marks}) AND e.created_at > ?",
+                (*tags, since)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def invalidate(self, key: str):
+        with self._lock:
+            if self._delete(self._db(), "key = ?", (key,)):
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM tags")
+            self.invalidations += db.execute("DELETE FROM entries").rowcount
+
+    def _count(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._count(),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "path": self.path
+        }
+
+def get_cache_stats() -> dict:
+    """Statistik semua cache yang terdaftar."""
+    return {name: cache.stats() for name, cache in _REGISTRY.items()}
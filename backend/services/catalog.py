@@ -0,0 +1,30 @@
+from .clients import db, execute
+from .pagination import apply_keyset, next_cursor
+
+# Kolom ringan untuk tampilan list (tanpa ai_notes, photo_url, dll)
+COMPACT_COLUMNS = (
+    "id, item_name, quantity, unit, quality_status, expiry_days, expiry_date, "
+    "owner_name, location, latitude, longitude, user_id, created_at"
+)
+
+MAX_PAGE_SIZE = 200
+
+async def list_market_supplies(cursor: str = None, limit: int = 100, compact: bool = False, skip: int = 0):
+    """
+    Katalog pasar (semua stok vendor), terbaru dulu.
+    Pakai keyset pagination di (created_at, id) supaya biaya per halaman tetap datar.
+    `skip` hanya untuk klien lama (offset); diabaikan kalau `cursor` dikirim.
+    Return: (rows, next_cursor)
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    columns = COMPACT_COLUMNS if compact else "*"
+
+    query = apply_keyset(db.table("supplies").select(columns), cursor)
+    if skip and not cursor:
+        query = query.range(skip, skip + limit - 1)
+    else:
+        query = query.limit(limit)
+
+    response = await execute(query)
+    rows = response.data or []
+    return rows, next_cursor(rows, limit)
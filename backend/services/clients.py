@@ -1,14 +1,158 @@
+import asyncio
 import os
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
-from database import supabase
+from openai import OpenAI, AsyncOpenAI
+from database import db, execute
+from config import (
+    LLM_MODEL,
+    LLM_MAX_CONCURRENCY,
+    LLM_MODEL_CONCURRENCY,
+    LLM_QUEUE_TIMEOUT,
+    LLM_CONNECT_TIMEOUT,
+    LLM_REQUEST_TIMEOUT,
+    LLM_POOL_MAX_KEEPALIVE,
+    LLM_MAX_RETRIES
+)
 
 # Explicitly load .env from the backend directory (parent of services)
 load_dotenv(Path(__file__).parent.parent / ".env")
 
 # --- SETUP CLIENTS ---
+
+# Client sync, khusus script CLI (check_models.py, dll).
+# JANGAN dipakai di route/service: tiap panggilan LLM nge-block 10-30 detik.
 kolosal_client = OpenAI(
     api_key=os.getenv("KOLOSAL_API_KEY"),
     base_url=os.getenv("KOLOSAL_BASE_URL")
 )
+
+# Connection pool keep-alive khusus LLM (terpisah dari pool DB: timeout-nya jauh lebih panjang)
+llm_pool = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=LLM_MAX_CONCURRENCY,
+        max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE
+    ),
+    timeout=httpx.Timeout(LLM_REQUEST_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+)
+
+# Client async global, dipakai semua service (vision, kitchen, inventory)
+kolosal_async = AsyncOpenAI(
+    api_key=os.getenv("KOLOSAL_API_KEY"),
+    base_url=os.getenv("KOLOSAL_BASE_URL"),
+    http_client=llm_pool,
+    timeout=httpx.Timeout(LLM_REQUEST_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+    max_retries=LLM_MAX_RETRIES
+)
+
+# ==========================================
+# 🚦 BATAS KONKURENSI LLM
+# Semaphore global + per model. Request yang antre lebih lama dari
+# LLM_QUEUE_TIMEOUT ditolak (LLMBusyError) daripada menumpuk tanpa batas.
+# ==========================================
+
+class LLMBusyError(Exception):
+    """Semua slot LLM terpakai lebih lama dari LLM_QUEUE_TIMEOUT."""
+
+_GLOBAL_SLOTS = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+_MODEL_SLOTS = {}
+_STATS = {}
+
+def _model_slots(model: str) -> asyncio.Semaphore:
+    slots = _MODEL_SLOTS.get(model)
+    if slots is None:
+        limit = min(LLM_MODEL_CONCURRENCY.get(model, LLM_MAX_CONCURRENCY), LLM_MAX_CONCURRENCY)
+        slots = _MODEL_SLOTS[model] = asyncio.Semaphore(limit)
+    return slots
+
+def _stats_of(model: str) -> dict:
+    return _STATS.setdefault(model, {
+        "calls": 0, "errors": 0, "rejected": 0, "in_flight": 0, "waiting": 0,
+        "total_seconds": 0.0, "total_wait_seconds": 0.0
+    })
+
+async def _acquire(semaphore: asyncio.Semaphore, deadline: float):
+    await asyncio.wait_for(semaphore.acquire(), timeout=max(deadline - time.monotonic(), 0))
+
+@asynccontextmanager
+async def _llm_slot(model: str):
+    """Tunggu slot global + per model (maks LLM_QUEUE_TIMEOUT), catat statistik selama dipakai."""
+    stats = _stats_of(model)
+    model_slots = _model_slots(model)
+    queued = time.monotonic()
+    deadline = queued + LLM_QUEUE_TIMEOUT
+
+    stats["waiting"] += 1
+    try:
+        await _acquire(model_slots, deadline)
+        try:
+            await _acquire(_GLOBAL_SLOTS, deadline)
+        except BaseException:
+            model_slots.release()
+            raise
+    except asyncio.TimeoutError:
+        stats["rejected"] += 1
+        raise LLMBusyError(f"Antrean LLM penuh ({model}), coba lagi sebentar lagi")
+    finally:
+        stats["waiting"] -= 1
+
+    started = time.monotonic()
+    stats["total_wait_seconds"] += started - queued
+    stats["in_flight"] += 1
+    try:
+        yield
+    except Exception:
+        stats["errors"] += 1
+        raise
+    finally:
+        stats["calls"] += 1
+        stats["in_flight"] -= 1
+        stats["total_seconds"] += time.monotonic() - started
+        _GLOBAL_SLOTS.release()
+        model_slots.release()
+
+async def chat_completion(messages: list, model: str = LLM_MODEL, **kwargs):
+    """
+    Panggil chat.completions (async) dengan batas konkurensi global + per model.
+    Contoh: res = await chat_completion([{"role": "user", "content": "Halo"}], max_tokens=300)
+    """
+    async with _llm_slot(model):
+        return await kolosal_async.chat.completions.create(model=model, messages=messages, **kwargs)
+
+async def chat_completion_stream(messages: list, model: str = LLM_MODEL, **kwargs):
+    """
+    Versi streaming: yield potongan teks jawaban begitu datang dari model.
+    Slot LLM dipegang sampai stream selesai (atau client putus -> stream ditutup, slot dilepas).
+    Contoh: async for text in chat_completion_stream(messages, max_tokens=1500): ...
+    """
+    async with _llm_slot(model):
+        stream = await kolosal_async.chat.completions.create(model=model, messages=messages, stream=True, **kwargs)
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+
+def get_llm_stats() -> dict:
+    """Statistik panggilan LLM per model (per worker)."""
+    models = {}
+    for model, s in _STATS.items():
+        models[model] = {
+            "calls": s["calls"],
+            "errors": s["errors"],
+            "rejected": s["rejected"],
+            "in_flight": s["in_flight"],
+            "waiting": s["waiting"],
+            "avg_seconds": round(s["total_seconds"] / s["calls"], 2) if s["calls"] else 0.0,
+            "avg_wait_seconds": round(s["total_wait_seconds"] / s["calls"], 2) if s["calls"] else 0.0,
+            "limit": min(LLM_MODEL_CONCURRENCY.get(model, LLM_MAX_CONCURRENCY), LLM_MAX_CONCURRENCY)
+        }
+    return {"max_concurrency": LLM_MAX_CONCURRENCY, "models": models}
+
+async def close_llm():
+    """Tutup connection pool LLM (dipanggil saat server shutdown)."""
+    await llm_pool.aclose()
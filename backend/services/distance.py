@@ -0,0 +1,48 @@
+import math
+import numpy as np
+
+# ==========================================
+# 📏 DISTANCE ENGINE (HAVERSINE, VEKTOR NUMPY)
+# Satu panggilan numpy untuk ribuan titik sekaligus,
+# bukan loop Python per baris.
+# Koordinat kosong (None) otomatis jadi NaN -> jaraknya NaN.
+# ==========================================
+
+EARTH_RADIUS_KM = 6371
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """
+    Hitung jarak antara dua titik koordinat (km)
+    """
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) * math.sin(dlat / 2) + math.cos(math.radians(lat1)) \
+        * math.cos(math.radians(lat2)) * math.sin(dlon / 2) * math.sin(dlon / 2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+def _as_radians(values) -> np.ndarray:
+    return np.radians(np.asarray(values, dtype=np.float64))
+
+def _haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    # Input sudah dalam radian & sudah bisa di-broadcast
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def haversine_many(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """
+    Jarak (km) dari SATU titik ke banyak titik.
+    Return vektor sepanjang `lats`.
+    """
+    return _haversine(math.radians(lat), math.radians(lon), _as_radians(lats), _as_radians(lons))
+
+def haversine_matrix(lats1, lons1, lats2, lons2) -> np.ndarray:
+    """
+    Matriks jarak (km) antar dua kumpulan titik.
+    Return shape (len(lats1), len(lats2)).
+    """
+    lat1 = _as_radians(lats1)[:, None]
+    lon1 = _as_radians(lons1)[:, None]
+    lat2 = _as_radians(lats2)[None, :]
+    lon2 = _as_radians(lons2)[None, :]
+    return _haversine(lat1, lon1, lat2, lon2)
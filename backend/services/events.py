@@ -0,0 +1,28 @@
+from collections import defaultdict
+
+# Nama event tulis (write) yang dipublish route/service setelah DB sukses
+SUPPLIES_ADDED = "supplies_added"      # payload: list row supplies yang baru di-insert
+SUPPLIES_REMOVED = "supplies_removed"  # payload: list row supplies yang dihapus
+ORDER_CREATED = "order_created"        # payload: list row orders (+ "supplies": {"item_name"})
+ORDER_UPDATED = "order_updated"        # payload: list row orders setelah update (+ "previous_status")
+AGGREGATES_RECONCILED = "aggregates_reconciled"  # payload: None (counter baru saja dihitung ulang)
+
+_SUBSCRIBERS = defaultdict(list)
+
+def subscribe(event: str, handler):
+    """
+    Daftarkan handler (fungsi sync, harus cepat & in-memory) untuk sebuah event.
+    """
+    _SUBSCRIBERS[event].append(handler)
+
+def publish(event: str, payload):
+    """
+    Kirim event ke semua subscriber.
+    Error di satu handler hanya di-log: data di DB sudah tersimpan,
+    index/cache yang ketinggalan akan dibetulkan oleh job reconcile.
+    """
+    for handler in _SUBSCRIBERS[event]:
+        try:
+            handler(payload)
+        except Exception as e:
+            print(f"⚠️ Handler {handler.__name__} gagal untuk event {event}: {e}")
@@ -0,0 +1,219 @@
+import csv
+import os
+import re
+import time
+from collections import defaultdict
+from fastapi.concurrency import run_in_threadpool
+from .cache import TTLCache
+from .search import similarity
+from config import GAZETTEER_PATH
+
+# ==========================================
+# 📍 GEOCODER OFFLINE (GAZETTEER KELURAHAN / KECAMATAN)
+# Alamat teks -> titik tengah (centroid) kelurahan / kecamatan / kota,
+# dari file CSV lokal (GAZETTEER_PATH). Tanpa API eksternal.
+# Nama dicocokkan per rangkaian kata di alamat pakai trigram (toleran typo),
+# kandidat dipersempit lewat inverted index trigram -> nama.
+# Dipakai saat register, sebagai pengganti koordinat dummy, dan oleh
+# backfill_locations.py untuk data lama.
+# ==========================================
+
+# Lokasi default (Monas) kalau alamat kosong / tidak dikenali
+DEFAULT_LAT = -6.175392
+DEFAULT_LONG = 106.827153
+
+# Ambang kemiripan nama (sama dengan ambang word_similarity pencarian barang)
+MIN_SCORE = 0.6
+
+# Singkatan umum di alamat
+ADDRESS_ALIASES = {
+    "jakpus": "jakarta pusat",
+    "jakut": "jakarta utara",
+    "jakbar": "jakarta barat",
+    "jaksel": "jakarta selatan",
+    "jaktim": "jakarta timur",
+    "jkt": "jakarta",
+    "kby": "kebayoran",
+    "psr": "pasar"
+}
+
+# Urutan presisi: kelurahan paling tepat
+LEVELS = ("kelurahan", "kecamatan", "kota")
+# Bobot nama wilayah induk yang ikut disebut di alamat (pembeda nama kembar)
+CONTEXT_WEIGHT = {"kecamatan": 0.5, "kota": 0.25}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+_PLACES = []       # {"level", "kelurahan", "kecamatan", "kota", "provinsi", "lat", "long"}
+_BY_NAME = {}      # nama (normal) -> [(level, index place)]
+_TRIGRAMS = {}     # trigram -> set(nama)
+_NAME_GRAMS = {}   # nama -> set(trigram)
+_STATE = {"loaded": False, "path": None, "places": 0}
+
+_LOOKUP_CACHE = TTLCache("geocode", max_entries=10000)
+
+def normalize_address(text: str) -> str:
+    """
+    "Jl. Kebon Kacang Raya No.12, RT 03/RW 05, Jakpus" -> "jl kebon kacang raya jakarta pusat"
+    """
+    words = [w for w in _NON_ALNUM.sub(" ", (text or "").lower()).split() if not w.isdigit()]
+    return " ".join(ADDRESS_ALIASES.get(w, w) for w in words)
+
+def _trigrams(text: str) -> set:
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+# --- Load ---
+
+def _read(path: str) -> dict:
+    places = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            places.append({
+                "level": "kelurahan" if (row.get("kelurahan") or "").strip() else "kecamatan",
+                "kelurahan": (row.get("kelurahan") or "").strip(),
+                "kecamatan": (row.get("kecamatan") or "").strip(),
+                "kota": (row.get("kota") or "").strip(),
+                "provinsi": (row.get("provinsi") or "").strip(),
+                "lat": float(row["lat"]),
+                "long": float(row["long"])
+            })
+
+    # Centroid kota = rata-rata centroid kecamatan-nya (atau kelurahan kalau tidak ada baris kecamatan)
+    per_kota = defaultdict(lambda: {"kecamatan": [], "kelurahan": []})
+    for place in places:
+        if place["kota"]:
+            per_kota[(place["kota"], place["provinsi"])][place["level"]].append(place)
+    for (kota, provinsi), groups in per_kota.items():
+        members = groups["kecamatan"] or groups["kelurahan"]
+        places.append({
+            "level": "kota", "kelurahan": "", "kecamatan": "", "kota": kota, "provinsi": provinsi,
+            "lat": round(sum(p["lat"] for p in members) / len(members), 6),
+            "long": round(sum(p["long"] for p in members) / len(members), 6)
+        })
+
+    by_name = defaultdict(list)
+    for i, place in enumerate(places):
+        name = normalize_address(place[place["level"]])
+        if name:
+            by_name[name].append((place["level"], i))
+
+    trigrams, name_grams = defaultdict(set), {}
+    for name in by_name:
+        name_grams[name] = _trigrams(name)
+        for gram in name_grams[name]:
+            trigrams[gram].add(name)
+
+    return {"places": places, "by_name": dict(by_name), "trigrams": dict(trigrams), "name_grams": name_grams}
+
+async def load_gazetteer():
+    """
+    Muat gazetteer dari GAZETTEER_PATH (CSV: provinsi,kota,kecamatan,kelurahan,lat,long).
+    Baris dengan kelurahan kosong = centroid kecamatan.
+    """
+    global _PLACES, _BY_NAME, _TRIGRAMS, _NAME_GRAMS
+    if not os.path.exists(GAZETTEER_PATH):
+        print(f"⚠️ Gazetteer tidak ditemukan ({GAZETTEER_PATH}), alamat tidak bisa di-geocode")
+        return
+    started = time.perf_counter()
+    data = await run_in_threadpool(_read, GAZETTEER_PATH)
+    _PLACES, _BY_NAME = data["places"], data["by_name"]
+    _TRIGRAMS, _NAME_GRAMS = data["trigrams"], data["name_grams"]
+    _LOOKUP_CACHE.clear()
+    _STATE.update({"loaded": True, "path": GAZETTEER_PATH, "places": len(_PLACES)})
+    print(f"📍 Gazetteer dimuat: {len(_PLACES)} wilayah, {len(_BY_NAME)} nama "
+          f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+def is_loaded() -> bool:
+    return _STATE["loaded"]
+
+# --- Lookup ---
+
+def _name_score(name: str, words: list, text: str) -> float:
+    # Nama persis muncul sebagai rangkaian kata utuh = 1.0
+    if f" {name} " in f" {text} ":
+        return 1.0
+    # Selain itu: rangkaian kata alamat (panjang mirip nama) yang paling mirip
+    k = len(name.split())
+    best = 0.0
+    for size in range(max(1, k - 1), k + 2):
+        for i in range(len(words) - size + 1):
+            best = max(best, similarity(name, " ".join(words[i:i + size])))
+    return best
+
+def _match_names(text: str) -> dict:
+    """Nama wilayah yang disebut di alamat -> skor (>= MIN_SCORE)."""
+    grams = _trigrams(text)
+    overlap = defaultdict(int)
+    for gram in grams:
+        for name in _TRIGRAMS.get(gram, ()):
+            overlap[name] += 1
+
+    words = text.split()
+    scores = {}
+    for name, shared in overlap.items():
+        # Filter murah: minimal separuh trigram nama ada di alamat
+        if shared * 2 < len(_NAME_GRAMS[name]):
+            continue
+        score = _name_score(name, words, text)
+        if score >= MIN_SCORE:
+            scores[name] = score
+    return scores
+
+def _format(place: dict) -> str:
+    parts = [place["kelurahan"], place["kecamatan"], place["kota"]]
+    return ", ".join(p for p in parts if p)
+
+def geocode(address: str):
+    """
+    Alamat -> {"lat", "long", "level", "name", "score"} atau None kalau tidak ada wilayah yang cocok.
+    Wilayah terkecil yang disebut menang; nama kecamatan / kota di alamat jadi pembeda nama kembar.
+    """
+    text = normalize_address(address)
+    if not text or not _PLACES:
+        return None
+    cached = _LOOKUP_CACHE.get(text)
+    if cached is not None:
+        return cached or None
+
+    scores = _match_names(text)
+    best, best_key = None, None
+    for name, score in scores.items():
+        for level, i in _BY_NAME[name]:
+            place = _PLACES[i]
+            context = sum(
+                weight * scores.get(normalize_address(place[parent]), 0.0)
+                for parent, weight in CONTEXT_WEIGHT.items()
+                if LEVELS.index(parent) > LEVELS.index(level)
+            )
+            # Prioritas: skor nama + konteks induk, lalu level paling presisi
+            key = (score + context, -LEVELS.index(level))
+            if best_key is None or key > best_key:
+                best, best_key = (place, score), key
+
+    result = None
+    if best is not None:
+        place, score = best
+        result = {
+            "lat": place["lat"],
+            "long": place["long"],
+            "level": place["level"],
+            "name": _format(place),
+            "score": round(score, 2)
+        }
+    # Hasil "tidak ketemu" juga di-cache ({} -> None)
+    _LOOKUP_CACHE.set(text, result or {})
+    return result
+
+def approximate_location(address: str) -> tuple:
+    """
+    (lat, long) perkiraan untuk data tanpa GPS: centroid wilayah dari alamat,
+    atau lokasi default kalau alamat tidak dikenali. Selalu sama untuk alamat yang sama.
+    """
+    found = geocode(address)
+    if found:
+        return found["lat"], found["long"]
+    return DEFAULT_LAT, DEFAULT_LONG
@@ -0,0 +1,204 @@
+import math
+import time
+from . import events, geocoder
+from .distance import haversine_many
+from .search import normalize_item_name
+from .pagination import fetch_all
+
+# ==========================================
+# 🗺️ SPATIAL INDEX (GRID CELL) UNTUK SUPPLIES
+# Titik supply dikelompokkan per sel grid lat/long (GEO_CELL_DEG derajat).
+# Query "k terdekat dalam radius R" cukup membuka sel di sekitar user,
+# cincin demi cincin, tanpa menyentuh baris yang jauh.
+# Di-update lewat event write supplies + rebuild periodik dari DB.
+# Modul lain (misal tile peta) bisa subscribe_changes() untuk tahu
+# titik mana saja yang berubah.
+# ==========================================
+
+GEO_CELL_DEG = 0.05            # ~5.5 km per sel di sekitar khatulistiwa
+KM_PER_DEG = 111.32
+
+# Default lokasi (Monas) untuk data tanpa GPS yang alamatnya tidak dikenali
+DEFAULT_LAT = geocoder.DEFAULT_LAT
+DEFAULT_LONG = geocoder.DEFAULT_LONG
+
+INDEX_COLUMNS = "id, created_at, item_name, latitude, longitude, user_id, location"
+
+_CELLS = {}    # (ix, iy) -> {supply_id: entry}
+_ENTRIES = {}  # supply_id -> entry
+_STATE = {"ready": False, "last_rebuild": None}
+_LISTENERS = []  # fn(entries): dipanggil dengan entry yang berubah (versi lama & baru)
+
+def _cell_of(lat: float, lon: float):
+    return (math.floor(lon / GEO_CELL_DEG), math.floor(lat / GEO_CELL_DEG))
+
+def _make_entry(row: dict) -> dict:
+    lat = row.get('latitude')
+    lon = row.get('longitude')
+    simulated = lat is None or lon is None
+    if simulated:
+        # Data tanpa GPS: centroid kelurahan/kecamatan dari kolom location (gazetteer offline)
+        lat, lon = geocoder.approximate_location(row.get('location'))
+    return {
+        "id": row['id'],
+        "item_name": row.get('item_name') or "",
+        "search_name": normalize_item_name(row.get('item_name')),
+        "user_id": row.get('user_id'),
+        "lat": lat,
+        "lon": lon,
+        "simulated": simulated
+    }
+
+def _insert(cells: dict, entries: dict, entry: dict):
+    entries[entry["id"]] = entry
+    cells.setdefault(_cell_of(entry["lat"], entry["lon"]), {})[entry["id"]] = entry
+
+def _remove(cells: dict, entries: dict, supply_id):
+    entry = entries.pop(supply_id, None)
+    if entry is None:
+        return None
+    key = _cell_of(entry["lat"], entry["lon"])
+    bucket = cells.get(key)
+    if bucket is not None:
+        bucket.pop(supply_id, None)
+        if not bucket:
+            del cells[key]
+    return entry
+
+def subscribe_changes(fn):
+    _LISTENERS.append(fn)
+
+def _notify(changed: list):
+    if not changed:
+        return
+    for fn in _LISTENERS:
+        try:
+            fn(changed)
+        except Exception as e:
+            # Listener error tidak boleh bikin index ikut rusak
+            print(f"⚠️ Geo index listener {getattr(fn, '__name__', fn)} gagal: {e}")
+
+# --- Handler event write ---
+
+def on_supplies_added(rows: list):
+    changed = []
+    for row in rows:
+        old = _remove(_CELLS, _ENTRIES, row['id'])
+        entry = _make_entry(row)
+        _insert(_CELLS, _ENTRIES, entry)
+        changed.extend(e for e in (old, entry) if e is not None)
+    _notify(changed)
+
+def on_supplies_removed(rows: list):
+    changed = [_remove(_CELLS, _ENTRIES, row['id']) for row in rows]
+    _notify([e for e in changed if e is not None])
+
+events.subscribe(events.SUPPLIES_ADDED, on_supplies_added)
+events.subscribe(events.SUPPLIES_REMOVED, on_supplies_removed)
+
+# --- Query ---
+
+def is_ready() -> bool:
+    return _STATE["ready"]
+
+def cell_center(key) -> tuple:
+    ix, iy = key
+    return ((iy + 0.5) * GEO_CELL_DEG, (ix + 0.5) * GEO_CELL_DEG)
+
+def cell_center_of(lat: float, lon: float) -> tuple:
+    return cell_center(_cell_of(lat, lon))
+
+def cells_in_bbox(south: float, west: float, north: float, east: float):
+    """
+    Yield (key, {supply_id: entry}) untuk sel yang beririsan dengan bbox.
+    Bbox besar (zoom jauh): scan sel yang terisi saja, bukan semua sel kosong di rentangnya.
+    """
+    x0, y0 = _cell_of(south, west)
+    x1, y1 = _cell_of(north, east)
+    if (x1 - x0 + 1) * (y1 - y0 + 1) > len(_CELLS):
+        for key, bucket in _CELLS.items():
+            if x0 <= key[0] <= x1 and y0 <= key[1] <= y1:
+                yield key, bucket
+        return
+    for ix in range(x0, x1 + 1):
+        for iy in range(y0, y1 + 1):
+            bucket = _CELLS.get((ix, iy))
+            if bucket:
+                yield (ix, iy), bucket
+
+def _ring(cx: int, cy: int, r: int):
+    if r == 0:
+        yield (cx, cy)
+        return
+    for dx in range(-r, r + 1):
+        yield (cx + dx, cy - r)
+        yield (cx + dx, cy + r)
+    for dy in range(-r + 1, r):
+        yield (cx - r, cy + dy)
+        yield (cx + r, cy + dy)
+
+def nearest(lat: float, lon: float, radius_km: float, limit: int, match=None) -> list:
+    """
+    k supply terdekat dalam radius_km dari (lat, lon).
+    `match(entry)` opsional untuk filter (misal nama barang).
+    Return list (distance_km, entry) urut dari yang terdekat.
+    """
+    cx, cy = _cell_of(lat, lon)
+    # Lebar sel terkecil (arah bujur menyempit sesuai cos(lat)) -> batas bawah jarak per cincin
+    cell_km = GEO_CELL_DEG * KM_PER_DEG * max(math.cos(math.radians(lat)), 0.01)
+    max_ring = int(radius_km / cell_km) + 1
+
+    found = []
+    for r in range(max_ring + 1):
+        candidates = []
+        for key in _ring(cx, cy, r):
+            bucket = _CELLS.get(key)
+            if not bucket:
+                continue
+            if match is None:
+                candidates.extend(bucket.values())
+            else:
+                candidates.extend(entry for entry in bucket.values() if match(entry))
+
+        if candidates:
+            # Jarak satu cincin dihitung sekaligus (vektor)
+            dists = haversine_many(lat, lon, [e["lat"] for e in candidates], [e["lon"] for e in candidates])
+            found.extend((float(dists[i]), candidates[i]) for i in range(len(candidates)) if dists[i] <= radius_km)
+
+        # Semua titik di cincin berikutnya berjarak >= r * cell_km
+        if len(found) >= limit:
+            found.sort(key=lambda x: x[0])
+            if found[limit - 1][0] <= r * cell_km:
+                break
+
+    found.sort(key=lambda x: x[0])
+    return found[:limit]
+
+# --- Rebuild ---
+
+async def rebuild():
+    """
+    Bangun ulang index dari DB lalu tukar sekaligus.
+    """
+    global _CELLS, _ENTRIES
+    started = time.perf_counter()
+    rows = await fetch_all("supplies", INDEX_COLUMNS)
+
+    cells, entries = {}, {}
+    for row in rows:
+        _insert(cells, entries, _make_entry(row))
+
+    # Entry yang bertambah / hilang / pindah / ganti nama sejak index lama
+    changed = []
+    for supply_id, entry in entries.items():
+        old = _ENTRIES.get(supply_id)
+        if old is None or (old["lat"], old["lon"], old["item_name"]) != (entry["lat"], entry["lon"], entry["item_name"]):
+            changed.extend(e for e in (old, entry) if e is not None)
+    changed.extend(old for supply_id, old in _ENTRIES.items() if supply_id not in entries)
+
+    _CELLS, _ENTRIES = cells, entries
+    _notify(changed)
+    _STATE["ready"] = True
+    _STATE["last_rebuild"] = time.time()
+    print(f"🗺️ Geo index rebuilt: {len(entries)} supplies di {len(cells)} sel "
+          f"({(time.perf_counter() - started) * 1000:.0f} ms)")
@@ -0,0 +1,164 @@
+from .clients import db, execute
+from .search import normalize_item_name
+
+# ==========================================
+# 🥕 KATALOG BAHAN KANONIK + KONVERSI SATUAN
+# Dipakai saat write (create_supplies): setiap supply disimpan dengan
+# canonical_item_id + normalized_qty (quantity dalam base_unit bahan),
+# jadi analytics tinggal group by integer.
+# Tabel: ingredients, ingredient_units (sql/006_canonical_ingredients.sql)
+# ==========================================
+
+# Ejaan satuan dari input vendor / prompt vision -> satuan baku
+UNIT_ALIASES = {
+    "kg": "kg", "kilo": "kg", "kilogram": "kg", "kgs": "kg",
+    "g": "gram", "gr": "gram", "grm": "gram", "gram": "gram",
+    "ons": "ons",
+    "kwintal": "kwintal", "kuintal": "kwintal",
+    "ton": "ton",
+    "l": "liter", "lt": "liter", "ltr": "liter", "liter": "liter", "litre": "liter",
+    "ml": "ml",
+    "pcs": "pcs", "pc": "pcs", "buah": "pcs", "biji": "pcs", "butir": "pcs", "bh": "pcs",
+    "ekor": "ekor",
+    "ikat": "ikat",
+    "karung": "karung", "sak": "karung",
+    "papan": "papan",
+    "tray": "tray", "rak": "tray",
+    "sisir": "sisir"
+}
+
+# Satuan massa/volume umum: satuan -> (base_unit, factor). Berlaku untuk semua bahan.
+GENERIC_FACTORS = {
+    "kg": ("kg", 1),
+    "gram": ("kg", 0.001),
+    "ons": ("kg", 0.1),
+    "kwintal": ("kg", 100),
+    "ton": ("kg", 1000),
+    "liter": ("liter", 1),
+    "ml": ("liter", 0.001)
+}
+
+_CATALOG = {
+    "by_slug": {},  # slug -> ingredient
+    "by_id": {},    # id -> ingredient
+    "units": {},    # (ingredient_id, unit) -> factor
+    "loaded": False
+}
+
+def normalize_unit(unit: str) -> str:
+    """
+    "Kg" -> "kg", "Butir" -> "pcs". Satuan tak dikenal cukup di-lowercase.
+    """
+    key = (unit or "").strip().lower().rstrip(".")
+    return UNIT_ALIASES.get(key, key)
+
+def _register(ingredient: dict):
+    _CATALOG["by_slug"][ingredient['slug']] = ingredient
+    _CATALOG["by_id"][ingredient['id']] = ingredient
+
+async def load_catalog():
+    """
+    Muat ulang seluruh katalog (ukurannya kecil: ratusan bahan).
+    """
+    ingredients_res = await execute(db.table("ingredients").select("id, name, slug, base_unit"))
+    units_res = await execute(db.table("ingredient_units").select("ingredient_id, unit, factor"))
+
+    by_slug, by_id = {}, {}
+    for row in ingredients_res.data:
+        by_slug[row['slug']] = row
+        by_id[row['id']] = row
+    units = {(row['ingredient_id'], normalize_unit(row['unit'])): float(row['factor']) for row in units_res.data}
+
+    _CATALOG.update({"by_slug": by_slug, "by_id": by_id, "units": units, "loaded": True})
+    print(f"🥕 Katalog bahan dimuat: {len(by_id)} bahan, {len(units)} konversi satuan")
+
+def is_loaded() -> bool:
+    return _CATALOG["loaded"]
+
+def get_ingredient(ingredient_id: int):
+    return _CATALOG["by_id"].get(ingredient_id)
+
+def unit_factor(ingredient: dict, unit: str):
+    """
+    Faktor 1 <unit> -> base_unit bahan. None kalau tidak bisa dikonversi.
+    """
+    unit = normalize_unit(unit)
+    if unit == ingredient['base_unit']:
+        return 1.0
+    factor = _CATALOG["units"].get((ingredient['id'], unit))
+    if factor is not None:
+        return factor
+    generic = GENERIC_FACTORS.get(unit)
+    if generic and generic[0] == ingredient['base_unit']:
+        return generic[1]
+    return None
+
+async def resolve_ingredient(item_name: str, unit: str = None):
+    """
+    Cari bahan kanonik untuk item_name; kalau belum ada di katalog, dibuat baru
+    (base_unit ikut satuan pertama yang dipakai).
+    """
+    slug = normalize_item_name(item_name)
+    if not slug:
+        return None
+
+    ingredient = _CATALOG["by_slug"].get(slug)
+    if ingredient is not None:
+        return ingredient
+
+    res = await execute(db.table("ingredients").select("id, name, slug, base_unit").eq("slug", slug).limit(1))
+    if not res.data:
+        unit = normalize_unit(unit)
+        base_unit = GENERIC_FACTORS[unit][0] if unit in GENERIC_FACTORS else (unit or "kg")
+        try:
+            res = await execute(db.table("ingredients").insert({
+                "name": slug.title(),
+                "slug": slug,
+                "base_unit": base_unit
+            }))
+            print(f"🥕 Bahan baru di katalog: {slug} ({base_unit})")
+        except Exception:
+            # Request lain barusan insert slug yang sama (unique) -> ambil punya dia
+            res = await execute(db.table("ingredients").select("id, name, slug, base_unit").eq("slug", slug).limit(1))
+
+    ingredient = res.data[0]
+    _register(ingredient)
+    return ingredient
+
+async def canonicalize_supply(item_name: str, qty: float, unit: str) -> dict:
+    """
+    Kolom kanonik untuk satu baris supplies:
+    {"canonical_item_id", "normalized_qty"} (normalized_qty None kalau satuan tidak bisa dikonversi).
+    """
+    ingredient = await resolve_ingredient(item_name, unit)
+    if ingredient is None:
+        return {"canonical_item_id": None, "normalized_qty": None}
+
+    factor = unit_factor(ingredient, unit)
+    if factor is None:
+        print(f"⚠️ Satuan '{unit}' untuk {ingredient['name']} belum ada di ingredient_units")
+        normalized_qty = None
+    else:
+        normalized_qty = round(qty * factor, 4) if qty is not None else None
+
+    return {"canonical_item_id": ingredient['id'], "normalized_qty": normalized_qty}
+
+# --- Helper baca baris supplies (dipakai aggregates & autocomplete) ---
+
+def supply_name(row: dict) -> str:
+    """Nama kanonik kalau sudah ada, selain itu item_name mentah."""
+    ingredient = get_ingredient(row.get('canonical_item_id'))
+    return ingredient['name'] if ingredient else row.get('item_name')
+
+def supply_qty(row: dict):
+    """Quantity dalam satuan dasar, None kalau satuannya belum bisa dikonversi."""
+    normalized = row.get('normalized_qty')
+    return float(normalized) if normalized is not None else None
+
+def supply_unit(row: dict):
+    """(qty, satuan, converted): satuan dasar kalau bisa dikonversi, selain itu quantity & satuan mentah."""
+    qty = supply_qty(row)
+    if qty is not None:
+        ingredient = get_ingredient(row.get('canonical_item_id'))
+        return qty, ingredient['base_unit'] if ingredient else None, True
+    return row.get('quantity') or 0, row.get('unit'), False
@@ -1,10 +1,10 @@
-from datetime import datetime, timedelta
-from database import supabase
-from .logistics import haversine_distance
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from .clients import LLMBusyError, db, execute
+from .users import get_user_profiles
+from . import sppg
 from .kitchen import generate_menu_recommendation
-
-# Global Cache untuk Resep Penyelamatan (Reset saat restart server)
-_RESCUE_MENU_CACHE = {"hash": "", "menu": None}
+from config import EXPIRY_WARNING_DAYS, EXPIRY_SWEEP_LOOKBACK_DAYS
 
 def calculate_expiry_date(days: int) -> str:
     """
@@ -14,16 +14,86 @@ def calculate_expiry_date(days: int) -> str:
     expiry_date = datetime.now() + timedelta(days=days)
     return expiry_date.strftime("%Y-%m-%d")
 
-def check_expiry_and_notify():
+def _build_vendor_notification(vendor_user: dict, items: list, assignment: dict = None) -> dict:
+    """
+    Format pesan WhatsApp peringatan expiry untuk satu vendor (tanpa akses DB).
+    `assignment`: SPPG tujuan hasil sppg.assign_vendors (None kalau belum ada GPS / kapasitas penuh).
     """
-    Cek barang yang mau busuk (expiry_days <= 7).
+    vendor_name = vendor_user.get('full_name', 'Mitra Vendor')
+    phone = vendor_user.get('phone_number', '-')
+    item_names = ", ".join([f"{i['item_name']} ({i['quantity']} {i['unit']})" for i in items])
+    
+    if assignment:
+        target = assignment["sppg"]
+        dist_info = (
+            f"Setor ke {target['name']} ({target.get('address') or '-'}), "
+            f"berjarak {assignment['distance_km']:.1f} km dari titik Anda. Kontak: {target.get('phone') or '-'}."
+        )
+    else:
+        dist_info = "Segera tawarkan ke SPPG terdekat."
+        
+    return {
+        "to": f"{vendor_name} ({phone})",
+        "role": "Vendor (UMKM)",
+        "type": "WARNING",
+        "message": (
+            f"⚠️ Halo {vendor_name}!\n"
+            f"Stok berikut akan segera kadaluarsa: {item_names}.\n"
+            f"{dist_info}\n"
+            f"Saran: Diskonkan sekarang atau donasikan ke Dapur Umum sebelum rugi total!"
+        )
+    }
+
+SWEEP_PAGE_SIZE = 1000
+SWEEP_COLUMNS = "id, user_id, item_name, quantity, unit, expiry_date, expiry_days, latitude, longitude"
+
+async def _fetch_expiring_supplies(today: date) -> list:
+    """
+    Ambil stok yang sisa umurnya <= EXPIRY_WARNING_DAYS, dihitung dari expiry_date
+    (bukan expiry_days statis saat insert, yang tidak pernah berkurang).
+    Query range tanggal -> kena index supplies(expiry_date).
+    Data lama tanpa expiry_date tetap ikut lewat expiry_days.
+    """
+    start = (today - timedelta(days=EXPIRY_SWEEP_LOOKBACK_DAYS)).isoformat()
+    end = (today + timedelta(days=EXPIRY_WARNING_DAYS)).isoformat()
+
+    # Per halaman (.range) sampai habis: satu select bisa terpotong max-rows PostgREST.
+    # Urut id supaya halaman stabil; hanya kolom yang dipakai sweep & ExpiryAlerts.
+    items = []
+    offset = 0
+    while True:
+        response = await execute(
+            db.table("supplies").select(SWEEP_COLUMNS).or_(
+                f"and(expiry_date.gte.{start},expiry_date.lte.{end}),"
+                f"and(expiry_date.is.null,expiry_days.lte.{EXPIRY_WARNING_DAYS})"
+            ).order("id").range(offset, offset + SWEEP_PAGE_SIZE - 1)
+        )
+        page = response.data or []
+        items.extend(page)
+        if len(page) < SWEEP_PAGE_SIZE:
+            break
+        offset += SWEEP_PAGE_SIZE
+
+    for item in items:
+        if item.get("expiry_date"):
+            days_left = (date.fromisoformat(item["expiry_date"][:10]) - today).days
+        else:
+            days_left = item.get("expiry_days") or 0
+        item["days_left"] = days_left
+        # Frontend membaca expiry_days sebagai "hari tersisa" -> isi dengan nilai terkini
+        item["expiry_days"] = days_left
+    items.sort(key=lambda x: x["days_left"])
+    return items
+
+async def _build_expiry_report():
+    """
+    Cek barang yang mau busuk (sisa <= 7 hari).
     Mengambil data kontak Vendor dari tabel 'users' untuk notifikasi.
     """
     print("🔔 Checking expiry for notifications...")
     
     # 1. Ambil data stok yang mau busuk (Warning H-7)
-    response = supabase.table("supplies").select("*").lte("expiry_days", 7).execute()
-    expiring_items = response.data
+    expiring_items = await _fetch_expiring_supplies(date.today())
     
     if not expiring_items:
         return {"status": "no_risk", "messages": []}
@@ -40,56 +110,40 @@ def check_expiry_and_notify():
         if not uid:
             continue
             
-        if uid not in vendor_groups:
-            vendor_groups[uid] = []
-        vendor_groups[uid].append(item)
-        
-    # Lokasi SPPG (Monas - Jakarta Pusat)
-    sppg_lat = -6.175392
-    sppg_long = 106.827153
-    
-    # Loop setiap Vendor untuk kirim notifikasi personal
+        vendor_groups.setdefault(uid, []).append(item)
+
+    # Ambil profil SEMUA vendor sekaligus (batch in_ + cache), bukan satu query per vendor
+    try:
+        vendor_profiles = await get_user_profiles(list(vendor_groups.keys()))
+    except Exception as e:
+        print(f"⚠️ Gagal ambil data vendor: {e}")
+        vendor_profiles = {}
+
+    # Penugasan SPPG untuk SEMUA vendor sekaligus (kapasitas harian tiap SPPG dihormati).
+    # Urutan vendor = urutan paling mendesak (expiring_items sudah urut days_left),
+    # jadi kalau kapasitas kurang, vendor yang stoknya paling cepat busuk didahulukan.
+    vendor_locations = {}
     for uid, items in vendor_groups.items():
-        # 1. Ambil Data User (Vendor) dari Database
-        try:
-            user_res = supabase.table("users").select("full_name, phone_number, latitude, longitude").eq("id", uid).single().execute()
-            vendor_user = user_res.data
-        except Exception as e:
-            print(f"⚠️ Gagal ambil data user {uid}: {e}")
-            continue
+        profile = vendor_profiles.get(uid) or {}
+        lat, long = profile.get('latitude'), profile.get('longitude')
+        if not (lat and long):
+            # Vendor belum isi GPS profil -> pakai GPS stoknya
+            located = next((i for i in items if i.get('latitude') and i.get('longitude')), None)
+            if located:
+                lat, long = located['latitude'], located['longitude']
+        if lat and long:
+            vendor_locations[uid] = (lat, long)
 
-        if not vendor_user:
-            continue
+    try:
+        assignments = await sppg.assign_vendors(vendor_locations)
+    except Exception as e:
+        print(f"⚠️ Gagal menugaskan SPPG: {e}")
+        assignments = {}
 
-        # 2. Siapkan Data Pesan
-        vendor_name = vendor_user.get('full_name', 'Mitra Vendor')
-        phone = vendor_user.get('phone_number', '-')
-        item_names = ", ".join([f"{i['item_name']} ({i['quantity']} {i['unit']})" for i in items])
-        
-        # Hitung jarak vendor ke SPPG (Jika vendor punya GPS)
-        v_lat = vendor_user.get('latitude')
-        v_long = vendor_user.get('longitude')
-        
-        dist_info = ""
-        if v_lat and v_long:
-            dist = haversine_distance(v_lat, v_long, sppg_lat, sppg_long)
-            dist_info = f"Lokasi SPPG terdekat berjarak {dist:.1f} km dari titik Anda."
-        else:
-            dist_info = "Segera tawarkan ke SPPG terdekat."
-            
-        # 3. Format Pesan WhatsApp
-        msg = {
-            "to": f"{vendor_name} ({phone})",
-            "role": "Vendor (UMKM)",
-            "type": "WARNING",
-            "message": (
-                f"⚠️ Halo {vendor_name}!\n"
-                f"Stok berikut akan segera kadaluarsa: {item_names}.\n"
-                f"{dist_info}\n"
-                f"Saran: Diskonkan sekarang atau donasikan ke Dapur Umum sebelum rugi total!"
-            )
-        }
-        notifications.append(msg)
+    for uid, items in vendor_groups.items():
+        vendor_user = vendor_profiles.get(uid)
+        if vendor_user:
+            notifications.append(_build_vendor_notification(vendor_user, items, assignments.get(uid)))
         
     # --- LOGIC 2: NOTIFIKASI KE SPPG (KITCHEN) ---
     # SPPG butuh solusi (Resep Penyelamatan) dari SEMUA bahan yang mau busuk
@@ -104,34 +158,27 @@ def check_expiry_and_notify():
             "rescue_menu": None
         }
 
-    items_hash = ",".join(all_expiring_names)
-    
-    global _RESCUE_MENU_CACHE
-    
-    # Cek Cache: Jika daftar bahannya sama persis, jangan tanya AI lagi (Hemat Biaya)
-    if _RESCUE_MENU_CACHE["hash"] == items_hash and _RESCUE_MENU_CACHE["menu"]:
-        print("⚡ Using Cached Rescue Menu (Saving AI Tokens)")
-        rescue_menu = _RESCUE_MENU_CACHE["menu"]
+    # Minta AI buatkan resep penyelamatan. Daftar bahan yang sama (urutan / penulisan boleh beda)
+    # dilayani dari cache rekomendasi menu (services/kitchen.py), tidak tanya AI lagi
+    try:
+        rescue_menu_data = await generate_menu_recommendation(all_expiring_names)
+    except LLMBusyError as e:
+        # Sweep background: notifikasi vendor tetap jalan, resep menyusul di sweep berikutnya
+        print(f"⚠️ Resep penyelamatan dilewati: {e}")
+        rescue_menu_data = None
+
+    # Normalisasi struktur data dari AI (kadang return list, kadang dict)
+    if isinstance(rescue_menu_data, dict) and "recommendations" in rescue_menu_data:
+        rescue_menu = rescue_menu_data["recommendations"][0]
+    elif isinstance(rescue_menu_data, list) and len(rescue_menu_data) > 0:
+        rescue_menu = rescue_menu_data[0]
+    elif isinstance(rescue_menu_data, dict) and "menu_name" in rescue_menu_data:
+        rescue_menu = rescue_menu_data
     else:
-        print("🤖 Generating New Rescue Menu via AI...")
-        # Minta AI buatkan resep penyelamatan
-        rescue_menu_data = generate_menu_recommendation(all_expiring_names)
-        
-        # Normalisasi struktur data dari AI (kadang return list, kadang dict)
-        if isinstance(rescue_menu_data, dict) and "recommendations" in rescue_menu_data:
-             rescue_menu = rescue_menu_data["recommendations"][0]
-        elif isinstance(rescue_menu_data, list) and len(rescue_menu_data) > 0:
-            rescue_menu = rescue_menu_data[0]
-        elif isinstance(rescue_menu_data, dict) and "menu_name" in rescue_menu_data:
-             rescue_menu = rescue_menu_data
-        else:
+        if rescue_menu_data is not None:
             print(f"⚠️ Invalid Rescue Menu Data: {rescue_menu_data}")
-            rescue_menu = None
-            
-        # Simpan ke cache
-        if rescue_menu:
-            _RESCUE_MENU_CACHE = {"hash": items_hash, "menu": rescue_menu}
-    
+        rescue_menu = None
+
     if rescue_menu:
         menu_name = rescue_menu.get("menu_name", "Tumis Campur Darurat")
         
@@ -169,4 +216,34 @@ Reasoning AI: {rescue_menu.get('reason')}"""
         "data": notifications,
         "expiring_items": expiring_items,
         "rescue_menu": rescue_menu
-    }
\ No newline at end of file
+    }
+
+# --- SWEEPER TERJADWAL ---
+# Hasil sweep terakhir disimpan di sini; endpoint trigger cukup membaca.
+_LAST_SWEEP = {"result": None, "swept_at": None}
+_SWEEP_LOCK = asyncio.Lock()
+
+async def run_expiry_sweep():
+    """
+    Jalankan scan expiry penuh lalu simpan hasilnya (dipanggil scheduler).
+    """
+    async with _SWEEP_LOCK:
+        result = await _build_expiry_report()
+        swept_at = datetime.now(timezone.utc).isoformat()
+        result["swept_at"] = swept_at
+        _LAST_SWEEP["result"] = result
+        _LAST_SWEEP["swept_at"] = swept_at
+        print(f"🧹 Expiry sweep selesai: {len(result.get('expiring_items', []))} item berisiko")
+        return result
+
+async def check_expiry_and_notify():
+    """
+    Hasil sweep expiry terakhir (tanpa scan ulang).
+    Hanya kalau belum pernah ada sweep (server baru nyala), scan dijalankan sekali.
+    """
+    if _LAST_SWEEP["result"] is None:
+        async with _SWEEP_LOCK:
+            pass  # tunggu sweep yang mungkin sedang jalan
+        if _LAST_SWEEP["result"] is None:
+            return await run_expiry_sweep()
+    return _LAST_SWEEP["result"]
@@ -1,16 +1,84 @@
+import hashlib
 import json
+import re
+import numpy as np
+from contextlib import aclosing
 from datetime import datetime, timedelta
-from .clients import kolosal_client, supabase
-from .logistics import haversine_distance
+from fastapi.concurrency import run_in_threadpool
+from .cache import DiskCache
+from .clients import LLMBusyError, chat_completion, chat_completion_stream, db, execute
+from .distance import haversine_many
+from .search import normalize_item_name
+from .streaming import JSONStreamParser
+from . import events, geocoder, menu_knowledge, roadnet
+from .users import get_user_profile
 from prompts import (
     get_menu_recommendation_prompt,
     get_meal_expiry_prompt
 )
+from config import LLM_BUSY_RETRY_AFTER, LLM_MODEL, MENU_CACHE_PATH, MENU_CACHE_MAX_ENTRIES, MENU_CACHE_TTL
 
-def generate_menu_recommendation(ingredients_list):
+# Cache rekomendasi menu (persisten, dipakai bersama semua worker): flow rescue & /api/recommend-menu.
+# Key = multiset bahan yang dinormalisasi, jadi urutan / huruf besar / sinonim ("cabe" = "cabai") tidak bikin miss.
+_MENU_CACHE = DiskCache(
+    "menu_recommendations", MENU_CACHE_PATH,
+    max_entries=MENU_CACHE_MAX_ENTRIES, ttl_seconds=MENU_CACHE_TTL
+)
+
+def menu_cache_key(ingredients_list) -> str:
     """
-    Fungsi untuk minta ide menu ke Claude berdasarkan stok
+    ["Telur", "cabe", "telur"] dan ["Cabai", "Telur", "Telur"] -> key yang sama.
+    Versi prompt + model ikut di key: prompt berubah -> rekomendasi lama tidak dipakai.
     """
+    names = sorted(n for n in (normalize_item_name(i) for i in ingredients_list) if n)
+    version = hashlib.sha1(f"{LLM_MODEL}\n{get_menu_recommendation_prompt('{}')}".encode()).hexdigest()[:12]
+    return f"menu:{version}:{hashlib.sha1(chr(31).join(names).encode()).hexdigest()}"
+
+# DiskCache = file SQLite (blocking) -> lewat threadpool, jangan di event loop
+async def _cached_menu(cache_key: str):
+    try:
+        return await run_in_threadpool(_MENU_CACHE.get, cache_key)
+    except Exception as e:
+        print(f"⚠️ Menu cache error: {e}")
+        return None
+
+async def _parse_menu_content(content: str, cache_key: str):
+    """Jawaban mentah AI -> JSON menu (disimpan ke cache kalau berisi menu) atau dict error."""
+    # Robust JSON Extraction
+    json_match = re.search(r'\{.*\}|\[.*\]', content, re.DOTALL)
+    if not json_match:
+        # Fallback if no JSON found
+        return {"error": "AI did not return valid JSON", "raw": content}
+    result = json.loads(json_match.group(0))
+    # Yang di-cache hanya hasil yang berisi menu
+    if result and not (isinstance(result, dict) and "error" in result):
+        try:
+            await run_in_threadpool(_MENU_CACHE.set, cache_key, result)
+        except Exception as e:
+            print(f"⚠️ Gagal simpan menu cache: {e}")
+    return result
+
+def menu_recommendations(result) -> list:
+    """Struktur jawaban AI kadang beda: {"recommendations": [...]}, [...], atau satu menu {...}."""
+    if isinstance(result, dict) and isinstance(result.get("recommendations"), list):
+        return result["recommendations"]
+    if isinstance(result, list):
+        return [r for r in result if isinstance(r, dict)]
+    if isinstance(result, dict) and "menu_name" in result:
+        return [result]
+    return []
+
+async def generate_menu_recommendation(ingredients_list):
+    """
+    Fungsi untuk minta ide menu ke Claude berdasarkan stok.
+    Kombinasi bahan yang sama sudah pernah ditanyakan -> langsung dari cache (hemat token).
+    """
+    cache_key = menu_cache_key(ingredients_list)
+    cached = await _cached_menu(cache_key)
+    if cached is not None:
+        print(f"⚡ Rekomendasi menu dari cache untuk: {ingredients_list}")
+        return cached
+
     print(f"👨‍🍳 Mengirim request menu ke Claude untuk: {ingredients_list}")
     
     ingredients_text = ", ".join(ingredients_list)
@@ -19,41 +87,86 @@ def generate_menu_recommendation(ingredients_list):
     prompt = get_menu_recommendation_prompt(ingredients_text)
     
     try:
-        response = kolosal_client.chat.completions.create(
-            model="Claude Sonnet 4.5",
+        response = await chat_completion(
             messages=[{"role": "user", "content": prompt}],
             max_tokens=1500
         )
         
         content = response.choices[0].message.content
         print(f"🤖 Raw AI Response: {content}") # Debug print
+        return await _parse_menu_content(content, cache_key)
         
-        # Robust JSON Extraction
-        import re
-        json_match = re.search(r'\{.*\}|\[.*\]', content, re.DOTALL)
-        if json_match:
-            cleaned_content = json_match.group(0)
-            return json.loads(cleaned_content)
-        else:
-            # Fallback if no JSON found
-            return {"error": "AI did not return valid JSON", "raw": content}
-        
+    except LLMBusyError:
+        raise  # route -> 503 + Retry-After
     except Exception as e:
         print(f"❌ Error Menu AI: {e}")
         return {"error": f"Gagal membuat menu: {str(e)}"}
 
-def calculate_meal_expiry(menu_name: str) -> dict:
+async def stream_menu_recommendation(ingredients_list):
+    """
+    Versi streaming generate_menu_recommendation: yield (event, data).
+    - ("recommendation", {...}) begitu satu object menu selesai ditulis model
+    - ("done", hasil lengkap) di akhir (format sama dengan endpoint biasa), atau ("error", {...})
+    - ("busy", {...}) kalau antrean LLM penuh (client boleh coba lagi setelah retry_after detik)
+    Hasil cache dikirim langsung tanpa panggil AI.
+    """
+    cache_key = menu_cache_key(ingredients_list)
+    cached = await _cached_menu(cache_key)
+    if cached is not None:
+        print(f"⚡ Rekomendasi menu dari cache untuk: {ingredients_list}")
+        for menu in menu_recommendations(cached):
+            yield "recommendation", menu
+        yield "done", cached
+        return
+
+    print(f"👨‍🍳 Streaming request menu ke Claude untuk: {ingredients_list}")
+    prompt = get_menu_recommendation_prompt(", ".join(ingredients_list))
+    parser = JSONStreamParser()
+    sent = 0
+    try:
+        async with aclosing(chat_completion_stream(
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=1500
+        )) as stream:
+            async for text in stream:
+                for menu in parser.feed(text):
+                    sent += 1
+                    yield "recommendation", menu
+
+        result = await _parse_menu_content(parser.text, cache_key)
+    except LLMBusyError as e:
+        yield "busy", {"error": str(e), "retry_after": LLM_BUSY_RETRY_AFTER}
+        return
+    except Exception as e:
+        print(f"❌ Error Menu AI (stream): {e}")
+        yield "error", {"error": f"Gagal membuat menu: {str(e)}"}
+        return
+
+    if isinstance(result, dict) and "error" in result:
+        yield "error", result
+        return
+    # Jaga-jaga: menu yang tidak terdeteksi parser bertahap (misal jawaban satu object) dikirim sekarang
+    for menu in menu_recommendations(result)[sent:]:
+        yield "recommendation", menu
+    yield "done", result
+
+async def calculate_meal_expiry(menu_name: str) -> dict:
     """
     Tanya Claude: Analisis umur simpan & Tips penyimpanan.
     Output: Dictionary lengkap (bukan cuma int).
+    Menu yang sudah pernah dianalisis diambil dari menu_knowledge (memori), tanpa panggil AI.
     """
+    known = menu_knowledge.lookup(menu_name)
+    if known is not None:
+        print(f"⚡ Safety Food '{menu_name}' dari menu_knowledge")
+        return known
+
     print(f"🕒 Analisis Safety Food untuk: {menu_name}")
     
     prompt = get_meal_expiry_prompt(menu_name)
     
     try:
-        response = kolosal_client.chat.completions.create(
-            model="Claude Sonnet 4.5",
+        response = await chat_completion(
             messages=[{"role": "user", "content": prompt}],
             max_tokens=300,
             temperature=0.2
@@ -64,6 +177,8 @@ def calculate_meal_expiry(menu_name: str) -> dict:
         data = json.loads(cleaned_content)
         
         print(f"✅ Analisis Selesai: {data.get('risk_factor')}")
+        # Simpan untuk masakan berikutnya (fallback default di bawah tidak ikut disimpan)
+        await menu_knowledge.remember(menu_name, data)
         return data
 
     except Exception as e:
@@ -77,7 +192,7 @@ def calculate_meal_expiry(menu_name: str) -> dict:
             "nutrition": {"calories": "N/A", "protein": "N/A", "carbs": "N/A", "fats": "N/A"}
         }
 
-def cook_meal(menu_name: str, qty_produced: int, ingredients_ids: list):
+async def cook_meal(menu_name: str, qty_produced: int, ingredients_ids: list):
     """
     Catat produksi masakan:
     1. Kurangi stok bahan baku (deduct stock).
@@ -89,7 +204,8 @@ def cook_meal(menu_name: str, qty_produced: int, ingredients_ids: list):
     # Idealnya kurangi qty, tapi untuk hackathon kita hapus row biar visual
     if ingredients_ids:
         try:
-            supabase.table("supplies").delete().in_("id", ingredients_ids).execute()
+            deleted = await execute(db.table("supplies").delete().in_("id", ingredients_ids))
+            events.publish(events.SUPPLIES_REMOVED, deleted.data)
             print(f"✅ Bahan baku {ingredients_ids} telah digunakan.")
         except Exception as e:
             print(f"❌ Gagal update stok: {e}")
@@ -97,7 +213,7 @@ def cook_meal(menu_name: str, qty_produced: int, ingredients_ids: list):
             
     # 2. Estimasi Nutrisi & Safety pakai AI (Reuse calculate_meal_expiry)
     # Ini lebih efisien karena satu kali panggil dapet expiry + nutrition
-    analysis_result = calculate_meal_expiry(menu_name)
+    analysis_result = await calculate_meal_expiry(menu_name)
     
     # Ambil data nutrisi dari hasil analisis
     nutrition_data = analysis_result.get("nutrition", {"calories": "N/A", "protein": "N/A"})
@@ -117,7 +233,7 @@ def cook_meal(menu_name: str, qty_produced: int, ingredients_ids: list):
     }
     
     try:
-        supabase.table("meal_productions").insert(data_production).execute()
+        await execute(db.table("meal_productions").insert(data_production))
     except Exception as e:
         print(f"⚠️ Gagal simpan log produksi: {e}")
 
@@ -128,14 +244,14 @@ def cook_meal(menu_name: str, qty_produced: int, ingredients_ids: list):
         "safety_analysis": analysis_result
     }
 
-def mark_meal_as_served(meal_id: int):
+async def mark_meal_as_served(meal_id: int):
     """
     Tandai masakan sebagai 'served' (Telah Disajikan).
     Status ini menghentikan monitoring expiry.
     """
     print(f"🍽️ Marking meal {meal_id} as served...")
     try:
-        response = supabase.table("meal_productions").update({"status": "served"}).eq("id", meal_id).execute()
+        response = await execute(db.table("meal_productions").update({"status": "served"}).eq("id", meal_id))
         return {"status": "success", "data": response.data}
     except Exception as e:
         print(f"❌ Gagal update status served: {e}")
@@ -143,91 +259,131 @@ def mark_meal_as_served(meal_id: int):
 
 # backend/services/kitchen.py
 
-def chat_with_chef(user_message: str, user_id: int):
+async def _chef_messages(user_message: str, user_id: int) -> list:
     """
-    Chatbot Koki Pintar (Logistik Edition).
+    Rakit pesan untuk Chatbot Koki Pintar (Logistik Edition).
     Konteks:
     1. Stok Dapur (Barang yang sudah dibeli/completed orders).
     2. Stok Pasar (Barang vendor + Jarak).
     """
-    try:
-        # --- LANGKAH 1: AMBIL DATA LOKASI KITCHEN ---
-        user_res = supabase.table("users").select("latitude, longitude").eq("id", user_id).single().execute()
-        kitchen_loc = user_res.data
-        k_lat = kitchen_loc.get('latitude', -6.175392)
-        k_long = kitchen_loc.get('longitude', 106.827153)
-
-        # --- LANGKAH 2: AMBIL 'MY STOCK' (GLOBAL INVENTORY VIEW) ---
-        # Mengambil SEMUA stok di gudang (supplies table) - sama seperti dashboard overview
-        my_stock_res = supabase.table("supplies")\
-            .select("*")\
-            .order("created_at", desc=True)\
-            .limit(50)\
-            .execute()
-        
-        my_stock_list = []
-        if my_stock_res.data:
-            for item in my_stock_res.data:
-                quality = item.get('quality_status', 'N/A')
-                freshness = item.get('freshness', quality)  # Fallback to quality_status
-                my_stock_list.append(
-                    f"- **{item['item_name']}**: {item['quantity']} {item['unit']} "
-                    f"(Kualitas: {freshness}, Supplier: {item['owner_name']})"
-                )
-        
-        my_stock_text = "\n".join(my_stock_list) if my_stock_list else "- Tidak ada stok (Gudang Kosong)"
+    # --- LANGKAH 1: AMBIL DATA LOKASI KITCHEN ---
+    kitchen_loc = await get_user_profile(user_id) or {}
+    k_lat, k_long = kitchen_loc.get('latitude'), kitchen_loc.get('longitude')
+    if k_lat is None or k_long is None:
+        # Belum ada GPS: perkiraan dari alamat dapur
+        k_lat, k_long = geocoder.approximate_location(kitchen_loc.get('address'))
 
-        # --- LANGKAH 3: AMBIL 'MARKET STOCK' (APA YG BISA DIBELI) ---
-        # Ambil semua supply dari vendor
-        market_res = supabase.table("supplies").select("*").execute()
-        market_list = []
-        
-        if market_res.data:
-            for item in market_res.data:
-                # Hitung Jarak
-                dist = 0
-                if item.get('latitude') and item.get('longitude'):
-                    dist = haversine_distance(k_lat, k_long, item['latitude'], item['longitude'])
-                
+    # --- LANGKAH 2: AMBIL 'MY STOCK' (GLOBAL INVENTORY VIEW) ---
+    # Mengambil SEMUA stok di gudang (supplies table) - sama seperti dashboard overview
+    my_stock_res = await execute(
+        db.table("supplies")
+        .select("*")
+        .order("created_at", desc=True)
+        .limit(50)
+    )
+    
+    my_stock_list = []
+    if my_stock_res.data:
+        for item in my_stock_res.data:
+            quality = item.get('quality_status', 'N/A')
+            freshness = item.get('freshness', quality)  # Fallback to quality_status
+            my_stock_list.append(
+                f"- **{item['item_name']}**: {item['quantity']} {item['unit']} "
+                f"(Kualitas: {freshness}, Supplier: {item['owner_name']})"
+            )
+    
+    my_stock_text = "\n".join(my_stock_list) if my_stock_list else "- Tidak ada stok (Gudang Kosong)"
+
+    # --- LANGKAH 3: AMBIL 'MARKET STOCK' (APA YG BISA DIBELI) ---
+    # Ambil semua supply dari vendor
+    market_res = await execute(db.table("supplies").select("*"))
+    market_list = []
+    
+    if market_res.data:
+        # Hitung Jarak semua item sekaligus (item tanpa GPS -> 0 km, seperti sebelumnya)
+        item_lats = [item.get('latitude') or np.nan for item in market_res.data]
+        item_longs = [item.get('longitude') or np.nan for item in market_res.data]
+        dists = np.nan_to_num(haversine_many(k_lat, k_long, item_lats, item_longs), nan=0.0)
+
+        if roadnet.is_ready():
+            # Waktu tempuh lewat jalan -> vendor diurutkan yang paling cepat dicapai
+            minutes = np.nan_to_num(await roadnet.travel_minutes_from(k_lat, k_long, item_lats, item_longs), nan=0.0)
+            for i in np.argsort(minutes, kind="stable"):
+                item = market_res.data[i]
+                market_list.append(
+                    f"- {item['item_name']}: Tersedia di {item['owner_name']} "
+                    f"(Jarak: {dists[i]:.1f} km, ±{minutes[i]:.0f} menit)"
+                )
+        else:
+            for item, dist in zip(market_res.data, dists):
                 # Format: "Bawang Merah (Pak Asep - 2.5km)"
                 market_list.append(f"- {item['item_name']}: Tersedia di {item['owner_name']} (Jarak: {dist:.1f} km)")
 
-        market_text = "\n".join(market_list) if market_list else "- Pasar sedang kosong"
+    market_text = "\n".join(market_list) if market_list else "- Pasar sedang kosong"
 
-        # --- LANGKAH 4: RAKIT SYSTEM PROMPT ---
-        system_prompt = f"""
-        Kamu adalah "Chef Bekal", asisten dapur AI yang ahli manajemen logistik.
-        
-        DATA INVENTARIS DAPUR SAYA (Gunakan ini dulu):
-        {my_stock_text}
-        
-        DATA PASAR & VENDOR TERDEKAT (Gunakan ini jika stok dapur kurang):
-        {market_text}
-        
-        TUGAS KAMU:
-        1. Saat user minta resep, PERTAMA-TAMA: List dulu bahan apa saja yang SUDAH ADA di dapur saya beserta kualitasnya.
-        2. KEDUA: Jika ada bahan yang kurang, cari di DATA PASAR.
-           - Jika ada vendor yg jual: Tulis "Bisa beli [Nama Barang] di [Nama Vendor] (Jaraknya [X] km)".
-           - Prioritaskan vendor dengan jarak TERDEKAT.
-           - Jika tidak ada di pasar: Tulis "Barang ini sedang tidak tersedia di vendor mitra".
-        3. KETIGA: Berikan resep masakan lengkapnya.
-        
-        Gaya bahasa: Ramah, profesional, dan sangat membantu secara operasional.
-        """
+    # --- LANGKAH 4: RAKIT SYSTEM PROMPT ---
+    system_prompt = f"""
+    Kamu adalah "Chef Bekal", asisten dapur AI yang ahli manajemen logistik.
+    
+    DATA INVENTARIS DAPUR SAYA (Gunakan ini dulu):
+    {my_stock_text}
+    
+    DATA PASAR & VENDOR TERDEKAT (Gunakan ini jika stok dapur kurang):
+    {market_text}
+    
+    TUGAS KAMU:
+    1. Saat user minta resep, PERTAMA-TAMA: List dulu bahan apa saja yang SUDAH ADA di dapur saya beserta kualitasnya.
+    2. KEDUA: Jika ada bahan yang kurang, cari di DATA PASAR.
+       - Jika ada vendor yg jual: Tulis "Bisa beli [Nama Barang] di [Nama Vendor] (Jaraknya [X] km)".
+       - Prioritaskan vendor dengan jarak TERDEKAT (kalau ada waktu tempuh, yang paling cepat dicapai).
+       - Jika tidak ada di pasar: Tulis "Barang ini sedang tidak tersedia di vendor mitra".
+    3. KETIGA: Berikan resep masakan lengkapnya.
+    
+    Gaya bahasa: Ramah, profesional, dan sangat membantu secara operasional.
+    """
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_message}
+    ]
+
+async def chat_with_chef(user_message: str, user_id: int):
+    """
+    Chatbot Koki Pintar: konteks stok dapur + pasar (lihat _chef_messages), jawaban sekaligus.
+    """
+    try:
+        messages = await _chef_messages(user_message, user_id)
 
         # --- LANGKAH 5: KIRIM KE CLAUDE ---
-        response = kolosal_client.chat.completions.create(
-            model="Claude Sonnet 4.5",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            max_tokens=1500
-        )
+        response = await chat_completion(messages=messages, max_tokens=1500)
         
         ai_reply = response.choices[0].message.content
         return {"reply": ai_reply}
 
+    except LLMBusyError:
+        raise  # route -> 503 + Retry-After
     except Exception as e:
         print(f"Chat Error: {e}")
-        return {"error": "Maaf, Chef sedang mengecek gudang. Coba lagi nanti."}
\ No newline at end of file
+        return {"error": "Maaf, Chef sedang mengecek gudang. Coba lagi nanti."}
+
+async def stream_chat_with_chef(user_message: str, user_id: int):
+    """
+    Versi streaming chat_with_chef: yield (event, data).
+    ("delta", {"text": ...}) per potongan jawaban, lalu ("done", {"reply": jawaban lengkap}) atau ("error", {...}).
+    Antrean LLM penuh -> ("busy", {...}).
+    """
+    reply = []
+    try:
+        messages = await _chef_messages(user_message, user_id)
+        async with aclosing(chat_completion_stream(messages=messages, max_tokens=1500)) as stream:
+            async for text in stream:
+                reply.append(text)
+                yield "delta", {"text": text}
+    except LLMBusyError as e:
+        yield "busy", {"error": str(e), "retry_after": LLM_BUSY_RETRY_AFTER}
+        return
+    except Exception as e:
+        print(f"Chat Error (stream): {e}")
+        yield "error", {"error": "Maaf, Chef sedang mengecek gudang. Coba lagi nanti."}
+        return
+    yield "done", {"reply": "".join(reply)}
\ No newline at end of file
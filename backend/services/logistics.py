@@ -1,88 +1,407 @@
-import math
-import random
-from .clients import supabase
-
-# --- DATA SPPG (HARDCODED NETWORK) ---
-SPPG_LOCATIONS = [
-    {"id": 1, "name": "SPPG Jakarta Pusat (Monas)", "address": "Jl. Medan Merdeka Barat, Gambir", "lat": -6.175392, "long": 106.827153, "phone": "0812-3456-7890"},
-    {"id": 2, "name": "SPPG Jakarta Selatan (Blok M)", "address": "Jl. Melawai Raya, Kebayoran Baru", "lat": -6.244223, "long": 106.801782, "phone": "0812-9876-5432"},
-    {"id": 3, "name": "SPPG Jakarta Barat (Grogol)", "address": "Jl. Kyai Tapa, Grogol Petamburan", "lat": -6.167570, "long": 106.790960, "phone": "0812-1122-3344"},
-    {"id": 4, "name": "SPPG Jakarta Timur (Jatinegara)", "address": "Jl. Matraman Raya, Jatinegara", "lat": -6.215116, "long": 106.870434, "phone": "0812-5566-7788"},
-    {"id": 5, "name": "SPPG Jakarta Utara (Kelapa Gading)", "address": "Jl. Boulevard Raya, Kelapa Gading", "lat": -6.162331, "long": 106.900220, "phone": "0812-9988-7766"}
-]
-
-def haversine_distance(lat1, lon1, lat2, lon2):
-    """
-    Hitung jarak antara dua titik koordinat (km)
-    """
-    R = 6371  # Radius bumi dalam km
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat / 2) * math.sin(dlat / 2) + math.cos(math.radians(lat1)) \
-        * math.cos(math.radians(lat2)) * math.sin(dlon / 2) * math.sin(dlon / 2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
-
-def search_suppliers(keyword: str, user_lat: float = -6.175392, user_long: float = 106.827153):
+import asyncio
+import re
+import numpy as np
+from .clients import db, execute
+from .distance import haversine_distance, haversine_many  # haversine_distance tetap di-export buat import lama
+from .search import normalize_item_name, make_matcher
+from .sppg import get_network
+from . import geocoder, geoindex, ingredients, roadnet
+
+# Default & batas pencarian supplier
+DEFAULT_SEARCH_RADIUS_KM = 50
+DEFAULT_SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 200
+# Backend road: kandidat garis lurus diambil lebih banyak, lalu diurutkan ulang pakai waktu tempuh
+ROAD_CANDIDATE_FACTOR = 3
+# Jalur fallback DB (index belum siap): baris yang di-scan maksimal kandidat x faktor ini
+FALLBACK_SCAN_FACTOR = 10
+FALLBACK_SCAN_COLUMNS = "id, search_name, latitude, longitude, location"
+
+def _with_location(item: dict, dist: float, lat: float, long: float) -> dict:
+    # Tambahkan info jarak ke item
+    item['distance_km'] = round(dist, 1)
+    item['location_lat'] = lat
+    item['location_long'] = long
+    return item
+
+async def _rank_by_travel_time(results: list, user_lat: float, user_long: float, limit: int) -> list:
+    # Waktu tempuh lewat jalan (tree dapur ter-cache), urutkan ulang lalu potong ke limit
+    minutes = await roadnet.travel_minutes_from(
+        user_lat, user_long,
+        [r['location_lat'] for r in results], [r['location_long'] for r in results]
+    )
+    for row, m in zip(results, minutes):
+        row['travel_minutes'] = round(float(m), 1)
+    results.sort(key=lambda x: x['travel_minutes'])
+    return results[:limit]
+
+async def search_suppliers(
+    keyword: str,
+    user_lat: float = -6.175392,
+    user_long: float = 106.827153,
+    radius_km: float = DEFAULT_SEARCH_RADIUS_KM,
+    limit: int = DEFAULT_SEARCH_LIMIT
+):
     """
     Cari supplier dan urutkan berdasarkan JARAK TERDEKAT.
     Default User Location: Monas (Jakarta Pusat).
+    Hanya k (`limit`) supplier terdekat dalam `radius_km` yang dikembalikan.
+    Kalau road network aktif, urutan pakai waktu tempuh (`travel_minutes`), bukan garis lurus.
     """
-    print(f"🔍 Mencari supplier '{keyword}' dekat {user_lat}, {user_long}")
-    
+    print(f"🔍 Mencari supplier '{keyword}' dekat {user_lat}, {user_long} (radius {radius_km} km)")
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+    # Nama dinormalisasi + sinonim ("cabe" -> "cabai"), toleran typo (trigram)
+    query = normalize_item_name(keyword)
+    score = make_matcher(keyword)
+    by_road = roadnet.is_ready()
+    candidates = min(limit * ROAD_CANDIDATE_FACTOR, MAX_SEARCH_LIMIT) if by_road else limit
+
     try:
-        # 1. Ambil data dari DB (Filter nama dulu)
-        response = supabase.table("supplies")\
-            .select("*")\
-            .ilike("item_name", f"%{keyword}%")\
-            .execute()
-            
+        if geoindex.is_ready():
+            # 1. Kandidat terdekat dari spatial index (hanya sel di sekitar user)
+            hits = geoindex.nearest(
+                user_lat, user_long, radius_km, candidates,
+                match=lambda entry: score(entry["search_name"]) > 0
+            )
+            if not hits:
+                return []
+
+            # 2. Ambil detail baris cuma untuk k hasil tersebut
+            response = await execute(
+                db.table("supplies")
+                .select("*")
+                .in_("id", [entry["id"] for _, entry in hits])
+            )
+            rows_by_id = {row['id']: row for row in response.data}
+
+            # Urutan jarak dari index dipertahankan; baris yang sudah terhapus di DB dilewati
+            results = []
+            for dist, entry in hits:
+                row = rows_by_id.get(entry["id"])
+                if row is None:
+                    continue
+                row['match_score'] = round(score(entry["search_name"]), 2)
+                results.append(_with_location(row, dist, entry["lat"], entry["lon"]))
+            return await _rank_by_travel_time(results, user_lat, user_long, limit) if by_road else results
+
+        # Index belum siap (baru start): scan DB (LIKE di search_name pakai index trigram),
+        # tetap dibatasi radius & limit. Scan cuma kolom untuk ranking jarak, dibatasi
+        # FALLBACK_SCAN_FACTOR x kandidat; detail baris diambil untuk hasil akhir saja.
+        response = await execute(
+            db.table("supplies")
+            .select(FALLBACK_SCAN_COLUMNS)
+            .like("search_name", f"%{query}%")
+            .limit(candidates * FALLBACK_SCAN_FACTOR)
+        )
+
         items = response.data
-        
-        # 2. Inject Dummy Location & Hitung Jarak
-        # (Karena data DB belum ada lat/long beneran, kita simulasi di sini biar demo lancar)
-        
+        if not items:
+            return []
+
+        # 1. Coba ambil Real GPS dari Database
+        item_lats = [item.get('latitude') for item in items]
+        item_longs = [item.get('longitude') for item in items]
+
+        # 2. Fallback jika data GPS kosong (None): centroid wilayah dari alamat (gazetteer offline)
+        for i in range(len(items)):
+            if item_lats[i] is None or item_longs[i] is None:
+                item_lats[i], item_longs[i] = geocoder.approximate_location(items[i].get('location'))
+
+        # Semua jarak dalam satu panggilan vektor
+        dists = haversine_many(user_lat, user_long, item_lats, item_longs)
+
         results_with_distance = []
-        for item in items:
-            # 1. Coba ambil Real GPS dari Database
-            item_lat = item.get('latitude')
-            item_long = item.get('longitude')
-            
-            # 2. Fallback ke Simulasi jika data GPS kosong (None)
-            if item_lat is None or item_long is None:
-                # Simulasi koordinat random sekitar Jakarta (± 0.05 derajat)
-                item_lat = -6.175392 + random.uniform(-0.05, 0.05)
-                item_long = 106.827153 + random.uniform(-0.05, 0.05)
-            
-            dist = haversine_distance(user_lat, user_long, item_lat, item_long)
-            
-            # Tambahkan info jarak ke item
-            item['distance_km'] = round(dist, 1)
-            item['location_lat'] = item_lat
-            item['location_long'] = item_long
-            
-            results_with_distance.append(item)
-            
+        for i in np.flatnonzero(dists <= radius_km):
+            items[i]['match_score'] = 1.0
+            results_with_distance.append(_with_location(items[i], float(dists[i]), item_lats[i], item_longs[i]))
+
         # 3. Urutkan berdasarkan jarak terdekat (Ascending)
         results_with_distance.sort(key=lambda x: x['distance_km'])
-        
+        results_with_distance = results_with_distance[:candidates if by_road else limit]
+        if not results_with_distance:
+            return []
+
+        # 4. Detail lengkap hanya untuk kandidat terpilih (baris yang sudah terhapus dilewati)
+        details = await execute(
+            db.table("supplies")
+            .select("*")
+            .in_("id", [item['id'] for item in results_with_distance])
+        )
+        rows_by_id = {row['id']: row for row in details.data}
+        results_with_distance = [
+            {**rows_by_id[item['id']], **item} for item in results_with_distance if item['id'] in rows_by_id
+        ]
+        if by_road:
+            return await _rank_by_travel_time(results_with_distance, user_lat, user_long, limit)
+
         return results_with_distance
-        
+
     except Exception as e:
         print(f"❌ Error DB Search: {e}")
         return {"error": "Gagal mencari data"}
 
-def search_nearest_sppg(user_lat: float, user_long: float):
+async def search_nearest_sppg(user_lat: float, user_long: float):
     """
     Cari SPPG terdekat dari lokasi user (Vendor).
+    Jaringan SPPG dibaca dari tabel sppg_locations (lewat cache).
+    Kalau road network aktif, diurutkan berdasarkan waktu tempuh (`travel_minutes`).
     """
+    network = await get_network()
+    dists = haversine_many(user_lat, user_long, network["lats"], network["longs"])
+    by_road = roadnet.is_ready()
+    if by_road:
+        minutes = roadnet.sppg_travel_minutes(network["sites"], [user_lat], [user_long])[0]
+
     results = []
-    for sppg in SPPG_LOCATIONS:
-        dist = haversine_distance(user_lat, user_long, sppg['lat'], sppg['long'])
-        sppg_copy = sppg.copy()
-        sppg_copy['distance_km'] = round(dist, 2)
+    for i, (site, dist) in enumerate(zip(network["sites"], dists)):
+        sppg_copy = site.copy()
+        sppg_copy['distance_km'] = round(float(dist), 2)
+        if by_road:
+            sppg_copy['travel_minutes'] = round(float(minutes[i]), 1)
         results.append(sppg_copy)
     
     # Urutkan dari yang terdekat
-    results.sort(key=lambda x: x['distance_km'])
+    results.sort(key=lambda x: x['travel_minutes'] if by_road else x['distance_km'])
     return results
+
+# --- Resolve banyak bahan sekaligus (satu menu) ---
+
+MAX_RESOLVE_INGREDIENTS = 30
+DEFAULT_VENDORS_PER_INGREDIENT = 5
+MAX_VENDORS_PER_INGREDIENT = 10
+SUPPLIES_PER_VENDOR = 3  # supply per vendor per bahan yang ditampilkan
+
+_PARENTHESES = re.compile(r"\([^)]*\)")
+_GLUED_QTY = re.compile(r"(\d+(?:[.,]\d+)?)([a-zA-Z]+)")  # "5kg" -> "5 kg"
+_NUMBER = re.compile(r"^\d+(?:[.,]\d+)?$")
+_SEPARATOR_COMMA = re.compile(r",(?!\d)|(?<!\d),")
+
+def parse_needed_ingredient(text: str) -> dict:
+    """
+    Format ingredients_needed rekomendasi menu -> nama + jumlah.
+    "Ayam 5 kg" / "2 ikat Bayam" / "Beras: 10kg" -> {"name": "Ayam", "qty": 5.0, "unit": "kg"}
+    Tanpa angka -> qty/unit None. Satuan hanya diambil kalau dikenal (ingredients.UNIT_ALIASES).
+    """
+    clean = _GLUED_QTY.sub(r"\1 \2", _PARENTHESES.sub(" ", text or ""))
+    # Koma pemisah (bukan koma desimal "1,5") jadi token sendiri
+    tokens = _SEPARATOR_COMMA.sub(" , ", clean.replace(":", " ")).split()
+    qty, unit, name = None, None, []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if qty is None and _NUMBER.match(token):
+            qty = float(token.replace(",", "."))
+            following = tokens[i + 1].lower().rstrip(".") if i + 1 < len(tokens) else ""
+            if following in ingredients.UNIT_ALIASES:
+                unit = ingredients.normalize_unit(following)
+                i += 1
+        elif token != ",":
+            name.append(token)
+        i += 1
+    name = " ".join(name).strip(" -")
+    if not name:
+        return {"name": (text or "").strip(), "qty": None, "unit": None}
+    return {"name": name, "qty": qty, "unit": unit}
+
+class _Offers:
+    """
+    Penampung kandidat: per vendor jarak supply cocok terdekat,
+    per (index bahan, vendor) daftar (jarak, -skor, supply_id, skor).
+    """
+    def __init__(self):
+        self.vendor_dist, self.vendor_loc, self.rows = {}, {}, {}
+
+    def add(self, found: list, dist: float, supply_id, vendor, lat: float, lon: float):
+        if vendor is None:
+            return
+        if dist < self.vendor_dist.get(vendor, float("inf")):
+            self.vendor_dist[vendor], self.vendor_loc[vendor] = dist, (lat, lon)
+        for i, score in found:
+            self.rows.setdefault((i, vendor), []).append((dist, -score, supply_id, score))
+
+async def _resolve_candidates(queries: list, matchers: list, user_lat: float, user_long: float, radius_km: float) -> _Offers:
+    """
+    Semua supply dalam radius yang cocok dengan salah satu bahan, dalam satu sapuan.
+    """
+    offers = _Offers()
+    if geoindex.is_ready():
+        # Semua yang cocok dalam radius dibutuhkan (bukan top-k): scan sel di bbox radius,
+        # skor per nama unik dihitung sekali untuk semua bahan, jarak dihitung sekaligus (vektor)
+        memo = {}
+        entries = []
+        dlat = radius_km / geoindex.KM_PER_DEG
+        dlon = dlat / max(np.cos(np.radians(user_lat)), 0.01)
+        for _, bucket in geoindex.cells_in_bbox(user_lat - dlat, user_long - dlon,
+                                                user_lat + dlat, user_long + dlon):
+            for entry in bucket.values():
+                found = memo.get(entry["search_name"])
+                if found is None:
+                    found = memo[entry["search_name"]] = [
+                        (i, s) for i, score in enumerate(matchers) if (s := score(entry["search_name"])) > 0
+                    ]
+                if found:
+                    entries.append((entry, found))
+        if entries:
+            dists = haversine_many(user_lat, user_long, [e["lat"] for e, _ in entries],
+                                   [e["lon"] for e, _ in entries]).tolist()
+            for (entry, found), dist in zip(entries, dists):
+                if dist <= radius_km:
+                    offers.add(found, dist, entry["id"], entry["user_id"], entry["lat"], entry["lon"])
+        return offers
+
+    # Index belum siap: pencarian per bahan (jalur fallback DB), dijalankan paralel
+    results = await asyncio.gather(*(
+        search_suppliers(q["name"], user_lat, user_long, radius_km, MAX_SEARCH_LIMIT) for q in queries
+    ))
+    for i, rows in enumerate(results):
+        if isinstance(rows, dict):
+            raise RuntimeError(rows.get("error"))
+        for row in rows:
+            score = matchers[i](row.get('search_name') or normalize_item_name(row.get('item_name')))
+            if score > 0:
+                offers.add([(i, score)], row['distance_km'], row['id'], row.get('user_id'),
+                           row['location_lat'], row['location_long'])
+    return offers
+
+def _greedy_cover(vendor_items: dict, vendor_cost: dict) -> list:
+    """
+    Set cover greedy: ambil vendor yang menutup bahan belum tertutup terbanyak,
+    seri -> vendor paling dekat. Ulangi sampai semua bahan yang tersedia tertutup.
+    """
+    uncovered = set().union(*vendor_items.values()) if vendor_items else set()
+    plan = []
+    while uncovered:
+        vendor = min(
+            vendor_items,
+            key=lambda v: (-len(vendor_items[v] & uncovered), vendor_cost[v], str(v))
+        )
+        gained = vendor_items[vendor] & uncovered
+        if not gained:
+            break
+        plan.append((vendor, sorted(gained)))
+        uncovered -= gained
+    return plan
+
+async def resolve_ingredients(
+    needed: list,
+    user_lat: float = -6.175392,
+    user_long: float = 106.827153,
+    radius_km: float = DEFAULT_SEARCH_RADIUS_KM,
+    vendors_per_ingredient: int = DEFAULT_VENDORS_PER_INGREDIENT
+):
+    """
+    Cari vendor untuk banyak bahan sekaligus (misal ingredients_needed satu menu).
+    - Per bahan: vendor terdekat yang menjual (maks `vendors_per_ingredient`).
+    - Plan: kombinasi vendor sesedikit mungkin yang menutup semua bahan yang tersedia
+      (greedy set cover, seri -> yang terdekat / tercepat dicapai).
+    """
+    if not needed:
+        return {"error": "Daftar bahan kosong"}
+    if len(needed) > MAX_RESOLVE_INGREDIENTS:
+        return {"error": f"Maksimal {MAX_RESOLVE_INGREDIENTS} bahan per permintaan"}
+    vendors_per_ingredient = max(1, min(vendors_per_ingredient, MAX_VENDORS_PER_INGREDIENT))
+
+    queries = [parse_needed_ingredient(text) for text in needed]
+    # Kata utuh: bahan menu harus persis ("Ayam" bukan "Bayam"), typo tetap lewat trigram
+    matchers = [make_matcher(q["name"], whole_words=True) for q in queries]
+
+    try:
+        found = await _resolve_candidates(queries, matchers, user_lat, user_long, radius_km)
+        vendor_dist, vendor_loc, offers = found.vendor_dist, found.vendor_loc, found.rows
+
+        # Biaya vendor: waktu tempuh kalau road network aktif, selain itu jarak garis lurus
+        vendors = list(vendor_dist)
+        vendor_cost = dict(vendor_dist)
+        vendor_minutes = {}
+        if roadnet.is_ready() and vendors:
+            minutes = await roadnet.travel_minutes_from(
+                user_lat, user_long, [vendor_loc[v][0] for v in vendors], [vendor_loc[v][1] for v in vendors]
+            )
+            vendor_minutes = {v: round(float(m), 1) for v, m in zip(vendors, minutes)}
+            vendor_cost = dict(vendor_minutes)
+
+        vendor_items, item_vendors = {}, {}
+        for (i, vendor), rows in offers.items():
+            rows.sort()
+            vendor_items.setdefault(vendor, set()).add(i)
+            item_vendors.setdefault(i, []).append(vendor)
+
+        per_ingredient = [
+            sorted(item_vendors.get(idx, []), key=lambda v: (vendor_cost[v], str(v)))[:vendors_per_ingredient]
+            for idx in range(len(queries))
+        ]
+        plan = _greedy_cover(vendor_items, vendor_cost)
+
+        # Detail supply (nama, harga, stok, pemilik) untuk semua yang ditampilkan, satu query
+        shown = {(i, v) for i, vs in enumerate(per_ingredient) for v in vs}
+        shown |= {(i, v) for v, items in plan for i in items}
+        supply_ids = {row[2] for key in shown for row in offers[key][:SUPPLIES_PER_VENDOR]}
+        rows_by_id = {}
+        if supply_ids:
+            response = await execute(db.table("supplies").select("*").in_("id", list(supply_ids)))
+            rows_by_id = {row['id']: row for row in response.data or []}
+
+        def supplies_of(i, vendor) -> list:
+            result = []
+            for dist, _, supply_id, score in offers[(i, vendor)][:SUPPLIES_PER_VENDOR]:
+                row = rows_by_id.get(supply_id)
+                if row is None:
+                    continue  # sudah terhapus di DB
+                row = dict(row)
+                row['distance_km'] = round(dist, 1)
+                row['match_score'] = round(score, 2)
+                result.append(row)
+            return result
+
+        def vendor_info(vendor) -> dict:
+            info = {"vendor_id": vendor, "distance_km": round(vendor_dist[vendor], 1)}
+            if vendor in vendor_minutes:
+                info["travel_minutes"] = vendor_minutes[vendor]
+            return info
+
+        def owner_name(vendor, items) -> str:
+            for i in items:
+                for row in supplies_of(i, vendor):
+                    return row.get('owner_name')
+            return None
+
+        ingredients_out = []
+        for idx, query in enumerate(queries):
+            vendors_out = []
+            for vendor in per_ingredient[idx]:
+                supplies = supplies_of(idx, vendor)
+                if supplies:
+                    vendors_out.append({**vendor_info(vendor), "owner_name": supplies[0].get('owner_name'),
+                                        "supplies": supplies})
+            ingredients_out.append({
+                "query": needed[idx],
+                "item": query["name"],
+                "qty_needed": query["qty"],
+                "unit": query["unit"],
+                "available": bool(vendors_out),
+                "vendors": vendors_out
+            })
+
+        plan_out = [
+            {
+                **vendor_info(vendor),
+                "owner_name": owner_name(vendor, items),
+                "ingredients": [queries[i]["name"] for i in items],
+                "supplies": [row for i in items for row in supplies_of(i, vendor)[:1]]
+            }
+            for vendor, items in plan
+        ]
+        covered = {i for _, items in plan for i in items}
+        return {
+            "ingredients": ingredients_out,
+            "plan": {
+                "vendor_count": len(plan_out),
+                "vendors": plan_out,
+                "covered": [queries[i]["name"] for i in sorted(covered)],
+                "unavailable": [queries[i]["name"] for i in range(len(queries)) if i not in covered]
+            }
+        }
+
+    except Exception as e:
+        print(f"❌ Error Resolve Bahan: {e}")
+        return {"error": "Gagal mencari vendor untuk daftar bahan"}
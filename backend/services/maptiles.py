@@ -0,0 +1,171 @@
+import math
+import time
+import numpy as np
+from . import geoindex
+from .cache import TTLCache
+from config import MAP_TILE_CACHE_SIZE
+
+# ==========================================
+# 🛰️ TILE PETA (CLUSTER + DENSITY) DARI GEO INDEX
+# Frontend minta per tile XYZ (Web Mercator, sama dengan tile satelit),
+# bukan semua titik supply. Tiap tile berisi cluster (jumlah + titik tengah)
+# dan grid density untuk heatmap.
+# Hasil di-cache per tile. Saat ada write supply, yang di-invalidate hanya
+# tile (di tiap zoom) yang memuat titik lama/baru supply tersebut.
+# ==========================================
+
+MAX_ZOOM = 18
+CLUSTER_MAX_ZOOM = 16   # di atas zoom ini semua titik dikirim satu-satu
+CLUSTER_GRID = 8        # cluster per sumbu tile (256px / 8 = sel 32px)
+DENSITY_GRID = 16       # sel heatmap per sumbu tile
+# Zoom jauh: pakai hitungan per sel geo index (titik tengah sel), tidak iterasi tiap supply.
+# Sel geo index (0.05°) < 1 sel density di zoom ini, jadi selisih posisinya tidak terlihat.
+COARSE_MAX_ZOOM = 6
+# Perubahan sebanyak ini sekaligus (misal rebuild pertama) -> kosongkan semua tile saja
+BULK_CHANGE_LIMIT = 2000
+
+MAX_LAT = 85.05112878
+
+_TILE_CACHE = TTLCache("map_tiles", max_entries=MAP_TILE_CACHE_SIZE)
+
+# --- Matematika tile (Web Mercator) ---
+
+def _project(lats, lons, z: int):
+    """Koordinat -> posisi tile (float) di zoom z."""
+    n = 2 ** z
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -MAX_LAT, MAX_LAT)
+    lons = np.asarray(lons, dtype=np.float64)
+    fx = (lons + 180.0) / 360.0 * n
+    rad = np.radians(lats)
+    fy = (1.0 - np.log(np.tan(rad) + 1.0 / np.cos(rad)) / math.pi) / 2.0 * n
+    # Titik tepat di batas kanan/bawah dunia masuk tile terakhir
+    return np.clip(fx, 0, n - 1e-9), np.clip(fy, 0, n - 1e-9)
+
+def tile_bbox(z: int, x: int, y: int) -> tuple:
+    """(west, south, east, north) dalam derajat."""
+    n = 2 ** z
+
+    def lat_of(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return (x / n * 360.0 - 180.0, lat_of(y + 1), (x + 1) / n * 360.0 - 180.0, lat_of(y))
+
+# --- Invalidasi per tile ---
+
+def on_geoindex_changed(entries: list):
+    if len(entries) > BULK_CHANGE_LIMIT:
+        _TILE_CACHE.clear()
+        return
+    lats = [e["lat"] for e in entries]
+    lons = [e["lon"] for e in entries]
+    # Harus sama dengan cara _collect menaruh titik (zoom jauh: titik tengah sel geo index)
+    centers = [geoindex.cell_center_of(lat, lon) for lat, lon in zip(lats, lons)]
+    for z in range(MAX_ZOOM + 1):
+        if z <= COARSE_MAX_ZOOM:
+            fx, fy = _project([c[0] for c in centers], [c[1] for c in centers], z)
+        else:
+            fx, fy = _project(lats, lons, z)
+        for key in set(zip(fx.astype(np.int64).tolist(), fy.astype(np.int64).tolist())):
+            _TILE_CACHE.invalidate((z, *key))
+
+geoindex.subscribe_changes(on_geoindex_changed)
+
+# --- Build tile ---
+
+def _collect(z: int, bbox: tuple):
+    """Titik kandidat di bbox: (lats, lons, weights, refs). ref = entry, atau bucket sel di zoom jauh."""
+    west, south, east, north = bbox
+    lats, lons, weights, refs = [], [], [], []
+    for key, bucket in geoindex.cells_in_bbox(south, west, north, east):
+        if z <= COARSE_MAX_ZOOM:
+            lat, lon = geoindex.cell_center(key)
+            lats.append(lat)
+            lons.append(lon)
+            weights.append(len(bucket))
+            refs.append(bucket)
+        else:
+            for entry in bucket.values():
+                lats.append(entry["lat"])
+                lons.append(entry["lon"])
+                weights.append(1)
+                refs.append(entry)
+    return lats, lons, weights, refs
+
+def _point(entry: dict) -> dict:
+    return {
+        "lat": entry["lat"],
+        "long": entry["lon"],
+        "count": 1,
+        "supply_id": entry["id"],
+        "item_name": entry["item_name"],
+        "user_id": entry["user_id"]
+    }
+
+def _build_tile(z: int, x: int, y: int) -> dict:
+    bbox = tile_bbox(z, x, y)
+    lats, lons, weights, refs = _collect(z, bbox)
+    tile = {"z": z, "x": x, "y": y, "bbox": [round(v, 6) for v in bbox], "total": 0,
+            "clusters": [], "density": {"grid": DENSITY_GRID, "counts": []}}
+    if not lats:
+        return tile
+
+    fx, fy = _project(lats, lons, z)
+    # Bbox sel geo index bisa melebar ke tile tetangga: ambil yang benar-benar masuk tile ini
+    inside = (np.floor(fx) == x) & (np.floor(fy) == y)
+    if not inside.any():
+        return tile
+    idx = np.flatnonzero(inside)
+    px, py = fx[idx] - x, fy[idx] - y  # posisi di dalam tile, 0..1
+    w = np.asarray(weights, dtype=np.float64)[idx]
+    lat_arr = np.asarray(lats, dtype=np.float64)[idx]
+    lon_arr = np.asarray(lons, dtype=np.float64)[idx]
+
+    # Density (heatmap): jumlah supply per sel DENSITY_GRID x DENSITY_GRID
+    d_cell = (py * DENSITY_GRID).astype(np.int64) * DENSITY_GRID + (px * DENSITY_GRID).astype(np.int64)
+    density = np.bincount(d_cell, weights=w, minlength=DENSITY_GRID ** 2).astype(np.int64)
+    tile["density"]["counts"] = density.reshape(DENSITY_GRID, DENSITY_GRID).tolist()
+    tile["total"] = int(w.sum())
+
+    if z > CLUSTER_MAX_ZOOM:
+        tile["clusters"] = [_point(refs[i]) for i in idx]
+        return tile
+
+    # Cluster: gabung per sel CLUSTER_GRID, posisi = rata-rata berbobot
+    c_cell = (py * CLUSTER_GRID).astype(np.int64) * CLUSTER_GRID + (px * CLUSTER_GRID).astype(np.int64)
+    size = CLUSTER_GRID ** 2
+    counts = np.bincount(c_cell, weights=w, minlength=size)
+    sum_lat = np.bincount(c_cell, weights=w * lat_arr, minlength=size)
+    sum_lon = np.bincount(c_cell, weights=w * lon_arr, minlength=size)
+    for cell in np.flatnonzero(counts):
+        count = int(counts[cell])
+        if count == 1:
+            # Cluster isi 1 supply -> kirim titik aslinya (bisa langsung dibuka detailnya)
+            ref = refs[idx[np.flatnonzero(c_cell == cell)[0]]]
+            entry = ref if z > COARSE_MAX_ZOOM else next(iter(ref.values()))
+            tile["clusters"].append(_point(entry))
+        else:
+            tile["clusters"].append({
+                "lat": round(float(sum_lat[cell] / counts[cell]), 6),
+                "long": round(float(sum_lon[cell] / counts[cell]), 6),
+                "count": count
+            })
+    return tile
+
+def get_tile(z: int, x: int, y: int) -> dict:
+    """
+    Cluster + density untuk tile XYZ. Dilayani dari cache kalau tile belum tersentuh write.
+    """
+    if not 0 <= z <= MAX_ZOOM:
+        return {"error": f"Zoom harus 0..{MAX_ZOOM}"}
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return {"error": "Koordinat tile di luar jangkauan zoom ini"}
+    key = (z, x, y)
+    tile = _TILE_CACHE.get(key)
+    if tile is None:
+        started = time.perf_counter()
+        tile = _build_tile(z, x, y)
+        _TILE_CACHE.set(key, tile)
+        elapsed = (time.perf_counter() - started) * 1000
+        if elapsed > 100:
+            print(f"🛰️ Tile {z}/{x}/{y} lambat: {tile['total']} supply ({elapsed:.0f} ms)")
+    return tile
@@ -0,0 +1,98 @@
+import re
+from datetime import datetime, timezone
+from .clients import db, execute
+
+# ==========================================
+# 🍲 PENGETAHUAN MENU (UMUR SIMPAN + NUTRISI)
+# Tabel menu_knowledge dimuat ke memori; cook_meal cukup lookup dict.
+# Menu baru: dianalisis AI sekali (kitchen.calculate_meal_expiry), lalu disimpan di sini.
+# ==========================================
+
+FIELDS = ("room_temp_hours", "fridge_hours", "risk_factor", "storage_tips", "nutrition")
+
+_KNOWLEDGE = {}  # slug -> {"menu_name", room_temp_hours, fridge_hours, risk_factor, storage_tips, nutrition}
+_STATE = {"loaded": False}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+def menu_slug(menu_name: str) -> str:
+    """
+    "Nasi Goreng  Spesial!" -> "nasi goreng spesial".
+    Sengaja TANPA sinonim bahan (search.normalize_item_name): edit ingredient_synonyms
+    tidak boleh mengubah key menu yang sudah tersimpan.
+    """
+    return _NON_ALNUM.sub(" ", (menu_name or "").lower()).strip()
+
+def _hours(value):
+    # numeric dari DB bisa datang sebagai float/string; 24.0 -> 24 (tampil di storage_tips)
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+def _row_to_entry(row: dict) -> dict:
+    return {
+        "menu_name": row["menu_name"],
+        "room_temp_hours": _hours(row["room_temp_hours"]),
+        "fridge_hours": _hours(row["fridge_hours"]),
+        "risk_factor": row.get("risk_factor"),
+        "storage_tips": row.get("storage_tips"),
+        "nutrition": row.get("nutrition") or {}
+    }
+
+async def load_knowledge():
+    """
+    Muat ulang seluruh tabel menu_knowledge (kecil: ratusan menu).
+    """
+    res = await execute(db.table("menu_knowledge").select(
+        "slug, menu_name, room_temp_hours, fridge_hours, risk_factor, storage_tips, nutrition"
+    ))
+    # Key dihitung ulang dari menu_name, jadi baris dengan slug lama tetap ketemu
+    knowledge = {menu_slug(row["menu_name"]) or row["slug"]: _row_to_entry(row) for row in res.data or []}
+    _KNOWLEDGE.clear()
+    _KNOWLEDGE.update(knowledge)
+    _STATE["loaded"] = True
+    print(f"🍲 Pengetahuan menu dimuat: {len(knowledge)} menu")
+
+def is_loaded() -> bool:
+    return _STATE["loaded"]
+
+def lookup(menu_name: str):
+    """
+    Hasil analisis tersimpan untuk menu ini (format sama dengan calculate_meal_expiry), atau None.
+    """
+    entry = _KNOWLEDGE.get(menu_slug(menu_name))
+    if entry is None:
+        return None
+    result = {field: entry[field] for field in FIELDS}
+    result["nutrition"] = dict(entry["nutrition"])
+    return result
+
+def is_valid(analysis: dict) -> bool:
+    """Hanya hasil AI yang lengkap (jam simpan berupa angka positif) yang layak disimpan."""
+    try:
+        return float(analysis["room_temp_hours"]) > 0 and float(analysis["fridge_hours"]) > 0
+    except (KeyError, TypeError, ValueError):
+        return False
+
+async def remember(menu_name: str, analysis: dict):
+    """
+    Simpan hasil analisis ke memori + tabel menu_knowledge (upsert per slug).
+    Gagal tulis DB tidak menggagalkan request: memori tetap terisi untuk worker ini.
+    """
+    slug = menu_slug(menu_name)
+    if not slug or not is_valid(analysis):
+        return
+    row = {
+        "slug": slug,
+        "menu_name": menu_name.strip(),
+        "room_temp_hours": _hours(analysis["room_temp_hours"]),
+        "fridge_hours": _hours(analysis["fridge_hours"]),
+        "risk_factor": analysis.get("risk_factor"),
+        "storage_tips": analysis.get("storage_tips"),
+        "nutrition": analysis.get("nutrition") if isinstance(analysis.get("nutrition"), dict) else {},
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }
+    _KNOWLEDGE[slug] = _row_to_entry(row)
+    try:
+        await execute(db.table("menu_knowledge").upsert(row, on_conflict="slug"))
+    except Exception as e:
+        print(f"⚠️ Gagal simpan pengetahuan menu '{menu_name}': {e}")
@@ -0,0 +1,22 @@
+from .clients import db, execute
+from .pagination import apply_keyset, next_cursor
+
+MAX_PAGE_SIZE = 200
+
+async def list_incoming_orders(seller_id: int, cursor: str = None, limit: int = 100):
+    """
+    Inbox pesanan vendor: satu query ke index orders(seller_id, created_at, id).
+    Order lama tanpa seller_id diisi oleh backfill_seller_id.py (sekali jalan).
+    Return: (orders, next_cursor)
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = apply_keyset(
+        db.table("orders")
+        .select("*, supplies(item_name, unit)")
+        .eq("seller_id", seller_id),
+        cursor
+    ).limit(limit)
+
+    response = await execute(query)
+    rows = response.data or []
+    return rows, next_cursor(rows, limit)
@@ -0,0 +1,65 @@
+import base64
+import json
+from datetime import datetime
+from .clients import db, execute
+
+def encode_cursor(created_at: str, row_id: int) -> str:
+    """
+    Bungkus posisi terakhir (created_at, id) jadi token opaque untuk halaman berikutnya.
+    """
+    raw = json.dumps([created_at, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str):
+    """
+    Kebalikan encode_cursor. Raise ValueError kalau token rusak/dimanipulasi.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        # Parse + serialisasi ulang: nilai ini masuk ke filter or_() PostgREST,
+        # jadi karakter seperti " , ) dari token buatan tangan tidak boleh lolos
+        return datetime.fromisoformat(created_at).isoformat(), int(row_id)
+    except Exception:
+        raise ValueError("Cursor tidak valid")
+
+def apply_keyset(query, cursor: str = None):
+    """
+    Keyset pagination di (created_at DESC, id DESC).
+    Query builder harus belum di-order; fungsi ini yang pasang ORDER BY-nya,
+    supaya filter & urutan selalu konsisten (dan kena index yang sama).
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # created_at < X  ATAU  (created_at = X DAN id < Y)
+        query = query.or_(
+            f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id})'
+        )
+    return query.order("created_at", desc=True).order("id", desc=True)
+
+def next_cursor(rows: list, limit: int):
+    """
+    Token halaman berikutnya, atau None kalau ini halaman terakhir.
+    """
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(last["created_at"], last["id"])
+
+async def fetch_all(table: str, columns: str, page_size: int = 1000, filters=None):
+    """
+    Ambil seluruh isi tabel per halaman (keyset), untuk job background (reconcile/warm-up).
+    `columns` wajib memuat created_at & id. `filters(query)` opsional untuk tambah WHERE.
+    """
+    rows = []
+    cursor = None
+    while True:
+        query = db.table(table).select(columns)
+        if filters:
+            query = filters(query)
+        response = await execute(apply_keyset(query, cursor).limit(page_size))
+        page = response.data or []
+        rows.extend(page)
+        cursor = next_cursor(page, page_size)
+        if not cursor:
+            return rows
@@ -0,0 +1,290 @@
+import heapq
+import math
+import os
+import time
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from .cache import TTLCache
+from .distance import haversine_many
+from config import (
+    DISTANCE_BACKEND,
+    ROAD_GRAPH_PATH,
+    ROAD_SNAP_MAX_KM,
+    ROAD_MAX_DETOUR,
+    ROAD_SEARCH_SLACK_MINUTES,
+    ROUTE_AVG_SPEED_KMH
+)
+
+# ==========================================
+# 🛣️ ROAD NETWORK (OPSIONAL, OFFLINE)
+# Aktif kalau DISTANCE_BACKEND=road. Graph jalan dibaca dari file .npz
+# lokal (ROAD_GRAPH_PATH, lihat build_road_graph.py), lalu dihitung
+# shortest-path tree (waktu tempuh, menit) ke setiap SPPG (graph dibalik,
+# karena vendor yang jalan ke SPPG; jalan satu arah ikut dihitung).
+# Waktu tempuh dari dapur ke vendor: Dijkstra terbatas dari node dapur,
+# berhenti begitu semua node vendor yang ditanya sudah ketemu (atau lewat
+# batas detour), lalu hasil per pasangan (dapur, vendor) di-cache.
+# Lookup = snap ke node terdekat + index array.
+# Selama belum siap / titik di luar graph -> fallback garis lurus
+# (haversine / ROUTE_AVG_SPEED_KMH).
+# ==========================================
+
+SNAP_CELL_DEG = 0.005  # ~550 m
+
+_GRAPH = {}   # node_lat, node_lon, cells, "forward"/"reverse": (indptr, indices, minutes)
+_TREES = {}   # "sppg_ids", "index" (sppg_id -> baris), "minutes" (n_sppg x n_node float32)
+_STATE = {"graph_loaded": False, "ready": False, "last_build": None}
+
+# Snap koordinat -> node (koordinat dibulatkan ~1 m)
+_SNAP_CACHE = TTLCache("road_snap", max_entries=50000)
+# (node asal, node tujuan) -> menit (inf = tidak tercapai dalam batas pencarian)
+_PAIR_CACHE = TTLCache("road_pair_minutes", max_entries=200000)
+_NO_NODE = -1
+
+def is_enabled() -> bool:
+    return DISTANCE_BACKEND == "road"
+
+def is_ready() -> bool:
+    return _STATE["ready"]
+
+# --- Load graph ---
+
+def _load_graph(path: str) -> dict:
+    data = np.load(path)
+    node_lat = data["node_lat"].astype(np.float64)
+    node_lon = data["node_lon"].astype(np.float64)
+    src = data["edge_src"].astype(np.int64)
+    dst = data["edge_dst"].astype(np.int64)
+    minutes = data["edge_minutes"].astype(np.float64)
+
+    # Grid untuk snap titik ke node terdekat
+    cells = {}
+    cx = np.floor(node_lon / SNAP_CELL_DEG).astype(np.int64)
+    cy = np.floor(node_lat / SNAP_CELL_DEG).astype(np.int64)
+    for node, key in enumerate(zip(cx.tolist(), cy.tolist())):
+        cells.setdefault(key, []).append(node)
+
+    return {
+        "node_lat": node_lat,
+        "node_lon": node_lon,
+        "forward": _csr(len(node_lat), src, dst, minutes),
+        "reverse": _csr(len(node_lat), dst, src, minutes),
+        "cells": {key: np.array(nodes, dtype=np.int64) for key, nodes in cells.items()}
+    }
+
+def _csr(n_nodes: int, src, dst, minutes) -> tuple:
+    # Adjacency CSR (urut per node asal). List Python: jauh lebih cepat untuk
+    # loop Dijkstra dibanding indexing numpy per elemen
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.add.at(indptr, src + 1, 1)
+    return np.cumsum(indptr).tolist(), dst[order].tolist(), minutes[order].tolist()
+
+def _dijkstra(adjacency: tuple, source: int) -> np.ndarray:
+    indptr, indices, weights = adjacency
+    inf = math.inf
+    dist = [inf] * (len(indptr) - 1)
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for e in range(indptr[u], indptr[u + 1]):
+            v = indices[e]
+            nd = d + weights[e]
+            if nd < dist[v]:
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return np.array(dist, dtype=np.float32)
+
+def _dijkstra_to(adjacency: tuple, source: int, targets: set, max_minutes: float) -> dict:
+    """
+    Dijkstra dari source yang berhenti begitu semua `targets` settled atau jarak > max_minutes.
+    Return {node target: menit} (target yang tidak tercapai tidak ada di dict).
+    """
+    indptr, indices, weights = adjacency
+    remaining = set(targets)
+    found = {}
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap and remaining:
+        d, u = heapq.heappop(heap)
+        if d > max_minutes:
+            break
+        if d > dist[u]:
+            continue
+        if u in remaining:
+            remaining.discard(u)
+            found[u] = d
+        for e in range(indptr[u], indptr[u + 1]):
+            v = indices[e]
+            nd = d + weights[e]
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return found
+
+# --- Snap ---
+
+def _snap(lat: float, lon: float) -> int:
+    """Node terdekat (maks ROAD_SNAP_MAX_KM), _NO_NODE kalau tidak ada."""
+    key = (round(lat, 5), round(lon, 5))
+    node = _SNAP_CACHE.get(key)
+    if node is not None:
+        return node
+
+    cells = _GRAPH["cells"]
+    cx, cy = math.floor(lon / SNAP_CELL_DEG), math.floor(lat / SNAP_CELL_DEG)
+    max_ring = int(ROAD_SNAP_MAX_KM / (SNAP_CELL_DEG * 111.32 * max(math.cos(math.radians(lat)), 0.01))) + 1
+    best_node, best_dist = _NO_NODE, ROAD_SNAP_MAX_KM
+    for r in range(max_ring + 1):
+        candidates = [cells[(cx + dx, cy + dy)]
+                      for dx in range(-r, r + 1) for dy in range(-r, r + 1)
+                      if max(abs(dx), abs(dy)) == r and (cx + dx, cy + dy) in cells]
+        if candidates:
+            nodes = np.concatenate(candidates)
+            dists = haversine_many(lat, lon, _GRAPH["node_lat"][nodes], _GRAPH["node_lon"][nodes])
+            i = int(np.argmin(dists))
+            if dists[i] <= best_dist:
+                best_node, best_dist = int(nodes[i]), float(dists[i])
+        # Node di cincin berikutnya pasti lebih jauh dari r sel
+        if best_node != _NO_NODE and best_dist <= r * SNAP_CELL_DEG * 111.32 * math.cos(math.radians(lat)):
+            break
+
+    _SNAP_CACHE.set(key, best_node)
+    return best_node
+
+def _straight_minutes(km):
+    return np.asarray(km, dtype=np.float64) * (60.0 / ROUTE_AVG_SPEED_KMH)
+
+# --- Build ---
+
+async def build_trees(sites: list):
+    """
+    Muat graph (sekali) lalu hitung shortest-path tree ke setiap SPPG.
+    Dipanggil job periodik (lihat sppg.refresh_travel_times) -> daftar SPPG baru ikut terhitung.
+    """
+    if not is_enabled():
+        return
+    started = time.perf_counter()
+
+    global _GRAPH, _TREES
+    if not _STATE["graph_loaded"]:
+        if not ROAD_GRAPH_PATH or not os.path.exists(ROAD_GRAPH_PATH):
+            print(f"⚠️ ROAD_GRAPH_PATH tidak ditemukan ({ROAD_GRAPH_PATH}), pakai jarak garis lurus")
+            return
+        _GRAPH = await run_in_threadpool(_load_graph, ROAD_GRAPH_PATH)
+        _STATE["graph_loaded"] = True
+        _SNAP_CACHE.clear()
+        _PAIR_CACHE.clear()
+        print(f"🛣️ Road graph dimuat: {len(_GRAPH['node_lat'])} node, {len(_GRAPH['forward'][1])} edge")
+
+    sppg_ids, nodes = [], []
+    for site in sites:
+        node = _snap(site['lat'], site['long'])
+        if node == _NO_NODE:
+            print(f"⚠️ {site['name']} di luar road graph, pakai jarak garis lurus")
+            continue
+        sppg_ids.append(site['id'])
+        nodes.append(node)
+
+    def compute():
+        if not nodes:
+            return np.empty((0, len(_GRAPH["node_lat"])), dtype=np.float32)
+        # Graph dibalik: jarak tree = waktu tempuh dari node mana pun KE SPPG
+        return np.vstack([_dijkstra(_GRAPH["reverse"], node) for node in nodes])
+
+    minutes = await run_in_threadpool(compute)
+    _TREES = {
+        "sppg_ids": sppg_ids,
+        "index": {sppg_id: i for i, sppg_id in enumerate(sppg_ids)},
+        "minutes": minutes
+    }
+    _STATE["ready"] = True
+    _STATE["last_build"] = time.time()
+    print(f"🛣️ Shortest-path tree {len(sppg_ids)} SPPG siap "
+          f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+# --- Lookup (semua instan: snap ter-cache + index array) ---
+
+def _snap_many(lats, longs) -> np.ndarray:
+    return np.array([
+        _snap(lat, lon) if lat is not None and lon is not None and lat == lat and lon == lon else _NO_NODE
+        for lat, lon in zip(lats, longs)
+    ], dtype=np.int64)
+
+def _lookup(tree: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    result = np.full(len(nodes), np.nan)
+    valid = nodes != _NO_NODE
+    result[valid] = tree[nodes[valid]]
+    # Tidak tersambung di graph -> anggap tidak diketahui
+    result[np.isinf(result)] = np.nan
+    return result
+
+def sppg_travel_minutes(sites: list, lats, longs) -> np.ndarray:
+    """
+    Matriks waktu tempuh (menit) titik x SPPG, urutan kolom = sites.
+    Sel yang tidak bisa dihitung lewat jalan diisi estimasi garis lurus.
+    """
+    nodes = _snap_many(lats, longs) if is_ready() else None
+    result = np.full((len(lats), len(sites)), np.nan)
+    for j, site in enumerate(sites):
+        row = _TREES["index"].get(site['id']) if nodes is not None else None
+        if row is not None:
+            result[:, j] = _lookup(_TREES["minutes"][row], nodes)
+        missing = np.flatnonzero(np.isnan(result[:, j]))
+        if len(missing):
+            km = haversine_many(site['lat'], site['long'], [lats[i] for i in missing], [longs[i] for i in missing])
+            result[missing, j] = _straight_minutes(km)
+    return result
+
+async def travel_minutes_from(lat: float, lon: float, lats, longs) -> np.ndarray:
+    """
+    Waktu tempuh (menit) dari satu titik asal (misal dapur) ke banyak titik (vendor).
+    Pasangan yang sudah pernah dihitung langsung dari cache; sisanya satu Dijkstra
+    terbatas (di thread) yang berhenti begitu semua vendor itu ketemu.
+    Lewat jalan kalau graph siap & kedua titik dekat jalan, selain itu garis lurus.
+    """
+    straight = _straight_minutes(haversine_many(lat, lon, lats, longs))
+    if not is_ready():
+        return straight
+
+    origin = _snap(lat, lon)
+    if origin == _NO_NODE:
+        return straight
+
+    nodes = _snap_many(lats, longs)
+    result = np.full(len(nodes), np.nan)
+    missing = {}
+    for i, node in enumerate(nodes.tolist()):
+        if node == _NO_NODE:
+            continue
+        minutes = _PAIR_CACHE.get((origin, node))
+        if minutes is None:
+            missing.setdefault(node, []).append(i)
+        else:
+            result[i] = minutes
+
+    if missing:
+        # Batas pencarian: vendor terjauh (garis lurus) x detour maksimum
+        farthest = np.nanmax(straight[[i for idx in missing.values() for i in idx]])
+        max_minutes = farthest * ROAD_MAX_DETOUR + ROAD_SEARCH_SLACK_MINUTES
+        found = await run_in_threadpool(_dijkstra_to, _GRAPH["forward"], origin, set(missing), max_minutes)
+        for node, idx in missing.items():
+            minutes = found.get(node, math.inf)
+            _PAIR_CACHE.set((origin, node), minutes)
+            result[idx] = minutes
+
+    # Tidak tercapai lewat jalan -> garis lurus
+    result[np.isinf(result)] = np.nan
+    return np.where(np.isnan(result), straight, result)
+
+async def travel_minutes_matrix(lats, longs) -> np.ndarray:
+    """
+    Matriks waktu tempuh (menit) antar titik (n x n, arah baris -> kolom; jalan satu arah
+    ikut dihitung). Satu travel_minutes_from per baris, jadi pasangan lama dari cache.
+    """
+    matrix = np.vstack([await travel_minutes_from(lat, lon, lats, longs) for lat, lon in zip(lats, longs)])
+    np.fill_diagonal(matrix, 0.0)
+    return matrix
@@ -0,0 +1,278 @@
+import time
+from fastapi.concurrency import run_in_threadpool
+from . import roadnet
+from .clients import db, execute
+from .distance import haversine_matrix
+from .users import get_user_profile, get_user_profiles
+from config import ROUTE_AVG_SPEED_KMH, ROUTE_SERVICE_MINUTES
+
+# ==========================================
+# 🚚 RUTE PENJEMPUTAN ORDER (VRP + TIME WINDOW)
+# Order 'confirmed' milik satu Kitchen dikelompokkan per vendor (1 stop = 1 vendor),
+# lalu disusun jadi rute per kendaraan:
+# 1. Clarke-Wright savings (gabung rute selama kapasitas & jam buka vendor masih masuk)
+# 2. 2-opt per rute (perpendek urutan kunjungan tanpa melanggar time window)
+# Node 0 = dapur (depot), node 1..n = vendor.
+# ==========================================
+
+def _to_minutes(hhmm: str) -> int:
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+def _to_hhmm(minutes: float) -> str:
+    minutes = int(round(minutes))
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+class _Problem:
+    def __init__(self, dist_km, demands, windows, capacity, depot_window, speed_kmh, service_min, travel_min=None):
+        self.dist = dist_km
+        # Waktu tempuh (menit) antar node: dari road network kalau ada, selain itu garis lurus / kecepatan rata-rata.
+        # Savings & 2-opt meminimalkan waktu tempuh ini (garis lurus: sebanding dengan km)
+        self.travel = travel_min if travel_min is not None else dist_km * (60.0 / speed_kmh)
+        self.demands = demands
+        self.windows = windows          # [(earliest, latest)] per node, index 0 = depot
+        self.capacity = capacity
+        self.depot_open, self.depot_close = depot_window
+        self.service = service_min
+
+    def schedule(self, route: list):
+        """
+        Jam tiba di tiap stop. None kalau ada time window yang terlewat
+        atau kendaraan tidak sempat kembali ke dapur sebelum tutup.
+        """
+        t = self.depot_open
+        prev = 0
+        arrivals = []
+        for node in route:
+            t += self.travel[prev, node]
+            earliest, latest = self.windows[node]
+            if t > latest:
+                return None
+            t = max(t, earliest)  # datang kepagian -> tunggu vendor buka
+            arrivals.append(t)
+            t += self.service
+            prev = node
+        t += self.travel[prev, 0]
+        if t > self.depot_close:
+            return None
+        return arrivals, t
+
+    def load(self, route: list) -> float:
+        return sum(self.demands[node] for node in route)
+
+    def length(self, route: list, matrix=None) -> float:
+        matrix = self.dist if matrix is None else matrix
+        total = matrix[0, route[0]] + matrix[route[-1], 0]
+        for a, b in zip(route, route[1:]):
+            total += matrix[a, b]
+        return total
+
+def _savings(problem: _Problem, nodes: list) -> list:
+    # Awal: satu rute per vendor (depot -> vendor -> depot)
+    routes = {node: [node] for node in nodes}
+    route_of = {node: node for node in nodes}
+
+    dist = problem.travel
+    pairs = []
+    for i_idx, i in enumerate(nodes):
+        for j in nodes[i_idx + 1:]:
+            saving = dist[0, i] + dist[0, j] - dist[i, j]
+            if saving > 0:
+                pairs.append((saving, i, j))
+    pairs.sort(reverse=True)
+
+    for _, i, j in pairs:
+        ri, rj = route_of[i], route_of[j]
+        if ri == rj:
+            continue
+        a, b = routes[ri], routes[rj]
+        if problem.load(a) + problem.load(b) > problem.capacity:
+            continue
+
+        # i dan j harus di ujung rutenya masing-masing; coba semua orientasi yang menyambungkan i-j
+        options = []
+        if a[-1] == i and b[0] == j:
+            options.append(a + b)
+        if b[-1] == j and a[0] == i:
+            options.append(b + a)
+        if a[-1] == i and b[-1] == j:
+            options.append(a + b[::-1])
+        if a[0] == i and b[0] == j:
+            options.append(a[::-1] + b)
+
+        for merged in options:
+            if problem.schedule(merged) is not None:
+                routes[ri] = merged
+                del routes[rj]
+                for node in b:
+                    route_of[node] = ri
+                break
+
+    return list(routes.values())
+
+# Batas putaran 2-opt (jaring pengaman; normalnya berhenti jauh sebelum ini)
+MAX_TWO_OPT_ROUNDS = 100
+
+def _two_opt(problem: _Problem, route: list) -> list:
+    # Matriks waktu tempuh bisa tidak simetris (jalan satu arah): membalik segmen ikut
+    # membalik semua edge di dalamnya, jadi yang dibandingkan panjang rute utuh.
+    # Panjang turun ketat tiap langkah -> pasti berhenti.
+    best = problem.length(route, problem.travel)
+    for _ in range(MAX_TWO_OPT_ROUNDS):
+        improved = False
+        for i in range(len(route) - 1):
+            for j in range(i + 1, len(route)):
+                # Balik segmen route[i..j]
+                candidate = route[:i] + route[i:j + 1][::-1] + route[j + 1:]
+                length = problem.length(candidate, problem.travel)
+                if length < best - 1e-9 and problem.schedule(candidate) is not None:
+                    route, best = candidate, length
+                    improved = True
+        if not improved:
+            break
+    return route
+
+def solve_routes(dist_km, demands, windows, capacity, vehicles, depot_window,
+                 speed_kmh=ROUTE_AVG_SPEED_KMH, service_min=ROUTE_SERVICE_MINUTES, travel_min=None) -> dict:
+    """
+    Solver murni (tanpa DB). dist_km: matriks (n+1)x(n+1), index 0 = depot.
+    travel_min: matriks waktu tempuh (menit) opsional, misal dari road network.
+    Return {"routes": [[node, ...]], "unserved": [(node, alasan)], "schedules": [...]}
+    """
+    problem = _Problem(dist_km, demands, windows, capacity, depot_window, speed_kmh, service_min, travel_min)
+
+    nodes, unserved = [], []
+    for node in range(1, len(demands)):
+        if demands[node] > capacity:
+            unserved.append((node, "Muatan melebihi kapasitas kendaraan"))
+        elif problem.schedule([node]) is None:
+            unserved.append((node, "Tidak terjangkau dalam jam buka vendor / jam operasional"))
+        else:
+            nodes.append(node)
+
+    routes = [_two_opt(problem, route) for route in _savings(problem, nodes)] if nodes else []
+
+    # Kendaraan terbatas: rute dengan muatan terbesar didahulukan
+    routes.sort(key=lambda r: problem.load(r), reverse=True)
+    for route in routes[vehicles:]:
+        unserved.extend((node, "Kendaraan tidak cukup") for node in route)
+    routes = routes[:vehicles]
+
+    return {
+        "routes": routes,
+        "unserved": unserved,
+        "schedules": [problem.schedule(route) for route in routes],
+        "lengths": [problem.length(route) for route in routes],
+        "travel_minutes": [problem.length(route, problem.travel) for route in routes],
+        "loads": [problem.load(route) for route in routes]
+    }
+
+# --- Data order -> problem ---
+
+def _order_load(order: dict) -> float:
+    # Berat order dalam satuan dasar bahan (kg) kalau supply punya normalized_qty
+    supply = order.get('supplies') or {}
+    qty = order.get('qty_ordered') or 0
+    if supply.get('normalized_qty') is not None and supply.get('quantity'):
+        return qty * float(supply['normalized_qty']) / supply['quantity']
+    return qty
+
+async def plan_pickup_routes(kitchen_id: int, vehicles: int, vehicle_capacity: float,
+                             start_time: str, end_time: str, time_windows: dict) -> dict:
+    """
+    Rute penjemputan semua order 'confirmed' milik Kitchen.
+    time_windows: {vendor_id: (start "HH:MM", end "HH:MM")}; vendor lain pakai jam operasional.
+    """
+    started = time.perf_counter()
+    kitchen = await get_user_profile(kitchen_id) or {}
+    if not (kitchen.get('latitude') and kitchen.get('longitude')):
+        return {"error": "Lokasi GPS dapur belum diisi di profil"}
+
+    orders_res = await execute(
+        db.table("orders")
+        .select("id, qty_ordered, seller_id, supplies(item_name, unit, quantity, normalized_qty, latitude, longitude)")
+        .eq("buyer_id", kitchen_id)
+        .eq("status", "confirmed")
+    )
+    orders = orders_res.data or []
+    if not orders:
+        return {"routes": [], "unserved": [], "message": "Tidak ada order confirmed"}
+
+    # 1 stop per vendor
+    stops = {}
+    for order in orders:
+        stop = stops.setdefault(order.get('seller_id'), {"orders": [], "lat": None, "long": None})
+        stop["orders"].append(order)
+        supply = order.get('supplies') or {}
+        if stop["lat"] is None and supply.get('latitude') and supply.get('longitude'):
+            stop["lat"], stop["long"] = supply['latitude'], supply['longitude']
+
+    vendor_profiles = await get_user_profiles([v for v in stops if v is not None])
+    unserved = []
+    vendor_ids = []
+    for vendor_id, stop in stops.items():
+        profile = vendor_profiles.get(vendor_id) or {}
+        stop["name"] = profile.get('full_name', 'Vendor')
+        if stop["lat"] is None and profile.get('latitude') and profile.get('longitude'):
+            stop["lat"], stop["long"] = profile['latitude'], profile['longitude']
+        if stop["lat"] is None:
+            unserved.append({"vendor_id": vendor_id, "order_ids": [o['id'] for o in stop["orders"]],
+                             "reason": "Lokasi GPS vendor tidak diketahui"})
+        else:
+            vendor_ids.append(vendor_id)
+
+    day_open, day_close = _to_minutes(start_time), _to_minutes(end_time)
+    lats = [kitchen['latitude']] + [stops[v]["lat"] for v in vendor_ids]
+    longs = [kitchen['longitude']] + [stops[v]["long"] for v in vendor_ids]
+    demands = [0.0] + [sum(_order_load(o) for o in stops[v]["orders"]) for v in vendor_ids]
+    windows = [(day_open, day_close)]
+    for v in vendor_ids:
+        window = time_windows.get(v)
+        windows.append((_to_minutes(window[0]), _to_minutes(window[1])) if window else (day_open, day_close))
+
+    dist_km = haversine_matrix(lats, longs, lats, longs)
+    # Road network siap -> jadwal & urutan pakai waktu tempuh lewat jalan (sama seperti pencarian supplier)
+    travel_min = await roadnet.travel_minutes_matrix(lats, longs) if roadnet.is_ready() else None
+    # CPU-bound -> thread terpisah biar event loop tetap jalan
+    result = await run_in_threadpool(
+        solve_routes, dist_km, demands, windows, vehicle_capacity, vehicles, (day_open, day_close),
+        travel_min=travel_min
+    )
+
+    routes = []
+    for idx, route in enumerate(result["routes"]):
+        arrivals, finish = result["schedules"][idx]
+        routes.append({
+            "vehicle": idx + 1,
+            "distance_km": round(result["lengths"][idx], 2),
+            "travel_minutes": round(float(result["travel_minutes"][idx]), 1),
+            "load": round(result["loads"][idx], 2),
+            "depart": _to_hhmm(day_open),
+            "return": _to_hhmm(finish),
+            "stops": [
+                {
+                    "vendor_id": vendor_ids[node - 1],
+                    "vendor_name": stops[vendor_ids[node - 1]]["name"],
+                    "lat": lats[node],
+                    "long": longs[node],
+                    "arrival": _to_hhmm(arrival),
+                    "window": [_to_hhmm(windows[node][0]), _to_hhmm(windows[node][1])],
+                    "load": round(demands[node], 2),
+                    "order_ids": [o['id'] for o in stops[vendor_ids[node - 1]]["orders"]],
+                    "items": [
+                        f"{(o.get('supplies') or {}).get('item_name', '?')} x{o.get('qty_ordered')}"
+                        for o in stops[vendor_ids[node - 1]]["orders"]
+                    ]
+                }
+                for node, arrival in zip(route, arrivals)
+            ]
+        })
+
+    for node, reason in result["unserved"]:
+        vendor_id = vendor_ids[node - 1]
+        unserved.append({"vendor_id": vendor_id, "order_ids": [o['id'] for o in stops[vendor_id]["orders"]],
+                         "reason": reason})
+
+    print(f"🚚 Rute {len(vendor_ids)} vendor -> {len(routes)} kendaraan "
+          f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+    return {"routes": routes, "unserved": unserved}
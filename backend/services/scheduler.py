@@ -0,0 +1,37 @@
+import asyncio
+import traceback
+
+# Background job yang jalan di dalam proses server (dijalankan dari lifespan main.py)
+_TASKS = {}
+
+async def _run_periodic(name: str, interval_seconds: float, job, run_immediately: bool):
+    if not run_immediately:
+        await asyncio.sleep(interval_seconds)
+    while True:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Job '{name}' gagal: {e}")
+            traceback.print_exc()
+        await asyncio.sleep(interval_seconds)
+
+def start_periodic(name: str, interval_seconds: float, job, run_immediately: bool = True):
+    """
+    Jalankan `job` (coroutine function tanpa argumen) setiap `interval_seconds`.
+    Error di satu putaran tidak menghentikan jadwal berikutnya.
+    """
+    if name in _TASKS:
+        return _TASKS[name]
+    task = asyncio.create_task(_run_periodic(name, interval_seconds, job, run_immediately))
+    _TASKS[name] = task
+    print(f"⏱️ Job '{name}' dijadwalkan tiap {interval_seconds:.0f} detik")
+    return task
+
+async def stop_all():
+    """Batalkan semua job (dipanggil saat server shutdown)."""
+    for task in _TASKS.values():
+        task.cancel()
+    await asyncio.gather(*_TASKS.values(), return_exceptions=True)
+    _TASKS.clear()
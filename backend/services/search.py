@@ -0,0 +1,129 @@
+import re
+from .clients import db, execute
+
+# ==========================================
+# 🔎 PENCARIAN NAMA BARANG (NORMALISASI + TRIGRAM)
+# Aturan normalisasi sama dengan fungsi SQL normalize_item_name
+# (sql/005_supplies_item_search.sql) supaya hasil in-memory (geoindex)
+# dan hasil DB (kolom search_name) konsisten.
+# ==========================================
+
+# Seed sinonim (sama dengan isi awal tabel ingredient_synonyms).
+# Dipakai sampai load_synonyms() berhasil baca dari DB.
+DEFAULT_SYNONYMS = {
+    "cabe": "cabai",
+    "cabe rawit": "cabai rawit",
+    "lombok": "cabai",
+    "bamer": "bawang merah",
+    "baput": "bawang putih",
+    "bombay": "bawang bombay",
+    "toge": "tauge",
+    "taoge": "tauge",
+    "kangkong": "kangkung",
+    "sledri": "seledri",
+    "daun sop": "seledri",
+    "brambang": "bawang merah",
+    "ayam potong": "ayam",
+    "telor": "telur",
+    "sawi ijo": "sawi hijau",
+    "kol": "kubis"
+}
+
+# Ambang word_similarity untuk typo (sama dengan default pg_trgm.word_similarity_threshold)
+WORD_SIMILARITY_THRESHOLD = 0.6
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_STATE = {"synonyms": dict(DEFAULT_SYNONYMS), "rules": []}
+
+def _compile_rules(synonyms: dict) -> list:
+    # Alias terpanjang dulu (biar "cabe rawit" menang atas "cabe"), ganti per kata utuh
+    aliases = sorted(synonyms, key=lambda a: (-len(a), a))
+    return [(re.compile(rf"\b{re.escape(alias)}\b"), synonyms[alias]) for alias in aliases]
+
+_STATE["rules"] = _compile_rules(_STATE["synonyms"])
+
+def normalize_item_name(name: str) -> str:
+    """
+    "Cabe Rawit (Merah)" -> "cabai rawit merah"
+    """
+    result = _NON_ALNUM.sub(" ", (name or "").lower()).strip()
+    for pattern, canonical in _STATE["rules"]:
+        result = pattern.sub(canonical, result)
+    return result
+
+async def load_synonyms():
+    """
+    Muat ulang sinonim dari tabel ingredient_synonyms.
+    """
+    res = await execute(db.table("ingredient_synonyms").select("alias, canonical"))
+    synonyms = {row['alias']: row['canonical'] for row in res.data} if res.data else dict(DEFAULT_SYNONYMS)
+    _STATE["synonyms"] = synonyms
+    _STATE["rules"] = _compile_rules(synonyms)
+    print(f"🔎 Sinonim bahan dimuat: {len(synonyms)} alias")
+
+# --- Trigram (meniru pg_trgm) ---
+
+def _trigrams(text: str) -> set:
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def similarity(a: str, b: str) -> float:
+    ta, tb = _trigrams(a), _trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+def word_similarity(query: str, name: str) -> float:
+    """
+    Kemiripan query dengan bagian nama (rangkaian kata) yang paling mirip.
+    """
+    words = name.split()
+    best = 0.0
+    for i in range(len(words)):
+        for j in range(i + 1, len(words) + 1):
+            best = max(best, similarity(query, " ".join(words[i:j])))
+    return best
+
+def match_score(query: str, search_name: str, whole_words: bool = False) -> float:
+    """
+    Skor relevansi 0..1 (sama dengan RPC search_item_names).
+    Substring persis = 1.0; selain itu word_similarity, 0 kalau di bawah ambang.
+    whole_words=True: substring harus kata utuh ("ayam" tidak dianggap persis di "bayam").
+    """
+    if not query:
+        return 0.0
+    if query in search_name and (not whole_words or f" {query} " in f" {search_name} "):
+        return 1.0
+    score = word_similarity(query, search_name)
+    return score if score >= WORD_SIMILARITY_THRESHOLD else 0.0
+
+def make_matcher(keyword: str, whole_words: bool = False):
+    """
+    Fungsi search_name -> skor untuk satu keyword.
+    Skor di-memo per nama unik (jumlah nama barang jauh lebih kecil dari jumlah supply).
+    """
+    query = normalize_item_name(keyword)
+    scores = {}
+
+    def score(search_name: str) -> float:
+        # Keyword kosong = semua barang (perilaku lama ilike '%%')
+        if not query:
+            return 1.0
+        value = scores.get(search_name)
+        if value is None:
+            value = scores[search_name] = match_score(query, search_name, whole_words)
+        return value
+
+    return score
+
+# --- Query DB ---
+
+async def search_item_names(q: str, limit: int = 20):
+    """
+    Nama barang yang cocok dengan `q`, urut relevansi (RPC search_item_names, index trigram).
+    """
+    res = await execute(db.rpc("search_item_names", {"q": q, "max_results": limit}))
+    return res.data or []
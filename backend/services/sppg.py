@@ -0,0 +1,197 @@
+import heapq
+import time
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from .clients import db, execute
+from .cache import TTLCache
+from .distance import haversine_matrix
+from . import roadnet
+from config import SPPG_NETWORK_CACHE_TTL, SPPG_ASSIGNMENT_CANDIDATES
+
+# ==========================================
+# 🏫 JARINGAN SPPG + PENUGASAN VENDOR
+# Daftar SPPG dibaca dari tabel sppg_locations (lewat cache).
+# Job penugasan memetakan SEMUA vendor yang punya stok hampir expired
+# ke satu SPPG, total jarak seminimal mungkin, tanpa melebihi
+# daily_capacity tiap SPPG (min-cost flow).
+# Hasilnya disimpan in-memory -> lookup per vendor instan.
+# ==========================================
+
+SPPG_COLUMNS = "id, name, address, lat, long, phone, daily_capacity"
+
+_NETWORK_CACHE = TTLCache("sppg_network", max_entries=1, ttl_seconds=SPPG_NETWORK_CACHE_TTL)
+
+_ASSIGNMENTS = {}  # vendor_id -> {"sppg": {...}, "distance_km": float}
+_STATE = {"last_run": None, "vendors": 0, "assigned": 0, "unassigned": []}
+
+async def get_network() -> dict:
+    """
+    SPPG aktif + array koordinatnya (buat hitung jarak vektor).
+    Return {"sites": [...], "lats": ndarray, "longs": ndarray}
+    """
+    async def load():
+        res = await execute(db.table("sppg_locations").select(SPPG_COLUMNS).eq("active", True).order("id"))
+        sites = res.data or []
+        return {
+            "sites": sites,
+            "lats": np.array([s['lat'] for s in sites], dtype=np.float64),
+            "longs": np.array([s['long'] for s in sites], dtype=np.float64)
+        }
+
+    return await _NETWORK_CACHE.get_or_load("active", load)
+
+def invalidate_network():
+    """Panggil setelah tabel sppg_locations diubah."""
+    _NETWORK_CACHE.clear()
+
+async def refresh_travel_times():
+    """Hitung ulang shortest-path tree jalan dari tiap SPPG aktif (DISTANCE_BACKEND=road)."""
+    network = await get_network()
+    await roadnet.build_trees(network["sites"])
+
+# --- Min-cost flow (shortest augmenting path + potensial Dijkstra) ---
+
+def _min_cost_assignment(candidates: list, capacities: list) -> list:
+    """
+    candidates[v] = [(sppg_index, cost_int), ...] (SPPG kandidat untuk vendor v)
+    capacities[k] = kapasitas SPPG k
+    Return list sppg_index per vendor (None kalau tidak kebagian kapasitas).
+    Vendor dimasukkan satu per satu sesuai urutan list (prioritas): tiap vendor baru
+    dicarikan jalur augmentasi termurah, boleh menggeser vendor lain ke SPPG lain.
+    Setelah tiap langkah, total jarak vendor yang sudah ter-assign minimum.
+    Kalau kapasitas kurang, vendor di akhir urutan yang tidak kebagian.
+    """
+    n, m = len(candidates), len(capacities)
+    sink = n + m
+    size = n + m + 1
+    # Edge: [to, capacity, cost, index reverse edge]
+    graph = [[] for _ in range(size)]
+
+    def add_edge(u, v, cap, cost):
+        graph[u].append([v, cap, cost, len(graph[v])])
+        graph[v].append([u, 0, -cost, len(graph[u]) - 1])
+
+    for v, options in enumerate(candidates):
+        for k, cost in options:
+            add_edge(v, n + k, 1, cost)
+    for k, cap in enumerate(capacities):
+        if cap > 0:
+            add_edge(n + k, sink, cap, 0)
+
+    potential = [0] * size  # semua cost awal >= 0, jadi potensial 0 valid
+    # Node yang sudah terbukti tidak bisa mencapai sink akan tetap begitu selamanya
+    # (augmentasi berikutnya tidak pernah lewat situ) -> tidak perlu dijelajah lagi
+    dead = [False] * size
+    inf = float("inf")
+
+    for start in range(n):
+        # dist/prev pakai dict: hanya node yang tersentuh (jalur pendek, graph besar)
+        dist = {start: 0}
+        prev = {}  # node -> (node asal, edge index)
+        heap = [(0, start)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            if u == sink:
+                break
+            for i, (v, cap, cost, _) in enumerate(graph[u]):
+                if cap <= 0 or dead[v]:
+                    continue
+                nd = d + cost + potential[u] - potential[v]
+                if nd < dist.get(v, inf):
+                    dist[v] = nd
+                    prev[v] = (u, i)
+                    heapq.heappush(heap, (nd, v))
+
+        if sink not in dist:
+            # Semua SPPG kandidat (dan jalur geser-nya) sudah penuh
+            for node in dist:
+                dead[node] = True
+            continue
+        # Potensial baru = lama + min(dist, D) - D; cukup update node dengan dist < D
+        # (reduced cost tetap >= 0 walau Dijkstra berhenti begitu sink ketemu)
+        limit = dist[sink]
+        for node, d in dist.items():
+            if d < limit:
+                potential[node] -= limit - d
+
+        # Augment 1 unit sepanjang jalur
+        node = sink
+        while node != start:
+            u, i = prev[node]
+            edge = graph[u][i]
+            edge[1] -= 1
+            graph[node][edge[3]][1] += 1
+            node = u
+
+    result = [None] * n
+    for v in range(n):
+        for to, cap, _, _ in graph[v]:
+            if n <= to < n + m and cap == 0:
+                result[v] = to - n
+                break
+    return result
+
+def _solve(vendor_ids: list, lats, longs, network: dict) -> dict:
+    sites = network["sites"]
+    dists = haversine_matrix(lats, longs, network["lats"], network["longs"])
+
+    # Kandidat: SPPG_ASSIGNMENT_CANDIDATES terdekat per vendor (graph tetap kecil)
+    k = min(SPPG_ASSIGNMENT_CANDIDATES, len(sites))
+    nearest = np.argsort(dists, axis=1)[:, :k]
+    candidates = [
+        [(int(j), int(round(dists[v, j] * 1000))) for j in nearest[v]]  # cost dalam meter
+        for v in range(len(vendor_ids))
+    ]
+    capacities = [s.get('daily_capacity') or 0 for s in sites]
+
+    chosen = _min_cost_assignment(candidates, capacities)
+
+    assignments = {}
+    for v, j in enumerate(chosen):
+        if j is not None:
+            assignments[vendor_ids[v]] = {"sppg": sites[j], "distance_km": round(float(dists[v, j]), 2)}
+    return assignments
+
+async def assign_vendors(vendor_locations: dict) -> dict:
+    """
+    Hitung ulang penugasan vendor -> SPPG.
+    vendor_locations: {vendor_id: (lat, long)} untuk vendor yang punya stok hampir expired.
+    Hasil menggantikan penugasan sebelumnya (kapasitas berlaku per hari).
+    """
+    started = time.perf_counter()
+    network = await get_network()
+
+    vendor_ids = list(vendor_locations.keys())
+    if vendor_ids and network["sites"]:
+        lats = [vendor_locations[v][0] for v in vendor_ids]
+        longs = [vendor_locations[v][1] for v in vendor_ids]
+        # CPU-bound -> jangan blok event loop
+        assignments = await run_in_threadpool(_solve, vendor_ids, lats, longs, network)
+    else:
+        assignments = {}
+
+    global _ASSIGNMENTS
+    _ASSIGNMENTS = assignments
+    _STATE.update({
+        "last_run": time.time(),
+        "vendors": len(vendor_ids),
+        "assigned": len(assignments),
+        "unassigned": [v for v in vendor_ids if v not in assignments]
+    })
+    print(f"🏫 Penugasan SPPG: {len(assignments)}/{len(vendor_ids)} vendor "
+          f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+    return assignments
+
+def get_assignment(vendor_id: int):
+    """Penugasan SPPG untuk satu vendor (None kalau tidak ada / kapasitas penuh)."""
+    return _ASSIGNMENTS.get(vendor_id)
+
+def get_assignment_summary() -> dict:
+    """Ringkasan hasil job terakhir + beban tiap SPPG."""
+    load = {}
+    for assignment in _ASSIGNMENTS.values():
+        sppg_id = assignment["sppg"]["id"]
+        load[sppg_id] = load.get(sppg_id, 0) + 1
+    return {**_STATE, "load_per_sppg": load}
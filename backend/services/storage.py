@@ -1,6 +1,6 @@
 import time
 from fastapi import UploadFile
-from .clients import supabase
+from .clients import db
 
 async def upload_image_to_supabase(file: UploadFile) -> str:
     """
@@ -18,14 +18,14 @@ async def upload_image_to_supabase(file: UploadFile) -> str:
         # Pastikan bucket 'supply-photos' sudah dibuat di Supabase Dashboard!
         bucket_name = "supply-photos"
         
-        response = supabase.storage.from_(bucket_name).upload(
+        response = await db.storage.from_(bucket_name).upload(
             path=filename,
             file=file_bytes,
             file_options={"content-type": file.content_type}
         )
         
         # 4. Ambil Public URL
-        public_url = supabase.storage.from_(bucket_name).get_public_url(filename)
+        public_url = await db.storage.from_(bucket_name).get_public_url(filename)
         
         return public_url
         
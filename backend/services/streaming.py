@@ -0,0 +1,79 @@
+import json
+from contextlib import aclosing
+
+# ==========================================
+# 📡 STREAMING (SERVER-SENT EVENTS)
+# Helper untuk endpoint .../stream: format event SSE, dan parser JSON
+# bertahap supaya rekomendasi menu bisa dikirim satu per satu begitu
+# object-nya selesai ditulis model (tanpa menunggu seluruh jawaban).
+# ==========================================
+
+# Header respons SSE: jangan di-cache / di-buffer proxy (nginx)
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def sse_stream(events):
+    """
+    Async generator (event, data) -> teks SSE.
+    Event "start" langsung dikirim supaya client dapat byte pertama tanpa menunggu model.
+    """
+    yield sse_event("start", {})
+    try:
+        # aclosing: client putus -> generator di bawahnya langsung ditutup (stream LLM + slot dilepas)
+        async with aclosing(events):
+            async for event, data in events:
+                yield sse_event(event, data)
+    except Exception as e:
+        print(f"❌ Stream error: {e}")
+        yield sse_event("error", {"error": "Stream terputus, coba lagi"})
+
+class JSONStreamParser:
+    """
+    Terima potongan teks JSON (token model) lewat feed(), kembalikan object item
+    yang sudah lengkap: elemen array di root ([{...}, {...}]) atau elemen array yang
+    langsung ada di object root ({"recommendations": [{...}, {...}]}).
+    Teks di luar JSON (misal ```json) diabaikan.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._stack = []       # [(karakter pembuka, index)]
+        self._in_string = False
+        self._escaped = False
+
+    def _is_item_level(self) -> bool:
+        opens = [ch for ch, _ in self._stack]
+        return opens == ["["] or opens == ["{", "["]
+
+    def feed(self, chunk: str) -> list:
+        self.text += chunk
+        finished = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                # Tanda kutip hanya berarti string kalau sudah di dalam JSON
+                self._in_string = bool(self._stack)
+            elif ch in "{[":
+                self._stack.append((ch, i))
+            elif ch in "}]" and self._stack:
+                opener, start = self._stack.pop()
+                if opener == "{" and ch == "}" and self._is_item_level():
+                    try:
+                        item = json.loads(text[start:i + 1])
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(item, dict):
+                        finished.append(item)
+        self._pos = len(text)
+        return finished
@@ -0,0 +1,152 @@
+import re
+from . import aggregates, events, ingredients
+
+# ==========================================
+# ⌨️ AUTOCOMPLETE NAMA BARANG (TRIE IN-MEMORY)
+# Setiap nama barang (item_name unik) dimasukkan ke trie mulai dari
+# setiap awal kata, jadi "mer" ketemu "Bawang Merah".
+# Bobot = total quantity tersedia di pasar (satuan dasar bahan kanonik).
+# Tiap node menyimpan top-K nama terberat di subtree-nya, jadi query
+# cukup jalan sepanjang prefix (tanpa scan subtree).
+# Di-update per event write supplies; dibangun ulang dari aggregates
+# setiap kali aggregates selesai reconcile.
+# ==========================================
+
+TOP_K = 10
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+class _Node:
+    __slots__ = ("children", "names", "top", "dirty")
+
+    def __init__(self):
+        self.children = {}
+        self.names = set()  # item_name yang key-nya berakhir di node ini
+        self.top = []       # [(weight, item_name)] urut terberat, maks TOP_K
+        self.dirty = False  # top perlu dihitung ulang dari subtree
+
+_ROOT = _Node()
+_WEIGHTS = {}  # item_name -> quantity tersedia
+_STATE = {"ready": False}
+
+def _normalize(text: str) -> str:
+    return _NON_ALNUM.sub(" ", (text or "").lower()).strip()
+
+def _keys(name: str) -> list:
+    # Nama lengkap + potongan mulai tiap kata berikutnya ("bawang merah", "merah")
+    words = _normalize(name).split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+def _sort_key(pair):
+    weight, name = pair
+    return (-weight, name)
+
+def _update_node(node: _Node, name: str, old: float, new: float):
+    for i, (_, top_name) in enumerate(node.top):
+        if top_name == name:
+            if new <= 0:
+                del node.top[i]
+                # Slot kosong bisa diisi nama lain dari subtree
+                node.dirty = True
+            else:
+                node.top[i] = (new, name)
+                node.top.sort(key=_sort_key)
+                if new < old and len(node.top) >= TOP_K:
+                    # Bisa saja sekarang kalah dari nama di luar top
+                    node.dirty = True
+            return
+
+    if new > 0 and (len(node.top) < TOP_K or _sort_key((new, name)) < _sort_key(node.top[-1])):
+        node.top.append((new, name))
+        node.top.sort(key=_sort_key)
+        del node.top[TOP_K:]
+
+def _set_weight(name: str, new: float):
+    # Bulatkan biar sisa float (0.1 + 0.2 - 0.3) tidak dianggap stok
+    new = round(new, 4)
+    old = _WEIGHTS.get(name, 0)
+    if new > 0:
+        _WEIGHTS[name] = new
+    else:
+        _WEIGHTS.pop(name, None)
+
+    for key in _keys(name):
+        node = _ROOT
+        _update_node(node, name, old, new)
+        for ch in key:
+            child = node.children.get(ch)
+            if child is None:
+                if new <= 0:
+                    break
+                child = node.children[ch] = _Node()
+            node = child
+            _update_node(node, name, old, new)
+        else:
+            if new > 0:
+                node.names.add(name)
+            else:
+                node.names.discard(name)
+
+def _recompute(node: _Node):
+    # Kumpulkan semua nama di subtree lalu ambil TOP_K terberat
+    names = set()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        names.update(current.names)
+        stack.extend(current.children.values())
+    node.top = sorted(((_WEIGHTS[n], n) for n in names if n in _WEIGHTS), key=_sort_key)[:TOP_K]
+    node.dirty = False
+
+# --- Handler event write ---
+
+# Bobot ranking = quantity (satuan dasar, atau mentah kalau belum bisa dikonversi).
+# Cuma buat urutan saran, jadi satuan campur di sini tidak masalah.
+def on_supplies_added(rows: list):
+    for row in rows:
+        name = ingredients.supply_name(row)
+        if name:
+            _set_weight(name, _WEIGHTS.get(name, 0) + ingredients.supply_unit(row)[0])
+
+def on_supplies_removed(rows: list):
+    for row in rows:
+        name = ingredients.supply_name(row)
+        if name:
+            _set_weight(name, _WEIGHTS.get(name, 0) - ingredients.supply_unit(row)[0])
+
+def on_aggregates_reconciled(_payload):
+    rebuild_from_aggregates()
+
+events.subscribe(events.SUPPLIES_ADDED, on_supplies_added)
+events.subscribe(events.SUPPLIES_REMOVED, on_supplies_removed)
+events.subscribe(events.AGGREGATES_RECONCILED, on_aggregates_reconciled)
+
+# --- Build & Query ---
+
+def rebuild_from_aggregates():
+    """
+    Bangun ulang trie dari total per item di aggregates (tanpa query DB).
+    """
+    global _ROOT, _WEIGHTS
+    _ROOT, _WEIGHTS = _Node(), {}
+    for row in aggregates.get_item_totals():
+        if row['total_qty'] > 0:
+            # Data lama (tanpa canonical id) bisa punya nama yang sama dengan bahan kanonik
+            _set_weight(row['item_name'], _WEIGHTS.get(row['item_name'], 0) + row['total_qty'])
+    _STATE["ready"] = True
+
+def is_ready() -> bool:
+    return _STATE["ready"]
+
+def suggest(prefix: str, limit: int = TOP_K) -> list:
+    """
+    Nama barang yang diawali `prefix` (di awal kata mana pun), urut quantity terbanyak.
+    """
+    node = _ROOT
+    for ch in _normalize(prefix):
+        node = node.children.get(ch)
+        if node is None:
+            return []
+    if node.dirty:
+        _recompute(node)
+    return [{"item_name": name, "available_qty": weight} for weight, name in node.top[:limit]]
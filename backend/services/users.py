@@ -0,0 +1,64 @@
+import asyncio
+from .clients import db, execute
+from .cache import TTLCache
+from config import USER_PROFILE_CACHE_SIZE, USER_PROFILE_CACHE_TTL
+
+# Kolom profil yang aman di-cache (TANPA password hash)
+PROFILE_COLUMNS = "id, full_name, username, email, role, phone_number, address, latitude, longitude"
+
+# Batas jumlah id per query in_() (jaga panjang URL PostgREST)
+PROFILE_BATCH_SIZE = 200
+
+# Cache profil bersama untuk semua service (create_supplies, create_order, chat, notifikasi)
+_PROFILE_CACHE = TTLCache("user_profiles", max_entries=USER_PROFILE_CACHE_SIZE, ttl_seconds=USER_PROFILE_CACHE_TTL)
+
+async def get_user_profile(user_id: int):
+    """
+    Ambil profil user (tanpa password) lewat cache.
+    Return None kalau user tidak ditemukan.
+    """
+    async def load():
+        res = await execute(db.table("users").select(PROFILE_COLUMNS).eq("id", user_id).limit(1))
+        return res.data[0] if res.data else None
+
+    return await _PROFILE_CACHE.get_or_load(user_id, load)
+
+async def get_user_profiles(user_ids: list) -> dict:
+    """
+    Versi batch get_user_profile: {user_id: profil}.
+    Yang belum ada di cache diambil dengan query in_() per potongan
+    PROFILE_BATCH_SIZE id (jalan paralel), bukan satu query per user.
+    """
+    profiles = {}
+    missing = []
+    for uid in set(user_ids):
+        profile = _PROFILE_CACHE.get(uid)
+        if profile is not None:
+            profiles[uid] = profile
+        else:
+            missing.append(uid)
+
+    if missing:
+        chunks = [missing[i:i + PROFILE_BATCH_SIZE] for i in range(0, len(missing), PROFILE_BATCH_SIZE)]
+        results = await asyncio.gather(*[
+            execute(db.table("users").select(PROFILE_COLUMNS).in_("id", chunk))
+            for chunk in chunks
+        ])
+        for res in results:
+            for row in res.data:
+                _PROFILE_CACHE.set(row['id'], row)
+                profiles[row['id']] = row
+
+    return profiles
+
+def invalidate_user_profile(user_id: int):
+    """Wajib dipanggil setiap kali baris users diubah."""
+    _PROFILE_CACHE.invalidate(user_id)
+
+async def update_user_profile(user_id: int, changes: dict):
+    """
+    Update profil user lalu buang cache-nya.
+    """
+    res = await execute(db.table("users").update(changes).eq("id", user_id))
+    invalidate_user_profile(user_id)
+    return res.data[0] if res.data else None
@@ -1,14 +1,35 @@
 import base64
+import hashlib
 import json
-from .clients import kolosal_client
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from .cache import DiskCache
+from .clients import LLMBusyError, chat_completion
 from prompts import (
     get_inventory_analysis_prompt,
     get_cooked_meal_analysis_prompt
 )
+from config import (
+    LLM_MODEL,
+    VISION_CACHE_PATH,
+    VISION_CACHE_MAX_ENTRIES,
+    VISION_CACHE_TTL,
+    VISION_CACHE_MAX_DISTANCE
+)
 
 from PIL import Image
 import io
 
+# Cache hasil analisis per foto (persisten, LRU). Key = jenis analisis + versi prompt + dHash gambar.
+# Foto hampir sama (jarak Hamming dHash <= VISION_CACHE_MAX_DISTANCE bit) dapat hasil yang sama tanpa panggil AI.
+# Cari tetangga lewat tag blok hash (pigeonhole): hash dipecah jadi MAX_DISTANCE + 1 blok,
+# foto dalam jarak itu pasti sama persis di minimal satu blok -> kandidat diambil lewat index SQLite.
+# Akses file SQLite blocking -> _lookup_cached / _store_cached dipanggil lewat threadpool.
+_RESULT_CACHE = DiskCache(
+    "vision_results", VISION_CACHE_PATH,
+    max_entries=VISION_CACHE_MAX_ENTRIES, ttl_seconds=VISION_CACHE_TTL
+)
+
 def resize_image(image_bytes, max_size=(1024, 1024)):
     """Resize image to avoid huge payloads"""
     try:
@@ -42,23 +63,96 @@ def encode_image_to_base64(image_bytes):
     resized_bytes = resize_image(image_bytes)
     return base64.b64encode(resized_bytes).decode('utf-8')
 
-def analyze_market_inventory(image_bytes):
+def image_dhash(image_bytes) -> int:
+    """
+    Perceptual hash 64-bit (dHash): gambar abu-abu 9x8, bit = piksel lebih terang dari tetangga kanannya.
+    Tahan terhadap resize / kompresi ulang / sedikit beda cahaya. None kalau gambar tidak bisa dibaca.
+    """
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image.draft("L", (64, 64))  # JPEG: decode langsung di resolusi kecil
+        pixels = np.asarray(image.convert("L").resize((9, 8), Image.Resampling.LANCZOS), dtype=np.int16)
+        bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+        return int("".join("1" if b else "0" for b in bits), 2)
+    except Exception as e:
+        print(f"⚠️ dHash gagal ({type(e).__name__}: {e}), hasil tidak di-cache")
+        return None
+
+def prepare_image(image_bytes):
+    """Resize + base64 + dHash (dari gambar hasil resize). Berat di CPU -> panggil lewat threadpool."""
+    resized_bytes = resize_image(image_bytes)
+    return base64.b64encode(resized_bytes).decode('utf-8'), image_dhash(resized_bytes)
+
+def _prompt_version(kind: str, prompt_text: str) -> str:
+    # Prompt / model berubah -> versi baru -> hasil lama otomatis tidak terpakai
+    digest = hashlib.sha1(f"{LLM_MODEL}\n{prompt_text}".encode()).hexdigest()[:12]
+    return f"{kind}:{digest}:"
+
+def _hash_tags(prefix: str, image_hash: int) -> list:
+    # 64 bit dibagi rata jadi VISION_CACHE_MAX_DISTANCE + 1 blok; tag = versi prompt + posisi blok + isi blok
+    blocks = min(max(VISION_CACHE_MAX_DISTANCE, 0) + 1, 64)
+    bounds = [round(i * 64 / blocks) for i in range(blocks + 1)]
+    return [
+        f"{prefix}b{i}:{(image_hash >> lo) & ((1 << (hi - lo)) - 1):x}"
+        for i, (lo, hi) in enumerate(zip(bounds, bounds[1:]))
+    ]
+
+def _lookup_cached(kind: str, prompt_text: str, image_hash):
+    """(cache_key, hasil tersimpan atau None). Cocok persis dulu, lalu tetangga terdekat dalam jarak Hamming."""
+    if image_hash is None:
+        return None, None
+    prefix = _prompt_version(kind, prompt_text)
+    key = f"{prefix}{image_hash:016x}"
+    try:
+        cached = _RESULT_CACHE.get(key)
+        if cached is not None or VISION_CACHE_MAX_DISTANCE <= 0:
+            return key, cached
+
+        # Kandidat = foto yang sama persis di minimal satu blok (bukan semua key dengan prefix ini)
+        keys = _RESULT_CACHE.keys_by_tags(_hash_tags(prefix, image_hash))
+        if not keys:
+            return key, None
+        hashes = np.array([int(k[len(prefix):], 16) for k in keys], dtype=np.uint64)
+        diff = np.bitwise_xor(hashes, np.uint64(image_hash))
+        distances = np.unpackbits(diff.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        nearest = int(np.argmin(distances))
+        if distances[nearest] > VISION_CACHE_MAX_DISTANCE:
+            return key, None
+        cached = _RESULT_CACHE.get(keys[nearest])
+        if cached is not None:
+            print(f"♻️ Hasil analisis dari cache (foto mirip, beda {int(distances[nearest])} bit)")
+        return key, cached
+    except Exception as e:
+        print(f"⚠️ Vision cache error: {e}")
+        return key, None
+
+def _store_cached(key, result: dict):
+    if key is None:
+        return
+    prefix, image_hash = key[:-16], int(key[-16:], 16)
+    try:
+        _RESULT_CACHE.set(key, result, tags=_hash_tags(prefix, image_hash))
+    except Exception as e:
+        print(f"⚠️ Gagal simpan vision cache: {e}")
+
+async def analyze_market_inventory(image_bytes):
     """
     Claude untuk Deteksi Jenis, Hitung Jumlah, Cek Kualitas.
     """
     
-    print("✨ Mengirim gambar ke Claude Sonnet 4.5 (All-in-One Analysis)...")
-    
-    # 1. Siapkan Gambar (Base64 dengan Resize)
-    base64_image = encode_image_to_base64(image_bytes)
+    # 1. Siapkan Gambar (Base64 dengan Resize + dHash). PIL berat di CPU -> threadpool
+    base64_image, image_hash = await run_in_threadpool(prepare_image, image_bytes)
 
-    # 2. Prompt Claude
+    # 2. Prompt Claude (foto yang sama / hampir sama sudah pernah dianalisis -> langsung dari cache)
     prompt_text = get_inventory_analysis_prompt()
+    cache_key, cached = await run_in_threadpool(_lookup_cached, "inventory", prompt_text, image_hash)
+    if cached is not None:
+        return cached
 
+    print("✨ Mengirim gambar ke Claude Sonnet 4.5 (All-in-One Analysis)...")
     try:
-        # 3. Panggil API Colossal
-        response = kolosal_client.chat.completions.create(
-            model="Claude Sonnet 4.5", # Pastikan nama model sesuai instruksi Colossal
+        # 3. Panggil API Colossal (async, antre di slot LLM)
+        response = await chat_completion(
             messages=[
                 {
                     "role": "user",
@@ -97,16 +191,20 @@ def analyze_market_inventory(image_bytes):
                 "note": item.get("visual_reasoning") # Bonus: alesan AI-nya
             })
             
-        return {"status": "success", "items": final_data}
+        result = {"status": "success", "items": final_data}
+        await run_in_threadpool(_store_cached, cache_key, result)
+        return result
 
     except json.JSONDecodeError:
         print("❌ Error: Claude tidak mengembalikan JSON valid.")
         return {"error": "AI Error (Invalid JSON)"}
+    except LLMBusyError:
+        raise  # route -> 503 + Retry-After
     except Exception as e:
         print(f"❌ Error API: {e}")
         return {"error": f"Gagal analisis: {str(e)}"}
 
-def analyze_cooked_meal(image_bytes):
+async def analyze_cooked_meal(image_bytes):
     """
     VISI KOMPUTER UNTUK MAKANAN JADI (QC FINAL)
     Cek basi/tidak, estimasi gizi visual.
@@ -114,13 +212,15 @@ def analyze_cooked_meal(image_bytes):
     import re
     
     print("🍱 Menganalisis Makanan Jadi...")
-    base64_image = encode_image_to_base64(image_bytes)
+    base64_image, image_hash = await run_in_threadpool(prepare_image, image_bytes)
     
     prompt_text = get_cooked_meal_analysis_prompt()
+    cache_key, cached = await run_in_threadpool(_lookup_cached, "cooked_meal", prompt_text, image_hash)
+    if cached is not None:
+        return cached
     
     try:
-        response = kolosal_client.chat.completions.create(
-            model="Claude Sonnet 4.5",
+        response = await chat_completion(
             messages=[
                 {
                     "role": "user",
@@ -140,9 +240,11 @@ def analyze_cooked_meal(image_bytes):
         
         # Try to extract just the main JSON object (ignore extra fields)
         # Find the first { and try to find the matching }
+        complete = True
         try:
             parsed_data = json.loads(cleaned_content)
         except json.JSONDecodeError:
+            complete = False
             # If full parse fails, try to extract just what we need
             print("⚠️ Full JSON parse failed, attempting partial extraction...")
             parsed_data = {}
@@ -181,11 +283,16 @@ def analyze_cooked_meal(image_bytes):
                 nutr["fats"] = nutr["fat"]
         
         print(f"✅ Parsed Data: {parsed_data}")
+        # Hasil ekstraksi parsial (JSON rusak) tidak di-cache, biar upload berikutnya coba lagi
+        if complete:
+            await run_in_threadpool(_store_cached, cache_key, parsed_data)
         return parsed_data
     except json.JSONDecodeError as e:
         print(f"❌ JSON Decode Error: {e}")
         print(f"❌ Content was: {content}")
         return {"error": f"Invalid JSON: {str(e)}"}
+    except LLMBusyError:
+        raise  # route -> 503 + Retry-After
     except Exception as e:
         print(f"❌ API Error: {e}")
         return {"error": str(e)}
\ No newline at end of file
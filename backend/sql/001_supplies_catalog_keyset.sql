@@ -0,0 +1,4 @@
+-- Keyset pagination katalog pasar: GET /api/supplies
+-- ORDER BY created_at DESC, id DESC + filter (created_at, id) < cursor
+create index if not exists supplies_created_at_id_idx
+    on supplies (created_at desc, id desc);
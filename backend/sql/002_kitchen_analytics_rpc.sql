@@ -0,0 +1,30 @@
+-- Agregasi dashboard SPPG (GET /api/analytics/kitchen) dihitung di database.
+-- Satu baris per item_name, bukan satu baris per supply.
+-- Bucket sama dengan logic lama di services/analytics.py:
+--   critical: expiry_days <= 2, warning: 3..5, fresh: > 5
+--   warning_items: jumlah row dengan expiry_days <= 3 (metric "warning_count")
+-- expiry_days NULL dianggap 0 (sama seperti item.get('expiry_days', 0)).
+create or replace function kitchen_analytics_by_item()
+returns table (
+    item_name text,
+    item_count bigint,
+    total_qty bigint,
+    fresh_qty bigint,
+    warning_qty bigint,
+    critical_qty bigint,
+    warning_items bigint
+)
+language sql
+stable
+as $$
+    select
+        s.item_name,
+        count(*) as item_count,
+        coalesce(sum(s.quantity), 0) as total_qty,
+        coalesce(sum(s.quantity) filter (where coalesce(s.expiry_days, 0) > 5), 0) as fresh_qty,
+        coalesce(sum(s.quantity) filter (where coalesce(s.expiry_days, 0) between 3 and 5), 0) as warning_qty,
+        coalesce(sum(s.quantity) filter (where coalesce(s.expiry_days, 0) <= 2), 0) as critical_qty,
+        count(*) filter (where coalesce(s.expiry_days, 0) <= 3) as warning_items
+    from supplies s
+    group by s.item_name
+$$;
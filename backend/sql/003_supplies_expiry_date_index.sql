@@ -0,0 +1,8 @@
+-- Sweeper expiry (services/inventory.run_expiry_sweep): range query di expiry_date
+create index if not exists supplies_expiry_date_idx
+    on supplies (expiry_date);
+
+-- Data lama tanpa expiry_date masih disaring lewat expiry_days
+create index if not exists supplies_legacy_expiry_days_idx
+    on supplies (expiry_days)
+    where expiry_date is null;
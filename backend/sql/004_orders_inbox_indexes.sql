@@ -0,0 +1,9 @@
+-- Inbox vendor (GET /api/orders/umkm): WHERE seller_id = ? ORDER BY created_at DESC, id DESC
+create index if not exists orders_seller_created_idx
+    on orders (seller_id, created_at desc, id desc);
+
+-- Riwayat kitchen (GET /api/orders/kitchen): WHERE buyer_id = ?
+create index if not exists orders_buyer_created_idx
+    on orders (buyer_id, created_at desc, id desc);
+
+-- Order lama tanpa seller_id: jalankan `python backfill_seller_id.py` sekali.
@@ -0,0 +1,112 @@
+-- Pencarian nama barang (GET /api/items/search, fallback search_suppliers).
+-- ilike '%keyword%' di item_name tidak bisa pakai index B-tree dan tidak kenal
+-- variasi nama lokal ("cabe" vs "cabai", "bamer" vs "bawang merah").
+-- Solusi: kolom search_name (nama yang sudah dinormalisasi + sinonim) + index trigram GIN.
+-- Aturan normalisasi HARUS sama dengan services/search.normalize_item_name.
+
+create extension if not exists pg_trgm;
+
+-- 1. Tabel sinonim nama bahan lokal (alias -> nama baku)
+create table if not exists ingredient_synonyms (
+    alias text primary key,
+    canonical text not null
+);
+
+insert into ingredient_synonyms (alias, canonical) values
+    ('cabe', 'cabai'),
+    ('cabe rawit', 'cabai rawit'),
+    ('lombok', 'cabai'),
+    ('bamer', 'bawang merah'),
+    ('baput', 'bawang putih'),
+    ('bombay', 'bawang bombay'),
+    ('toge', 'tauge'),
+    ('taoge', 'tauge'),
+    ('kangkong', 'kangkung'),
+    ('sledri', 'seledri'),
+    ('daun sop', 'seledri'),
+    ('brambang', 'bawang merah'),
+    ('ayam potong', 'ayam'),
+    ('telor', 'telur'),
+    ('sawi ijo', 'sawi hijau'),
+    ('kol', 'kubis')
+on conflict (alias) do nothing;
+
+-- 2. Normalisasi: huruf kecil, buang tanda baca, rapikan spasi, ganti alias (kata utuh)
+create or replace function normalize_item_name(name text)
+returns text
+language plpgsql
+stable
+as $$
+declare
+    result text;
+    syn record;
+begin
+    result := lower(coalesce(name, ''));
+    result := regexp_replace(result, '[^a-z0-9]+', ' ', 'g');
+    result := btrim(result);
+    -- Alias terpanjang dulu (biar "cabe rawit" menang atas "cabe")
+    for syn in select alias, canonical from ingredient_synonyms order by length(alias) desc, alias loop
+        result := regexp_replace(result, '\m' || syn.alias || '\M', syn.canonical, 'g');
+    end loop;
+    return result;
+end;
+$$;
+
+-- 3. Kolom search_name, diisi otomatis oleh trigger saat insert/update item_name
+alter table supplies add column if not exists search_name text;
+
+create or replace function supplies_set_search_name()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.search_name := normalize_item_name(new.item_name);
+    return new;
+end;
+$$;
+
+drop trigger if exists supplies_search_name_trg on supplies;
+create trigger supplies_search_name_trg
+    before insert or update of item_name on supplies
+    for each row execute function supplies_set_search_name();
+
+-- Backfill data lama
+update supplies set search_name = normalize_item_name(item_name)
+where search_name is null;
+
+-- 4. Index trigram: dipakai operator %, <%, dan LIKE '%...%' (latency tetap datar walau tabel jutaan baris)
+create index if not exists supplies_search_name_trgm_idx
+    on supplies using gin (search_name gin_trgm_ops);
+
+-- 5. RPC pencarian nama barang, diurutkan berdasarkan relevansi
+--    score = word_similarity (query vs bagian nama yang paling mirip), 1.0 kalau substring persis
+create or replace function search_item_names(q text, max_results int default 20)
+returns table (
+    item_name text,
+    search_name text,
+    score real,
+    supply_count bigint,
+    total_qty bigint
+)
+language sql
+stable
+as $$
+    with query as (
+        select normalize_item_name(q) as v
+    )
+    select
+        s.item_name,
+        min(s.search_name) as search_name,
+        max(case
+                when s.search_name like '%' || query.v || '%' then 1.0
+                else word_similarity(query.v, s.search_name)
+            end)::real as score,
+        count(*) as supply_count,
+        coalesce(sum(s.quantity), 0) as total_qty
+    from supplies s, query
+    where query.v <> ''
+      and (s.search_name like '%' || query.v || '%' or query.v <% s.search_name)
+    group by s.item_name
+    order by score desc, total_qty desc
+    limit max_results
+$$;
@@ -0,0 +1,123 @@
+-- Katalog bahan baku kanonik + konversi satuan.
+-- create_supplies (services/ingredients.py) mengisi supplies.canonical_item_id dan
+-- supplies.normalized_qty (quantity dalam satuan dasar bahan tsb), jadi analytics
+-- cukup group by integer, tidak lagi per string item_name ("Bawang Merah" vs "bawang merah ")
+-- dan tidak menjumlahkan kg dengan pcs.
+-- slug = normalize_item_name(nama) (lihat 005_supplies_item_search.sql), jadi sinonim
+-- lokal ("cabe", "bamer") otomatis jatuh ke bahan yang sama.
+
+-- 1. Katalog bahan
+create table if not exists ingredients (
+    id bigserial primary key,
+    name text not null,              -- Nama tampilan, misal "Bawang Merah"
+    slug text not null unique,       -- normalize_item_name(name)
+    base_unit text not null default 'kg',
+    created_at timestamptz not null default now()
+);
+
+-- 2. Faktor konversi khusus per bahan: 1 <unit> = factor <base_unit>
+--    (satuan massa/volume umum seperti gram, ons, liter sudah ditangani di kode)
+create table if not exists ingredient_units (
+    ingredient_id bigint not null references ingredients(id) on delete cascade,
+    unit text not null,
+    factor numeric not null check (factor > 0),
+    primary key (ingredient_id, unit)
+);
+
+insert into ingredients (name, slug, base_unit) values
+    ('Bawang Merah', 'bawang merah', 'kg'),
+    ('Bawang Putih', 'bawang putih', 'kg'),
+    ('Bawang Bombay', 'bawang bombay', 'kg'),
+    ('Cabai', 'cabai', 'kg'),
+    ('Cabai Rawit', 'cabai rawit', 'kg'),
+    ('Telur', 'telur', 'kg'),
+    ('Telur Ayam', 'telur ayam', 'kg'),
+    ('Beras', 'beras', 'kg'),
+    ('Ayam', 'ayam', 'kg'),
+    ('Tahu', 'tahu', 'kg'),
+    ('Tempe', 'tempe', 'kg'),
+    ('Kangkung', 'kangkung', 'kg'),
+    ('Bayam', 'bayam', 'kg'),
+    ('Sawi Hijau', 'sawi hijau', 'kg'),
+    ('Kubis', 'kubis', 'kg'),
+    ('Tomat', 'tomat', 'kg'),
+    ('Wortel', 'wortel', 'kg'),
+    ('Kentang', 'kentang', 'kg'),
+    ('Tauge', 'tauge', 'kg'),
+    ('Seledri', 'seledri', 'kg')
+on conflict (slug) do nothing;
+
+insert into ingredient_units (ingredient_id, unit, factor)
+select i.id, u.unit, u.factor
+from (values
+    ('telur', 'pcs', 0.0625),        -- ± 16 butir / kg
+    ('telur', 'tray', 1.875),        -- 30 butir
+    ('telur ayam', 'pcs', 0.0625),
+    ('telur ayam', 'tray', 1.875),
+    ('beras', 'karung', 25),
+    ('bawang merah', 'karung', 50),
+    ('bawang putih', 'karung', 50),
+    ('kentang', 'karung', 50),
+    ('ayam', 'ekor', 1.2),
+    ('ayam', 'pcs', 1.2),
+    ('tahu', 'pcs', 0.1),
+    ('tempe', 'papan', 0.5),
+    ('tempe', 'pcs', 0.25),
+    ('kangkung', 'ikat', 0.25),
+    ('bayam', 'ikat', 0.25),
+    ('sawi hijau', 'ikat', 0.25),
+    ('seledri', 'ikat', 0.05),
+    ('kubis', 'pcs', 1),
+    ('tomat', 'pcs', 0.1),
+    ('wortel', 'pcs', 0.1)
+) as u(slug, unit, factor)
+join ingredients i on i.slug = u.slug
+on conflict (ingredient_id, unit) do nothing;
+
+-- 3. Kolom kanonik di supplies (diisi saat insert; data lama lewat backfill_canonical_items.py)
+alter table supplies add column if not exists canonical_item_id bigint references ingredients(id);
+alter table supplies add column if not exists normalized_qty numeric;
+
+create index if not exists supplies_canonical_item_idx
+    on supplies (canonical_item_id);
+
+-- 4. RPC dashboard SPPG: group by bahan kanonik, quantity dalam satuan dasar.
+--    Baris yang satuannya belum bisa dikonversi (normalized_qty NULL, termasuk data lama
+--    yang belum di-backfill) TIDAK ikut dijumlah ke satuan dasar: mereka jadi grup sendiri
+--    per (bahan, satuan mentah) dengan converted = false, supaya "5 karung" tidak masuk total kg.
+drop function if exists kitchen_analytics_by_item();
+create function kitchen_analytics_by_item()
+returns table (
+    ingredient_id bigint,
+    item_name text,
+    unit text,
+    converted boolean,
+    item_count bigint,
+    total_qty numeric,
+    fresh_qty numeric,
+    warning_qty numeric,
+    critical_qty numeric,
+    warning_items bigint
+)
+language sql
+stable
+as $$
+    select
+        s.canonical_item_id as ingredient_id,
+        coalesce(i.name, s.item_name) as item_name,
+        case when s.normalized_qty is not null then i.base_unit else s.unit end as unit,
+        s.normalized_qty is not null as converted,
+        count(*) as item_count,
+        coalesce(sum(coalesce(s.normalized_qty, s.quantity)), 0) as total_qty,
+        coalesce(sum(coalesce(s.normalized_qty, s.quantity)) filter (where coalesce(s.expiry_days, 0) > 5), 0) as fresh_qty,
+        coalesce(sum(coalesce(s.normalized_qty, s.quantity)) filter (where coalesce(s.expiry_days, 0) between 3 and 5), 0) as warning_qty,
+        coalesce(sum(coalesce(s.normalized_qty, s.quantity)) filter (where coalesce(s.expiry_days, 0) <= 2), 0) as critical_qty,
+        count(*) filter (where coalesce(s.expiry_days, 0) <= 3) as warning_items
+    from supplies s
+    left join ingredients i on i.id = s.canonical_item_id
+    group by
+        s.canonical_item_id,
+        coalesce(i.name, s.item_name),
+        case when s.normalized_qty is not null then i.base_unit else s.unit end,
+        s.normalized_qty is not null
+$$;
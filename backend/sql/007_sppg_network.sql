@@ -0,0 +1,25 @@
+-- Jaringan SPPG (dapur) dari database, menggantikan list hardcoded di services/logistics.py.
+-- daily_capacity = berapa vendor (titik setor stok hampir expired) yang bisa diterima per hari.
+-- Dipakai job penugasan vendor -> SPPG di services/sppg.py (min-cost flow).
+create table if not exists sppg_locations (
+    id bigserial primary key,
+    name text not null,
+    address text,
+    lat double precision not null,
+    long double precision not null,
+    phone text,
+    daily_capacity integer not null default 20 check (daily_capacity >= 0),
+    active boolean not null default true,
+    created_at timestamptz not null default now()
+);
+
+-- Seed: 5 SPPG lama (id sama dengan list hardcoded sebelumnya)
+insert into sppg_locations (id, name, address, lat, long, phone, daily_capacity) values
+    (1, 'SPPG Jakarta Pusat (Monas)', 'Jl. Medan Merdeka Barat, Gambir', -6.175392, 106.827153, '0812-3456-7890', 20),
+    (2, 'SPPG Jakarta Selatan (Blok M)', 'Jl. Melawai Raya, Kebayoran Baru', -6.244223, 106.801782, '0812-9876-5432', 20),
+    (3, 'SPPG Jakarta Barat (Grogol)', 'Jl. Kyai Tapa, Grogol Petamburan', -6.167570, 106.790960, '0812-1122-3344', 20),
+    (4, 'SPPG Jakarta Timur (Jatinegara)', 'Jl. Matraman Raya, Jatinegara', -6.215116, 106.870434, '0812-5566-7788', 20),
+    (5, 'SPPG Jakarta Utara (Kelapa Gading)', 'Jl. Boulevard Raya, Kelapa Gading', -6.162331, 106.900220, '0812-9988-7766', 20)
+on conflict (id) do nothing;
+
+select setval(pg_get_serial_sequence('sppg_locations', 'id'), greatest((select max(id) from sppg_locations), 1));
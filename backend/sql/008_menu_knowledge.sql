@@ -0,0 +1,17 @@
+-- Pengetahuan umur simpan + nutrisi per menu masakan, supaya POST /api/kitchen/cook
+-- tidak tanya AI setiap kali untuk menu yang sudah dikenal ("Nasi Goreng" ke-1000 kali).
+-- slug = menu_slug(menu_name): huruf kecil, selain huruf/angka jadi spasi (tanpa sinonim bahan).
+-- Diisi otomatis saat analisis pertama (services/menu_knowledge.py) atau lewat
+-- prewarm_menu_knowledge.py untuk daftar menu standar. Koreksi manual cukup update barisnya;
+-- server memuat ulang tabel ini berkala (MENU_KNOWLEDGE_RELOAD_SECONDS).
+create table if not exists menu_knowledge (
+    slug text primary key,
+    menu_name text not null,
+    room_temp_hours numeric not null check (room_temp_hours > 0),
+    fridge_hours numeric not null check (fridge_hours > 0),
+    risk_factor text,
+    storage_tips text,
+    nutrition jsonb not null default '{}'::jsonb,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
@@ -0,0 +1,73 @@
+-- Snapshot untuk reconcile services/aggregates.py: dihitung (group by) di database,
+-- supaya worker tidak perlu menarik seluruh isi supplies & orders tiap reconcile.
+-- Bucket sama dengan services/aggregates.py:
+--   vendor: expired expiry_days <= 0, warning 1..5, fresh > 5 (NULL dianggap 0)
+
+-- Kesehatan stok per vendor (dashboard vendor)
+create or replace function vendor_supply_health()
+returns table (
+    user_id bigint,
+    fresh bigint,
+    warning bigint,
+    expired bigint
+)
+language sql
+stable
+as $$
+    select
+        s.user_id,
+        count(*) filter (where coalesce(s.expiry_days, 0) > 5) as fresh,
+        count(*) filter (where coalesce(s.expiry_days, 0) between 1 and 5) as warning,
+        count(*) filter (where coalesce(s.expiry_days, 0) <= 0) as expired
+    from supplies s
+    where s.user_id is not null
+    group by s.user_id
+$$;
+
+-- Penjualan & jumlah order per vendor, per nama item dan status.
+-- Supply yang sudah dihapus (dimasak) -> 'Unknown', sama dengan logic lama.
+create or replace function vendor_order_totals()
+returns table (
+    seller_id bigint,
+    item_name text,
+    status text,
+    order_count bigint,
+    qty_ordered numeric
+)
+language sql
+stable
+as $$
+    select
+        o.seller_id,
+        coalesce(s.item_name, 'Unknown') as item_name,
+        o.status,
+        count(*) as order_count,
+        coalesce(sum(o.qty_ordered), 0) as qty_ordered
+    from orders o
+    left join supplies s on s.id = o.supply_id
+    where o.seller_id is not null
+    group by o.seller_id, coalesce(s.item_name, 'Unknown'), o.status
+$$;
+
+-- Semua agregat di atas dalam SATU statement (satu snapshot konsisten), plus id supplies/orders
+-- yang baru dibuat (recent_seconds terakhir). Reconcile memakai id ini supaya event insert
+-- yang masuk selama snapshot berjalan tidak dihitung dua kali saat di-replay.
+create or replace function aggregate_snapshot(recent_seconds integer default 300)
+returns json
+language sql
+stable
+as $$
+    select json_build_object(
+        'items', coalesce((select json_agg(k) from kitchen_analytics_by_item() k), '[]'::json),
+        'vendor_health', coalesce((select json_agg(h) from vendor_supply_health() h), '[]'::json),
+        'vendor_orders', coalesce((select json_agg(v) from vendor_order_totals() v), '[]'::json),
+        'recent_supply_ids', coalesce((
+            select json_agg(s.id) from supplies s
+            where s.created_at >= now() - make_interval(secs => recent_seconds)
+        ), '[]'::json),
+        'recent_order_ids', coalesce((
+            select json_agg(o.id) from orders o
+            where o.created_at >= now() - make_interval(secs => recent_seconds)
+        ), '[]'::json)
+    )
+$$;
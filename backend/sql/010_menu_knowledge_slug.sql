@@ -0,0 +1,10 @@
+-- Slug menu_knowledge dulu dibuat dengan normalize_item_name (ikut sinonim bahan,
+-- misal "cabe" -> "cabai"). Sekarang menu_slug() tanpa sinonim: hitung ulang slug lama.
+-- Baris yang slug barunya sudah dipakai baris lain dibiarkan (dobel, bukan error).
+update menu_knowledge m
+set slug = btrim(regexp_replace(lower(m.menu_name), '[^a-z0-9]+', ' ', 'g'))
+where m.slug <> btrim(regexp_replace(lower(m.menu_name), '[^a-z0-9]+', ' ', 'g'))
+  and not exists (
+      select 1 from menu_knowledge o
+      where o.slug = btrim(regexp_replace(lower(m.menu_name), '[^a-z0-9]+', ' ', 'g'))
+  );
@@ -0,0 +1,17 @@
+-- Ganti status order dalam satu statement, sekaligus kembalikan status lamanya.
+-- Baris dikunci (for update) dulu: dua update bersamaan tidak bisa membaca status lama
+-- yang sama, jadi event ORDER_UPDATED (previous_status -> status) selalu berurutan benar.
+-- Dipakai PUT /api/orders/{order_id}.
+create or replace function set_order_status(p_order_id bigint, p_status text)
+returns setof jsonb
+language sql
+as $$
+    with old as (
+        select id, status from orders where id = p_order_id for update
+    )
+    update orders o
+    set status = p_status
+    from old
+    where o.id = old.id
+    returning to_jsonb(o) || jsonb_build_object('previous_status', old.status)
+$$;